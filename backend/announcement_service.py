@@ -0,0 +1,92 @@
+from models import db, Usuario, Announcement
+from email_service import build_announcement_email, send_messages
+from email_outbox import queue_email
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from config import Config
+
+# Audiencia -> filtro adicional sobre usuarios activos con email confirmado
+AUDIENCES = {
+    'enrolled': Usuario.has_access.is_(True),
+    'not_enrolled': or_(Usuario.has_access.is_(False), Usuario.has_access.is_(None)),
+    'all': None,
+}
+
+def recipients_query(audience):
+    query = db.session.query(Usuario.id, Usuario.email, Usuario.nombre).filter(
+        Usuario.activo.is_(True),
+        Usuario.email_confirmed.is_(True)
+    )
+    if AUDIENCES[audience] is not None:
+        query = query.filter(AUDIENCES[audience])
+    return query
+
+def next_recipients(audience, after_id, limit):
+    """Siguiente tramo de destinatarios con id > after_id (keyset: usa la PK, sin OFFSET)"""
+    return recipients_query(audience).filter(Usuario.id > after_id).order_by(Usuario.id).limit(limit).all()
+
+def create_announcement(subject, message, audience='enrolled', video_id=None, created_by=None):
+    """Crear un anuncio pendiente (sin commit). El envío lo hace el worker de emails."""
+    if audience not in AUDIENCES:
+        raise ValueError(f'Audiencia desconocida: {audience}')
+
+    announcement = Announcement(
+        subject=subject,
+        message=message,
+        audience=audience,
+        video_id=video_id,
+        created_by=created_by,
+        total_recipients=recipients_query(audience).count()
+    )
+    db.session.add(announcement)
+    return announcement
+
+def claim_announcement():
+    """
+    Tomar el anuncio pendiente más antiguo con un lease de EMAIL_SEND_LEASE_SECONDS,
+    para que otro worker no envíe el mismo tramo. Si el worker muere, el lease vence
+    y otro retoma desde el último checkpoint.
+    """
+    now = datetime.utcnow()
+    announcement = Announcement.query.filter(
+        Announcement.status.in_(['pending', 'sending']),
+        or_(Announcement.locked_until.is_(None), Announcement.locked_until <= now)
+    ).order_by(Announcement.id).limit(1).with_for_update(skip_locked=True).first()
+
+    if announcement:
+        announcement.status = 'sending'
+        announcement.locked_until = now + timedelta(seconds=Config.EMAIL_SEND_LEASE_SECONDS)
+    db.session.commit()
+    return announcement
+
+def process_announcement_batch(batch_size=None):
+    """
+    Enviar el siguiente tramo de un anuncio por una misma sesión SMTP y guardar el
+    checkpoint en la misma transacción que los contadores. Los envíos fallidos pasan
+    al outbox, que los reintenta con backoff. Retorna la cantidad de destinatarios procesados.
+    """
+    batch_size = batch_size or Config.ANNOUNCEMENT_BATCH_SIZE
+    announcement = claim_announcement()
+    if not announcement:
+        return 0
+
+    recipients = next_recipients(announcement.audience, announcement.last_user_id, batch_size)
+    messages = [build_announcement_email(r.email, r.nombre, announcement.id) for r in recipients]
+    errors = send_messages(messages) if messages else []
+
+    for recipient, error in zip(recipients, errors):
+        if error is None:
+            announcement.sent_count += 1
+        else:
+            announcement.failed_count += 1
+            queue_email('announcement', recipient.email, user_name=recipient.nombre, announcement_id=announcement.id)
+
+    if recipients:
+        announcement.last_user_id = recipients[-1].id
+    if len(recipients) < batch_size:
+        announcement.status = 'done'
+        announcement.finished_at = datetime.utcnow()
+    announcement.locked_until = None
+    db.session.commit()
+
+    return len(recipients)
@@ -7,6 +7,15 @@ from routes.admin import admin_bp
 from routes.course import course_bp
 from routes.payments import payments_bp
 from email_service import init_mail
+from auth_service import init_auth
+from rate_limit_service import init_rate_limiter
+from user_admin_service import init_user_admin
+from user_search_service import init_user_search
+from audit_service import init_audit
+from catalog_service import init_catalog
+from media_service import media_user, send_video, send_hls
+from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 
 def create_app():
@@ -15,13 +24,23 @@ def create_app():
     
     # Crear directorios necesarios
     os.makedirs('data', exist_ok=True)
-    os.makedirs('uploads', exist_ok=True)
-    os.makedirs('uploads/videos', exist_ok=True)
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'videos'), exist_ok=True)
+    
+    # Detrás de nginx: remote_addr es el cliente según X-Forwarded-For, solo si se confía en el proxy
+    if app.config['TRUSTED_PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'],
+                                x_proto=app.config['TRUSTED_PROXY_COUNT'])
     
     # Inicializar extensiones
     db.init_app(app)
     CORS(app)
     init_mail(app)  # Inicializar Flask-Mail
+    init_auth(app)  # Autenticación compartida por request
+    init_rate_limiter(app)
+    init_user_admin(app)
+    init_user_search(app)
+    init_audit(app)
+    init_catalog(app)
     
     # Registrar blueprints organizados
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -34,10 +53,19 @@ def create_app():
     def uploaded_file(filename):
         return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
     
-    # Ruta para servir videos
+    # Ruta para servir videos: se autoriza acá y la transferencia la hace nginx o sendfile
     @app.route('/uploads/videos/<filename>')
     def video_file(filename):
-        return send_from_directory(os.path.join(app.config['UPLOAD_FOLDER'], 'videos'), filename)
+        if not media_user():
+            return {'error': 'Se requiere acceso al curso'}, 403
+        return send_video(os.path.join(app.config['UPLOAD_FOLDER'], 'videos'), secure_filename(filename))
+    
+    # Transcodificaciones HLS y miniaturas de los videos subidos, con la misma autorización
+    @app.route('/uploads/hls/<sha256>/<profile>/<name>')
+    def hls_file(sha256, profile, name):
+        if not media_user():
+            return {'error': 'Se requiere acceso al curso'}, 403
+        return send_hls(os.path.join(app.config['UPLOAD_FOLDER'], 'videos'), sha256, profile, name)
     
     # Crear las tablas en la primera ejecución
     with app.app_context():
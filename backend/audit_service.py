@@ -0,0 +1,178 @@
+from models import db, AuditLog
+from flask import current_app, request, has_request_context
+from sqlalchemy import insert
+from auth_service import get_current_user
+from user_admin_service import parse_date
+from datetime import datetime, timedelta
+import atexit
+import threading
+from config import Config
+
+def init_audit(app):
+    app.extensions['audit_buffer'] = AuditBuffer(app)
+
+class AuditBuffer:
+    """
+    Buffer en memoria (por proceso) de entradas de auditoría.
+
+    record() solo agrega a una lista: el request no espera a la base. Un thread
+    escribe el buffer en lotes (un INSERT multi-fila por conexión propia) cada
+    AUDIT_FLUSH_INTERVAL segundos o antes si se juntan AUDIT_BATCH_SIZE entradas.
+    Con AUDIT_FLUSH_INTERVAL = 0 no hay thread y el lote se escribe al llenarse
+    (o con flush()). Si la base falla, las entradas vuelven al buffer hasta
+    AUDIT_BUFFER_MAX_SIZE; una caída del proceso pierde lo que no se escribió.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._entries = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.dropped = 0
+
+    def add(self, entries):
+        with self._lock:
+            self._entries.extend(entries)
+            pending = len(self._entries)
+
+        if self.app.config.get('AUDIT_FLUSH_INTERVAL', Config.AUDIT_FLUSH_INTERVAL) <= 0:
+            if pending >= Config.AUDIT_BATCH_SIZE:
+                self.flush()
+            return
+
+        self._ensure_thread()
+        if pending >= Config.AUDIT_BATCH_SIZE:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        # Se arranca en el primer uso: con gunicorn, dentro de cada worker (después del fork)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='audit-flusher', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.app.config.get('AUDIT_FLUSH_INTERVAL', Config.AUDIT_FLUSH_INTERVAL))
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.error(f"Error escribiendo la auditoría: {e}")
+
+    def flush(self):
+        """Escribir todo lo pendiente. Retorna la cantidad de entradas escritas."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+            if not entries:
+                return 0
+
+            try:
+                with self.app.app_context(), db.engine.begin() as conn:
+                    for start in range(0, len(entries), Config.AUDIT_BATCH_SIZE):
+                        conn.execute(insert(AuditLog), entries[start:start + Config.AUDIT_BATCH_SIZE])
+            except Exception:
+                with self._lock:
+                    # Reintentar en el próximo flush, descartando lo más viejo si no entra
+                    self._entries[:0] = entries
+                    overflow = len(self._entries) - Config.AUDIT_BUFFER_MAX_SIZE
+                    if overflow > 0:
+                        del self._entries[:overflow]
+                        self.dropped += overflow
+                raise
+            return len(entries)
+
+    def pending(self):
+        with self._lock:
+            return len(self._entries)
+
+def snapshot(obj, fields):
+    """Valores actuales de fields en obj, para comparar antes/después con changes_between"""
+    return {field: getattr(obj, field, None) for field in fields}
+
+def changes_between(before, after):
+    """Diff {campo: [antes, después]} solo de los campos que cambiaron"""
+    return {field: [before.get(field), value] for field, value in after.items() if before.get(field) != value}
+
+def record_many(action, target_type, changes_by_target):
+    """
+    Registrar una acción sobre varios objetos: changes_by_target es {target_id: changes}.
+    El actor y la IP salen del request actual.
+    """
+    actor = get_current_user() if has_request_context() else None
+    now = datetime.utcnow()
+    entries = [{
+        'created_at': now,
+        'actor_id': actor.id if actor else None,
+        'actor_email': actor.email if actor else None,
+        'action': action,
+        'target_type': target_type,
+        'target_id': str(target_id) if target_id is not None else None,
+        'changes': changes or None,
+        'ip': request.remote_addr if has_request_context() else None,
+    } for target_id, changes in changes_by_target.items()]
+    if entries:
+        current_app.extensions['audit_buffer'].add(entries)
+
+def record(action, target_type, target_id=None, changes=None):
+    """Registrar una acción de auditoría (no escribe en la base: ver AuditBuffer)"""
+    record_many(action, target_type, {target_id: changes})
+
+def flush_audit():
+    return current_app.extensions['audit_buffer'].flush()
+
+def parse_audit_filters(args):
+    """Leer los filtros de GET /api/admin/audit. Lanza ValueError si algún valor es inválido."""
+    filters = {}
+    for name in ('action', 'target_type', 'target_id'):
+        if args.get(name):
+            filters[name] = args[name]
+    if args.get('actor_id'):
+        try:
+            filters['actor_id'] = int(args['actor_id'])
+        except ValueError:
+            raise ValueError('actor_id debe ser un número')
+    if args.get('since'):
+        filters['since'] = parse_date('since', args['since'])
+    if args.get('until'):
+        filters['until'] = parse_date('until', args['until'], end_of_day=True)
+    return filters
+
+def query_audit_log(filters, cursor=None, limit=50):
+    """
+    Entradas más recientes primero, paginadas por id (keyset: cursor = último id visto).
+    Cada filtro usa un índice (columna filtrada, id).
+    """
+    query = AuditLog.query
+    for column in ('actor_id', 'action', 'target_type', 'target_id'):
+        if filters.get(column) is not None:
+            query = query.filter(getattr(AuditLog, column) == filters[column])
+    if filters.get('since'):
+        query = query.filter(AuditLog.created_at >= filters['since'])
+    if filters.get('until'):
+        query = query.filter(AuditLog.created_at < filters['until'])
+    if cursor:
+        query = query.filter(AuditLog.id < cursor)
+
+    entries = query.order_by(AuditLog.id.desc()).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return entries, (entries[-1].id if has_more else None)
+
+def purge_audit_log(batch_size=1000):
+    """Borrar en lotes las entradas más viejas que AUDIT_RETENTION_DAYS. Retorna la cantidad borrada."""
+    cutoff = datetime.utcnow() - timedelta(days=Config.AUDIT_RETENTION_DAYS)
+    total = 0
+    while True:
+        batch = db.session.query(AuditLog.id).filter(AuditLog.created_at < cutoff).limit(batch_size).subquery()
+        deleted = AuditLog.query.filter(AuditLog.id.in_(db.select(batch.c.id))).delete(synchronize_session=False)
+        db.session.commit()
+
+        total += deleted
+        if deleted < batch_size:
+            return total
@@ -0,0 +1,252 @@
+from functools import wraps
+from flask import request, jsonify, g, current_app
+from models import db, Usuario, UserRole, CacheVersion
+from cache_service import TTLCache
+import jwt
+import hmac
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from config import Config
+
+# Marcador para distinguir "aún no resuelto" de "resuelto como anónimo"
+_UNRESOLVED = object()
+# Fila de cache_versions que se incrementa cuando cambia algún usuario cacheado
+USERS = 'auth_users'
+
+class UsuarioSesion:
+    """
+    Copia liviana de los campos de un Usuario que necesitan las rutas autenticadas.
+    Se guarda en el cache de usuarios para no consultar la tabla en cada request.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self.id = data['id']
+        self.email = data['email']
+        self.activo = data['activo']
+        self.rol = data['rol']
+        self.has_access = data['has_access']
+        self.version = data.get('version')
+
+    @classmethod
+    def from_usuario(cls, usuario):
+        return cls(usuario.to_dict())
+
+    def is_admin(self):
+        return self.rol == UserRole.ADMIN.value
+
+    def has_course_access(self):
+        return self.has_access and self.activo
+
+    def to_dict(self):
+        return dict(self._data)
+
+class UserCache(TTLCache):
+    """
+    Cache de usuarios por worker. Los cambios se publican en la fila 'auth_users' de
+    cache_versions, compartida por todos los workers de gunicorn; cada worker la consulta
+    como mucho una vez cada AUTH_CACHE_VERSION_CHECK_INTERVAL segundos y, si cambió,
+    descarta todas sus copias. El worker que modifica al usuario lo invalida al instante.
+    """
+
+    def __init__(self, max_size=1000, ttl=30):
+        super().__init__(max_size=max_size, ttl=ttl)
+        self._version = None
+        self._checked_at = 0.0
+        self._version_lock = threading.Lock()
+
+    def sync(self):
+        if time.monotonic() - self._checked_at < Config.AUTH_CACHE_VERSION_CHECK_INTERVAL:
+            return
+
+        version = CacheVersion.current(USERS)
+        with self._version_lock:
+            if version != self._version:
+                self.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+def init_auth(app):
+    """Registrar el cache de usuarios y los hooks de autenticación en la aplicación"""
+    app.extensions['auth_user_cache'] = UserCache(
+        max_size=app.config.get('AUTH_CACHE_MAX_SIZE', 10000),
+        ttl=app.config.get('AUTH_CACHE_TTL', 30)
+    )
+
+    @app.before_request
+    def reset_auth_state():
+        # g vive en el contexto de aplicación, que puede reutilizarse entre requests (ej. tests)
+        for key in ('token_claims', 'current_user', 'auth_lookups', 'auth_db_queries'):
+            g.pop(key, None)
+
+    @app.after_request
+    def report_auth_lookups(response):
+        # Métricas: resoluciones de usuario (decode del token) y consultas a la tabla usuarios
+        response.headers['X-Auth-Lookups'] = str(g.get('auth_lookups', 0))
+        response.headers['X-Auth-DB-Queries'] = str(g.get('auth_db_queries', 0))
+        return response
+
+def _user_cache():
+    return current_app.extensions['auth_user_cache']
+
+def bump_users_version():
+    """
+    Publicar un cambio de usuarios a los demás workers (ver UserCache).
+    Llamar antes del commit; luego invalidate_user/invalidate_users para este worker.
+    """
+    CacheVersion.bump(USERS)
+
+def invalidate_user(user_id):
+    """Descartar la copia cacheada de un usuario luego de modificarlo"""
+    _user_cache().delete(user_id)
+
+def invalidate_users(user_ids):
+    """Descartar de una vez las copias cacheadas de varios usuarios (operaciones masivas)"""
+    _user_cache().delete_many(user_ids)
+
+def load_user(user_id):
+    """Obtener un usuario activo por id, usando el cache antes que la base de datos"""
+    cache = _user_cache()
+    cache.sync()
+    usuario = cache.get(user_id)
+    if usuario is None:
+        g.auth_db_queries = g.get('auth_db_queries', 0) + 1
+        row = db.session.get(Usuario, user_id)
+        if not row:
+            return None
+        usuario = UsuarioSesion.from_usuario(row)
+        cache.set(user_id, usuario)
+
+    return usuario if usuario.activo else None
+
+def create_access_token(usuario):
+    """
+    Token de acceso de vida corta con los claims de autorización firmados.
+    Permite autorizar rutas de curso y admin sin consultar la base de datos.
+    """
+    payload = {
+        'type': 'access',
+        'user_id': usuario.id,
+        'email': usuario.email,
+        'rol': usuario.rol,
+        'has_access': usuario.has_course_access(),
+        'exp': datetime.utcnow() + timedelta(minutes=Config.JWT_ACCESS_TOKEN_MINUTES)
+    }
+    return jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm='HS256')
+
+def password_stamp(usuario):
+    """
+    Huella del hash de la contraseña: cambia al restablecerla, y con ella
+    quedan invalidados los tokens de refresco emitidos antes
+    """
+    return hmac.new(Config.JWT_SECRET_KEY.encode(), usuario.password_hash.encode(),
+                    hashlib.sha256).hexdigest()[:16]
+
+def create_refresh_token(usuario):
+    """Token de refresco de vida larga: identifica al usuario y a su contraseña actual"""
+    payload = {
+        'type': 'refresh',
+        'user_id': usuario.id,
+        'pwd': password_stamp(usuario),
+        'exp': datetime.utcnow() + timedelta(days=Config.JWT_REFRESH_TOKEN_DAYS)
+    }
+    return jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm='HS256')
+
+def decode_token(token, token_type='access'):
+    """
+    Decodificar y validar un token del tipo indicado. Retorna el payload o None.
+    Los tokens emitidos antes de existir 'type' se aceptan como tokens de acceso.
+    """
+    try:
+        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+    except jwt.PyJWTError:
+        return None
+
+    if payload.get('type', 'access') != token_type or 'user_id' not in payload:
+        return None
+    return payload
+
+def get_bearer_token():
+    """Extraer el token Bearer del header Authorization"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
+
+def get_token_claims():
+    """Claims del token de acceso del request, memorizados en flask.g"""
+    claims = g.get('token_claims', _UNRESOLVED)
+    if claims is _UNRESOLVED:
+        token = get_bearer_token()
+        claims = None
+        if token:
+            g.auth_lookups = g.get('auth_lookups', 0) + 1
+            claims = decode_token(token)
+        g.token_claims = claims
+    return claims
+
+def get_current_user_id():
+    claims = get_token_claims()
+    return claims['user_id'] if claims else None
+
+def get_current_user():
+    """
+    Obtener el usuario actual desde el token JWT.
+    El resultado se memoriza en flask.g: como máximo un decode y una consulta por request.
+    """
+    usuario = g.get('current_user', _UNRESOLVED)
+    if usuario is _UNRESOLVED:
+        user_id = get_current_user_id()
+        usuario = load_user(user_id) if user_id else None
+        g.current_user = usuario
+    return usuario
+
+def _authorize(claim_allows, user_allows, forbidden_message):
+    """
+    Autorizar con los claims firmados del token si los conceden; si no los conceden
+    (o es un token antiguo sin claims) se verifica contra el usuario actual.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            claims = get_token_claims()
+            if not claims:
+                return jsonify({'error': 'Usuario no autenticado'}), 401
+
+            if not ('rol' in claims and claim_allows(claims)):
+                usuario = get_current_user()
+                if not usuario:
+                    return jsonify({'error': 'Usuario no autenticado'}), 401
+                if not user_allows(usuario):
+                    return jsonify({'error': forbidden_message}), 403
+
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def login_required(view):
+    """Decorador: requiere un usuario autenticado y activo"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not get_current_user():
+            return jsonify({'error': 'Usuario no autenticado'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def admin_required(view):
+    """Decorador: requiere rol de administrador (claim del token o, si falta, el usuario)"""
+    return _authorize(
+        lambda claims: claims['rol'] == UserRole.ADMIN.value,
+        lambda usuario: usuario.is_admin(),
+        'Acceso denegado. Se requieren permisos de administrador'
+    )(view)
+
+def course_access_required(view):
+    """Decorador: requiere acceso al curso (claim del token o, si falta, el usuario)"""
+    return _authorize(
+        lambda claims: claims.get('has_access') is True,
+        lambda usuario: usuario.has_course_access(),
+        'No tienes acceso al curso'
+    )(view)
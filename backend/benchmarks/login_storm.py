@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ráfaga de logins concurrentes, antes y después del pool de hashing.
+
+Compara el hashing en línea (PASSWORD_HASH_CONCURRENCY=0, comportamiento anterior)
+con el pool acotado de password_service. Mientras dura la ráfaga, un cliente aparte
+consulta /api/course/check-access para medir cuánto se degradan los requests comunes.
+Los percentiles son solo de los logins con 200; 429 y 503 se cuentan aparte.
+
+Uso:
+    python benchmarks/login_storm.py --logins 32 --clients 16
+"""
+
+import argparse
+from collections import Counter
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+_db_file = os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{_db_file}')
+
+from app import create_app
+from config import Config
+from models import db, Usuario
+from password_service import hash_password
+
+PASSWORD = 'password123'
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+def seed_users(app, count):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # Un único hash compartido: sembrar no debe medir el costo de hashing
+        password_hash = hash_password(PASSWORD)
+        for i in range(count):
+            db.session.add(Usuario(email=f'bench{i}@example.com', nombre='Bench', apellido=str(i),
+                                   password_hash=password_hash, email_confirmed=True))
+        db.session.commit()
+
+def run_storm(app, logins, clients):
+    # Solo se miden los logins exitosos: un 429 o 503 rápido no es un login completado
+    login_times, statuses = [], Counter()
+    probe_times = []
+    stop = threading.Event()
+
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'bench0@example.com', 'password': PASSWORD}).get_json()['token']
+
+    def probe():
+        probe_client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            probe_client.get('/api/course/check-access', headers={'Authorization': f'Bearer {token}'})
+            probe_times.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    def login(i):
+        start = time.perf_counter()
+        response = app.test_client().post('/api/auth/login',
+                                          json={'email': f'bench{i % clients}@example.com', 'password': PASSWORD})
+        return response.status_code, time.perf_counter() - start
+
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for status, elapsed in pool.map(login, range(logins)):
+            statuses[status] += 1
+            if status == 200:
+                login_times.append(elapsed)
+    stop.set()
+    probe_thread.join()
+
+    return login_times, statuses, probe_times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--logins', type=int, default=32)
+    parser.add_argument('--clients', type=int, default=16)
+    args = parser.parse_args()
+
+    app = create_app()
+    # Se mide el hashing: el rate limiting cortaría la ráfaga con 429 antes de llegar al hash
+    app.config['RATE_LIMIT_ENABLED'] = False
+    seed_users(app, args.clients)
+
+    pooled_concurrency = Config.PASSWORD_HASH_CONCURRENCY
+    print(f"Hash: {Config.PASSWORD_HASH_METHOD} | {args.logins} logins, {args.clients} clientes concurrentes\n")
+    print(f"{'modo':<22}{'login p50':>11}{'login p99':>11}{'200':>6}{'429':>6}{'503':>6}{'otros':>7}{'probe p99':>11}")
+
+    for label, concurrency in (('en línea (antes)', 0), (f'pool={pooled_concurrency} (después)', pooled_concurrency)):
+        Config.PASSWORD_HASH_CONCURRENCY = concurrency
+        login_times, statuses, probe_times = run_storm(app, args.logins, args.clients)
+        others = sum(count for status, count in statuses.items() if status not in (200, 429, 503))
+        print(f"{label:<22}{percentile(login_times, 50):>10.3f}s{percentile(login_times, 99):>10.3f}s"
+              f"{statuses[200]:>6}{statuses[429]:>6}{statuses[503]:>6}{others:>7}{percentile(probe_times, 99):>10.3f}s")
+
+if __name__ == '__main__':
+    main()
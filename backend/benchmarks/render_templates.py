@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark: costo de armar un email con plantillas precompiladas vs. compilarlas en cada envío.
+
+"precompiladas" usa EmailTemplates (compilación única al iniciar). "compilando cada vez"
+crea un Environment nuevo por email, que es lo que pasaría sin la caché de plantillas.
+
+Uso:
+    python benchmarks/render_templates.py --renders 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from template_service import EmailTemplates
+
+CONTEXTS = {
+    'confirmation': dict(user_name='Ana', action_url='http://localhost/confirm-email?token=abc'),
+    'password_reset': dict(user_name='Ana', action_url='http://localhost/reset-password?token=abc', expires_minutes=60),
+}
+
+def bench(render, renders, kinds, locales):
+    start = time.perf_counter()
+    for i in range(renders):
+        kind = kinds[i % len(kinds)]
+        render(kind, locales[i % len(locales)], **CONTEXTS.get(kind, {}))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--renders', type=int, default=2000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    templates = EmailTemplates()
+    startup = time.perf_counter() - start
+
+    def compile_each_time(kind, locale, **context):
+        return EmailTemplates().render(kind, locale, **context)
+
+    print(f"Plantillas: {', '.join(templates.kinds)} | locales: {', '.join(templates.locales)}")
+    print(f"Compilación al iniciar: {startup * 1000:.1f}ms\n")
+    print(f"{'modo':<22}{'renders':>9}{'por email':>12}{'emails/s':>11}")
+
+    for label, render, renders in (('compilando cada vez', compile_each_time, max(1, args.renders // 20)),
+                                   ('precompiladas', templates.render, args.renders)):
+        elapsed = bench(render, renders, templates.kinds, templates.locales)
+        print(f"{label:<22}{renders:>9}{elapsed / renders * 1e6:>10.0f}us{renders / elapsed:>11.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latencia de la búsqueda de usuarios (typeahead) con el índice en memoria.
+
+Siembra N usuarios en SQLite y mide search_users con términos de distinto largo,
+comparando con un LIKE '%term%' sobre la tabla (lo que haría la búsqueda sin índice).
+
+Uso:
+    python benchmarks/user_search.py --users 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+_db_file = os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{_db_file}')
+
+from app import create_app
+from models import db, Usuario
+from sqlalchemy import or_
+from user_search_service import search_users
+
+NOMBRES = ['Ana', 'Juan', 'María', 'Pedro', 'Lucía', 'Mateo', 'Sofía', 'Martín', 'Valentina', 'Diego']
+APELLIDOS = ['Gómez', 'Pérez', 'Rodríguez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Sánchez', 'Romero', 'Álvarez']
+TERMS = ['a', 'ju', 'mar', 'gomez', 'user4242', 'user99999@example.com', 'lucía dí', 'xyz']
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def seed_users(count):
+    db.drop_all()
+    db.create_all()
+    random.seed(1)
+    db.session.execute(Usuario.__table__.insert(), [
+        dict(email=f'user{i}@example.com', nombre=random.choice(NOMBRES), apellido=random.choice(APELLIDOS),
+             password_hash='x', rol='user')
+        for i in range(count)
+    ])
+    db.session.commit()
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        seed_users(args.users)
+
+        start = time.perf_counter()
+        search_users('warmup')
+        print(f"{args.users} usuarios | construcción del índice: {time.perf_counter() - start:.2f}s\n")
+        print(f"{'término':<24}{'índice p50':>12}{'índice p99':>12}{'LIKE p50':>12}")
+
+        for term in TERMS:
+            indexed = timed(lambda: search_users(term), args.repeat)
+            pattern = f'%{term}%'
+            like = timed(lambda: Usuario.query.filter(or_(Usuario.email.ilike(pattern), Usuario.nombre.ilike(pattern),
+                                                          Usuario.apellido.ilike(pattern))).limit(10).all(),
+                         max(1, args.repeat // 4))
+            print(f"{term:<24}{percentile(indexed, 50) * 1000:>10.2f}ms{percentile(indexed, 99) * 1000:>10.2f}ms"
+                  f"{percentile(like, 50) * 1000:>10.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+from models import CourseContent, CacheVersion
+from flask import current_app
+from sqlalchemy.orm import load_only
+import threading
+import time
+from config import Config
+
+CATALOG = 'course_catalog'
+# Tope de combinaciones de ?fields= serializadas por versión (evita crecer sin límite)
+MAX_CACHED_FIELD_SETS = 32
+
+def init_catalog(app):
+    app.extensions['course_catalog'] = CatalogCache()
+
+def bump_catalog_version():
+    """
+    Incrementar la versión del catálogo en cache_versions (UPSERT de una fila).
+    Llamar antes del commit que modifica el contenido: la versión nueva se publica
+    en la misma transacción y los demás workers la ven en su próxima verificación.
+    """
+    CacheVersion.bump(CATALOG)
+
+def invalidate_catalog():
+    """Descartar el catálogo de este worker (luego del commit que lo modificó)"""
+    current_app.extensions['course_catalog'].invalidate()
+
+def parse_content_fields(fields=None, view=None):
+    """
+    Campos pedidos con ?fields=a,b o ?view=summary|full. Retorna una tupla ordenada
+    (sirve como clave de caché; siempre incluye id) o lanza ValueError.
+    """
+    if fields:
+        requested = {field.strip() for field in fields.split(',') if field.strip()}
+        unknown = requested - set(CourseContent.FIELDS)
+        if unknown:
+            raise ValueError(f'Campos desconocidos: {", ".join(sorted(unknown))}')
+    elif view in (None, '', 'full'):
+        requested = set(CourseContent.FIELDS)
+    elif view == 'summary':
+        requested = set(CourseContent.SUMMARY_FIELDS)
+    else:
+        raise ValueError('view debe ser summary o full')
+    return tuple(field for field in CourseContent.FIELDS if field in requested | {'id'})
+
+def content_query(fields):
+    """Consulta de contenidos que trae de la base solo las columnas de los campos pedidos"""
+    return CourseContent.query.options(load_only(*CourseContent.columns_for(fields)))
+
+def get_catalog(fields):
+    """Retorna (versión, JSON serializado de la lista de videos con esos campos)"""
+    return current_app.extensions['course_catalog'].get(fields)
+
+def get_catalog_version():
+    return current_app.extensions['course_catalog'].version()
+
+class CatalogCache:
+    """
+    Lista de videos del curso ya serializada a JSON (bytes), por worker y por
+    combinación de campos.
+
+    La versión vigente vive en la fila 'course_catalog' de cache_versions, compartida
+    por todos los workers de gunicorn. Se consulta como mucho una vez cada
+    CATALOG_VERSION_CHECK_INTERVAL segundos: entre verificaciones, servir el catálogo
+    no toca la base. El worker que edita el contenido invalida su copia al instante;
+    los demás, en la próxima verificación.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry = None  # (versión, {campos: bytes}): se reemplaza entero al cambiar la versión
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        self._entry = None
+
+    def _current(self):
+        entry = self._entry
+        if entry is not None and time.monotonic() - self._checked_at < Config.CATALOG_VERSION_CHECK_INTERVAL:
+            return entry
+
+        version = CacheVersion.current(CATALOG)
+        with self._lock:
+            entry = self._entry
+            if entry is None or entry[0] != version:
+                entry = (version, {})
+                self._entry = entry
+            self._checked_at = time.monotonic()
+            return entry
+
+    def version(self):
+        return self._current()[0]
+
+    def get(self, fields):
+        version, bodies = self._current()
+        body = bodies.get(fields)
+        if body is None:
+            content_list = content_query(fields).order_by(CourseContent.video_id).all()
+            body = current_app.json.dumps([content.to_dict(fields) for content in content_list]).encode()
+            if len(bodies) >= MAX_CACHED_FIELD_SETS:
+                bodies.clear()
+            bodies[fields] = body
+        return version, body
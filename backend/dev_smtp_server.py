@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Servidor SMTP local para desarrollo (requiere aiosmtpd, ver tests/requirements.txt).
+
+Acepta cualquier usuario/contraseña y muestra por consola los emails recibidos,
+para probar el outbox y el worker sin una cuenta real. Configurar el backend con:
+
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=False
+    MAIL_USERNAME=dev MAIL_PASSWORD=dev
+
+Uso:
+    python dev_smtp_server.py [--port 1025]
+"""
+import argparse
+import time
+from email import message_from_bytes
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+class PrintHandler:
+    async def handle_DATA(self, server, session, envelope):
+        message = message_from_bytes(envelope.content)
+        print(f"📨 {envelope.mail_from} -> {', '.join(envelope.rcpt_tos)} | {message['Subject']}")
+        return '250 Message accepted for delivery'
+
+def accept_any(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor SMTP local para desarrollo')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+
+    controller = Controller(PrintHandler(), hostname=args.host, port=args.port,
+                            authenticator=accept_any, auth_require_tls=False)
+    controller.start()
+    print(f"📭 SMTP de desarrollo escuchando en {args.host}:{args.port} (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        controller.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+from models import db, EmailOutbox
+from email_service import build_confirmation_email, build_password_reset_email, build_announcement_email, build_welcome_email, send_messages, request_locale
+from datetime import datetime, timedelta
+from config import Config
+
+# Tipo de email -> función que arma el mensaje. Se llama con (recipient, **payload).
+BUILDERS = {
+    'confirmation': build_confirmation_email,
+    'password_reset': build_password_reset_email,
+    'announcement': build_announcement_email,
+    'welcome': build_welcome_email,
+}
+
+# Claves del payload con tokens en claro: no se conservan en los mensajes muertos
+SECRET_PAYLOAD_KEYS = ('confirmation_token', 'reset_token')
+
+def queue_email(kind, recipient, **payload):
+    """
+    Encolar un email en la sesión actual, sin hacer commit: se persiste en la
+    misma transacción que el cambio que lo origina (ej. el alta del usuario).
+    """
+    if kind not in BUILDERS:
+        raise ValueError(f'Tipo de email desconocido: {kind}')
+    payload.setdefault('locale', request_locale())
+
+    message = EmailOutbox(kind=kind, recipient=recipient, payload=payload)
+    db.session.add(message)
+    return message
+
+def retry_delay(attempts):
+    """Backoff exponencial: base, 2*base, 4*base... con tope"""
+    return min(Config.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), Config.EMAIL_RETRY_MAX_SECONDS)
+
+def claim_batch(batch_size):
+    """
+    Tomar los mensajes listos para enviar. Cada mensaje tomado queda "arrendado"
+    EMAIL_SEND_LEASE_SECONDS: si el worker muere a mitad de envío, otro lo retoma.
+    En PostgreSQL SKIP LOCKED permite correr varios workers en paralelo.
+    """
+    now = datetime.utcnow()
+    messages = EmailOutbox.query.filter(
+        EmailOutbox.status.in_(['pending', 'sending']),
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    for message in messages:
+        message.status = 'sending'
+        message.attempts += 1
+        message.next_attempt_at = now + timedelta(seconds=Config.EMAIL_SEND_LEASE_SECONDS)
+    db.session.commit()
+    return messages
+
+def mark_sent(message):
+    message.status = 'sent'
+    message.sent_at = datetime.utcnow()
+    message.payload = None  # No conservar tokens en claro
+    message.last_error = None
+
+def mark_failed(message, error):
+    message.last_error = error
+    if message.attempts >= Config.EMAIL_MAX_ATTEMPTS:
+        message.status = 'dead'
+        # Se conserva el resto para diagnosticar; el token ya no se va a usar
+        message.payload = {k: v for k, v in (message.payload or {}).items() if k not in SECRET_PAYLOAD_KEYS}
+    else:
+        message.status = 'pending'
+        message.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay(message.attempts))
+
+def deliver(messages):
+    """
+    Armar y enviar los mensajes por una misma sesión SMTP.
+    Retorna una lista con None (enviado) o el texto del error para cada mensaje.
+    """
+    errors = [None] * len(messages)
+    built = []
+    for i, message in enumerate(messages):
+        try:
+            built.append((i, BUILDERS[message.kind](message.recipient, **(message.payload or {}))))
+        except Exception as e:
+            errors[i] = str(e)
+
+    if built:
+        try:
+            results = send_messages([msg for _, msg in built])
+        except Exception as e:
+            results = [str(e)] * len(built)
+        for (i, _), error in zip(built, results):
+            errors[i] = error
+
+    return errors
+
+def process_outbox(batch_size=None):
+    """Procesar un lote del outbox. Retorna la cantidad de mensajes procesados."""
+    messages = claim_batch(batch_size or Config.EMAIL_WORKER_BATCH_SIZE)
+    if not messages:
+        return 0
+
+    for message, error in zip(messages, deliver(messages)):
+        if error is None:
+            mark_sent(message)
+        else:
+            mark_failed(message, error)
+    db.session.commit()
+
+    return len(messages)
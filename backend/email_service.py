@@ -1,14 +1,35 @@
 from flask_mail import Mail, Message
+from flask import current_app, request, has_request_context
 import secrets
 import jwt
 from datetime import datetime, timedelta
 from config import Config
+from models import db, Announcement
+from mail_transport import SMTPConnectionPool
+from template_service import EmailTemplates
 
 mail = Mail()
 
 def init_mail(app):
-    """Inicializar Flask-Mail con la aplicación"""
+    """Inicializar Flask-Mail y el pool de conexiones SMTP de la aplicación"""
     mail.init_app(app)
+    app.extensions['mail_transport'] = SMTPConnectionPool.from_config(app.config)
+    app.extensions['email_templates'] = EmailTemplates(default_locale=app.config.get('EMAIL_DEFAULT_LOCALE', 'es'))
+
+def get_transport():
+    """Pool SMTP de la aplicación actual"""
+    return current_app.extensions['mail_transport']
+
+def get_templates():
+    """Plantillas de email precompiladas de la aplicación actual"""
+    return current_app.extensions['email_templates']
+
+def request_locale():
+    """Locale del email según el Accept-Language del request actual"""
+    templates = get_templates()
+    if not has_request_context():
+        return templates.default_locale
+    return templates.best_locale(request.accept_languages)
 
 def generate_confirmation_token():
     """Generar un token único para confirmación de email"""
@@ -18,87 +39,82 @@ def generate_password_reset_token():
     """Generar un token único para reset de contraseña"""
     return secrets.token_urlsafe(32)
 
+def build_message(kind, user_email, locale=None, **context):
+    """Armar un email a partir de su plantilla precompilada (sin enviarlo)"""
+    subject, html, text = get_templates().render(kind, locale, **context)
+    msg = Message(
+        subject=subject,
+        sender=Config.MAIL_DEFAULT_SENDER,
+        recipients=[user_email]
+    )
+    msg.html = html
+    msg.body = text
+    return msg
+
+def build_confirmation_email(user_email, user_name, confirmation_token, locale=None):
+    """Armar el email de confirmación (sin enviarlo)"""
+    # URL de confirmación usando la configuración
+    frontend_url = current_app.config.get('FRONTEND_URL', 'http://localhost')
+    return build_message(
+        'confirmation', user_email, locale,
+        user_name=user_name,
+        action_url=f"{frontend_url}/confirm-email?token={confirmation_token}"
+    )
+
+def build_password_reset_email(user_email, user_name, reset_token, locale=None):
+    """Armar el email de reset de contraseña (sin enviarlo)"""
+    # URL de reset usando la configuración
+    frontend_url = current_app.config.get('FRONTEND_URL', 'http://localhost')
+    return build_message(
+        'password_reset', user_email, locale,
+        user_name=user_name,
+        action_url=f"{frontend_url}/reset-password?token={reset_token}",
+        expires_minutes=Config.PASSWORD_RESET_TOKEN_MINUTES
+    )
+
+def build_welcome_email(user_email, user_name, reset_token, locale=None):
+    """Armar el email de bienvenida de un usuario importado, con el enlace para elegir contraseña"""
+    frontend_url = current_app.config.get('FRONTEND_URL', 'http://localhost')
+    return build_message(
+        'welcome', user_email, locale,
+        user_name=user_name,
+        action_url=f"{frontend_url}/reset-password?token={reset_token}",
+        expires_days=Config.IMPORT_WELCOME_TOKEN_DAYS
+    )
+
+def build_announcement_email(user_email, user_name, announcement_id, locale=None):
+    """Armar el email de un anuncio masivo (sin enviarlo)"""
+    announcement = db.session.get(Announcement, announcement_id)
+    frontend_url = current_app.config.get('FRONTEND_URL', 'http://localhost')
+    action_url = f"{frontend_url}/course"
+    if announcement.video_id:
+        action_url += f"?video={announcement.video_id}"
+
+    return build_message(
+        'announcement', user_email, locale,
+        user_name=user_name,
+        announcement_subject=announcement.subject,
+        announcement_message=announcement.message,
+        action_url=action_url
+    )
+
+def send_messages(messages):
+    """
+    Enviar varios emails reutilizando una sesión SMTP del pool.
+    Retorna una lista con None (enviado) o el texto del error para cada mensaje.
+    """
+    return get_transport().send_messages(messages)
+
 def send_confirmation_email(user_email, user_name, confirmation_token):
     """Enviar email de confirmación"""
     try:
-        from flask import current_app
-        
-        # Verificar que estamos en contexto de aplicación
-        if not current_app:
-            print("Error: No hay contexto de aplicación Flask")
+        error = get_transport().send(build_confirmation_email(user_email, user_name, confirmation_token))
+        if error:
+            print(f"Error enviando email de confirmación: {error}")
             return False
-        
-        # En desarrollo, si no hay configuración real de email, simular envío
-        mail_password = current_app.config.get('MAIL_PASSWORD', '')
-        if not mail_password or mail_password.startswith('your_'):
-            print(f"📧 [MODO DESARROLLO] Email de confirmación simulado para {user_email}")
-            print(f"🔗 Token: {confirmation_token}")
-            print(f"🌐 URL de confirmación: {current_app.config.get('FRONTEND_URL', 'http://localhost')}/confirm-email?token={confirmation_token}")
-            return True
-            
-        # URL de confirmación usando la configuración
-        frontend_url = current_app.config.get('FRONTEND_URL', 'http://localhost')
-        confirmation_url = f"{frontend_url}/confirm-email?token={confirmation_token}"
-        
-        # Crear mensaje
-        msg = Message(
-            subject='Confirma tu email - Curso de Hongos',
-            sender=Config.MAIL_DEFAULT_SENDER,
-            recipients=[user_email]
-        )
-        
-        # Contenido del email
-        msg.html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2c5530;">¡Bienvenido al Curso de Hongos!</h2>
-                <p>Hola <strong>{user_name}</strong>,</p>
-                <p>Gracias por registrarte en nuestro curso. Para completar tu registro, necesitas confirmar tu dirección de email.</p>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="{confirmation_url}" 
-                       style="background-color: #2c5530; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                        Confirmar Email
-                    </a>
-                </div>
-                
-                <p>Si no puedes hacer clic en el botón, copia y pega este enlace en tu navegador:</p>
-                <p style="word-break: break-all; color: #666;">{confirmation_url}</p>
-                
-                <p style="margin-top: 30px; color: #666; font-size: 14px;">
-                    Si no te registraste en nuestro curso, puedes ignorar este email.
-                </p>
-                
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                <p style="color: #666; font-size: 12px;">
-                    Espacio Thaumazein - Curso de Hongos
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Agregar versión de texto plano
-        msg.body = f"""
-        ¡Bienvenido al Curso de Hongos!
-        
-        Hola {user_name},
-        
-        Gracias por registrarte en nuestro curso. Para completar tu registro, necesitas confirmar tu dirección de email.
-        
-        Haz clic en este enlace para confirmar: {confirmation_url}
-        
-        Si no te registraste en nuestro curso, puedes ignorar este email.
-        
-        Espacio Thaumazein - Curso de Hongos
-        """
-        
-        # Enviar email
-        mail.send(msg)
         print(f"Email de confirmación enviado exitosamente a {user_email}")
         return True
-        
+
     except Exception as e:
         print(f"Error enviando email de confirmación: {str(e)}")
         import traceback
@@ -108,88 +124,13 @@ def send_confirmation_email(user_email, user_name, confirmation_token):
 def send_password_reset_email(user_email, user_name, reset_token):
     """Enviar email de reset de contraseña"""
     try:
-        from flask import current_app
-        
-        # Verificar que estamos en contexto de aplicación
-        if not current_app:
-            print("Error: No hay contexto de aplicación Flask")
+        error = get_transport().send(build_password_reset_email(user_email, user_name, reset_token))
+        if error:
+            print(f"Error enviando email de reset de contraseña: {error}")
             return False
-        
-        # En desarrollo, si no hay configuración real de email, simular envío
-        mail_password = current_app.config.get('MAIL_PASSWORD', '')
-        if not mail_password or mail_password.startswith('your_'):
-            print(f"📧 [MODO DESARROLLO] Email de reset simulado para {user_email}")
-            print(f"🔗 Token: {reset_token}")
-            print(f"🌐 URL de reset: {current_app.config.get('FRONTEND_URL', 'http://localhost')}/reset-password?token={reset_token}")
-            return True
-            
-        # URL de reset usando la configuración
-        frontend_url = current_app.config.get('FRONTEND_URL', 'http://localhost')
-        reset_url = f"{frontend_url}/reset-password?token={reset_token}"
-        
-        # Crear mensaje
-        msg = Message(
-            subject='Restablece tu contraseña - Curso de Hongos',
-            sender=Config.MAIL_DEFAULT_SENDER,
-            recipients=[user_email]
-        )
-        
-        # Contenido del email
-        msg.html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2c5530;">Restablece tu contraseña</h2>
-                <p>Hola <strong>{user_name}</strong>,</p>
-                <p>Has solicitado restablecer tu contraseña para acceder al Curso de Hongos.</p>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="{reset_url}" 
-                       style="background-color: #2c5530; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                        Restablecer Contraseña
-                    </a>
-                </div>
-                
-                <p>Si no puedes hacer clic en el botón, copia y pega este enlace en tu navegador:</p>
-                <p style="word-break: break-all; color: #666;">{reset_url}</p>
-                
-                <p style="color: #e74c3c; font-weight: bold;">Este enlace expirará en 1 hora por seguridad.</p>
-                
-                <p style="margin-top: 30px; color: #666; font-size: 14px;">
-                    Si no solicitaste este cambio de contraseña, puedes ignorar este email. Tu contraseña actual seguirá siendo válida.
-                </p>
-                
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                <p style="color: #666; font-size: 12px;">
-                    Espacio Thaumazein - Curso de Hongos
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Agregar versión de texto plano
-        msg.body = f"""
-        Restablece tu contraseña - Curso de Hongos
-        
-        Hola {user_name},
-        
-        Has solicitado restablecer tu contraseña para acceder al Curso de Hongos.
-        
-        Haz clic en este enlace para restablecer tu contraseña: {reset_url}
-        
-        Este enlace expirará en 1 hora por seguridad.
-        
-        Si no solicitaste este cambio de contraseña, puedes ignorar este email.
-        
-        Espacio Thaumazein - Curso de Hongos
-        """
-        
-        # Enviar email
-        mail.send(msg)
         print(f"Email de reset de contraseña enviado exitosamente a {user_email}")
         return True
-        
+
     except Exception as e:
         print(f"Error enviando email de reset de contraseña: {str(e)}")
         import traceback
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Worker que vacía el outbox de emails (tabla email_outbox).
+
+Los requests solo encolan los emails; este proceso los envía con reintentos
+y backoff exponencial. Tras EMAIL_MAX_ATTEMPTS fallos el mensaje queda en 'dead'.
+
+Entre lote y lote del outbox también envía los anuncios masivos, por tramos de
+ANNOUNCEMENT_BATCH_SIZE y a no más de ANNOUNCEMENT_RATE_PER_SECOND emails por
+segundo, para que los emails transaccionales nunca queden detrás de un anuncio.
+
+Uso:
+    python email_worker.py           # procesar en loop
+    python email_worker.py --once    # procesar lo pendiente y salir
+"""
+import argparse
+import time
+from app import create_app
+from config import Config
+from models import db
+from email_outbox import process_outbox
+from announcement_service import process_announcement_batch
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker del outbox de emails')
+    parser.add_argument('--once', action='store_true', help='Procesar lo pendiente y salir')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print("📬 Worker de emails iniciado")
+        next_announcement_at = 0.0
+        while True:
+            try:
+                processed = process_outbox()
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error procesando el outbox: {e}")
+                processed = 0
+
+            announced = 0
+            if time.monotonic() >= next_announcement_at:
+                started = time.monotonic()
+                try:
+                    announced = process_announcement_batch()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Error enviando anuncios: {e}")
+                # Throttle: el próximo tramo no sale antes de respetar el límite de emails/segundo
+                next_announcement_at = started + announced / Config.ANNOUNCEMENT_RATE_PER_SECOND
+
+            if processed:
+                print(f"📧 Mensajes procesados: {processed}")
+            if announced:
+                print(f"📣 Anuncios enviados: {announced}")
+            if processed or announced:
+                continue  # Puede haber más pendientes: seguir sin esperar
+
+            if args.once and next_announcement_at <= time.monotonic():
+                break
+            wait = Config.EMAIL_WORKER_POLL_INTERVAL
+            if next_announcement_at > time.monotonic():
+                wait = min(wait, next_announcement_at - time.monotonic())
+            time.sleep(wait)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+from flask import request, make_response
+from hashlib import blake2b
+from config import Config
+
+def make_etag(*parts):
+    """
+    ETag fuerte a partir de una clave de versión barata (ids, contadores de versión,
+    fechas de actualización), sin serializar ni hashear el cuerpo de la respuesta.
+    ETAG_SALT cambia los ETags cuando cambia el formato de las respuestas (deploys).
+    """
+    key = repr((Config.ETAG_SALT,) + parts).encode()
+    return blake2b(key, digest_size=12).hexdigest()
+
+def conditional_response(etag, build):
+    """
+    Responder 304 sin cuerpo si el If-None-Match del cliente incluye etag; si no,
+    build() arma la respuesta completa (la serialización solo corre en ese caso).
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    # Las respuestas dependen del usuario: el navegador las guarda pero revalida siempre
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    return response
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Importar usuarios desde un CSV con columnas email, nombre y apellido.
+
+Los emails ya registrados se omiten. A cada usuario nuevo se le encola un email de
+bienvenida con un enlace para elegir su contraseña (lo envía email_worker.py).
+
+Uso:
+    python import_users.py usuarios.csv
+    python import_users.py usuarios.csv --grant-access --no-welcome
+    python import_users.py usuarios.csv --dry-run    # solo validar
+"""
+import argparse
+import json
+import time
+from app import create_app
+from user_import_service import import_users
+
+def main():
+    parser = argparse.ArgumentParser(description='Importar usuarios desde un CSV')
+    parser.add_argument('archivo', help='CSV con columnas email, nombre, apellido')
+    parser.add_argument('--grant-access', action='store_true', help='Dar acceso al curso a los importados')
+    parser.add_argument('--no-welcome', action='store_true', help='No encolar el email de bienvenida')
+    parser.add_argument('--dry-run', action='store_true', help='Validar el archivo sin importar')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context(), open(args.archivo, encoding='utf-8-sig', newline='') as lines:
+        start = time.perf_counter()
+        summary = import_users(lines, grant_access=args.grant_access,
+                               send_welcome=not args.no_welcome, dry_run=args.dry_run)
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    print(f"✅ {summary['imported']} importados, {summary['skipped_existing']} ya existían, "
+          f"{summary['invalid']} inválidos ({elapsed:.1f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
 from models import db, CourseContent
+from catalog_service import bump_catalog_version
 
 def init_course_content():
     """Crear la tabla y contenido inicial"""
@@ -79,6 +80,7 @@ def init_course_content():
             content = CourseContent(**video_data)
             db.session.add(content)
         
+        bump_catalog_version()  # Los workers en marcha recargan el catálogo
         db.session.commit()
         print(f"✅ Se crearon {len(videos_data)} contenidos iniciales del curso.")
 
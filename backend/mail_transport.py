@@ -0,0 +1,152 @@
+from flask_mail import sanitize_address
+import smtplib
+import threading
+import time
+
+# Errores de un mensaje puntual (remitente, destinatarios o contenido rechazados)
+MESSAGE_ERRORS = (smtplib.SMTPSenderRefused, smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)
+
+class SMTPConnectionPool:
+    """
+    Pool de sesiones SMTP autenticadas y persistentes.
+
+    Cada sesión se reutiliza entre envíos (sin repetir TLS + login), se descarta
+    si estuvo inactiva más de idle_timeout segundos y se reconecta si el servidor
+    la cerró. pool_size limita las sesiones abiertas a la vez por proceso.
+    """
+
+    def __init__(self, server, port, use_tls=False, use_ssl=False, username=None, password=None,
+                 pool_size=2, idle_timeout=60, timeout=30):
+        self.server = server
+        self.port = port
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []  # [(conexión, último uso)]
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            server=config.get('MAIL_SERVER'),
+            port=config.get('MAIL_PORT'),
+            use_tls=config.get('MAIL_USE_TLS', False),
+            use_ssl=config.get('MAIL_USE_SSL', False),
+            username=config.get('MAIL_USERNAME'),
+            password=config.get('MAIL_PASSWORD'),
+            pool_size=config.get('MAIL_POOL_SIZE', 2),
+            idle_timeout=config.get('MAIL_POOL_IDLE_TIMEOUT', 60),
+            timeout=config.get('MAIL_TIMEOUT', 30)
+        )
+
+    def is_simulated(self):
+        """En desarrollo, sin credenciales reales, los emails solo se muestran por consola"""
+        return not self.password or self.password.startswith('your_')
+
+    def _connect(self):
+        if self.use_ssl:
+            host = smtplib.SMTP_SSL(self.server, self.port, timeout=self.timeout)
+        else:
+            host = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                host.starttls()
+            if self.username and self.password:
+                host.login(self.username, self.password)
+        except Exception:
+            self._quit(host)
+            raise
+        return host
+
+    def _acquire(self):
+        """Tomar un lugar del pool y, si hay, una sesión inactiva reutilizable (o None)"""
+        self._slots.acquire()
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                host, last_used = self._idle.pop()
+                if now - last_used < self.idle_timeout:
+                    return host
+                self._quit(host)
+        return None
+
+    def _release(self, host):
+        if host is not None:
+            with self._lock:
+                self._idle.append((host, time.monotonic()))
+        self._slots.release()
+
+    @staticmethod
+    def _quit(host):
+        try:
+            host.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _sendmail(host, message):
+        host.sendmail(
+            sanitize_address(message.sender),
+            list({sanitize_address(addr) for addr in message.send_to}),
+            message.as_bytes(),
+            message.mail_options,
+            message.rcpt_options
+        )
+
+    def send_messages(self, messages):
+        """
+        Enviar varios mensajes por una misma sesión.
+        Retorna una lista con None (enviado) o el texto del error para cada mensaje.
+        """
+        if self.is_simulated():
+            for message in messages:
+                print(f"📧 [MODO DESARROLLO] Email simulado para {', '.join(message.recipients)}: {message.subject}")
+                print(message.body)
+            return [None] * len(messages)
+
+        results = []
+        host = self._acquire()
+        try:
+            for message in messages:
+                for attempt in (1, 2):
+                    if host is None:
+                        try:
+                            host = self._connect()
+                        except Exception as e:
+                            # Sin sesión no tiene sentido reintentar cada mensaje: falla el resto del lote
+                            results.extend([str(e) or type(e).__name__] * (len(messages) - len(results)))
+                            return results
+                    try:
+                        self._sendmail(host, message)
+                        results.append(None)
+                        break
+                    except MESSAGE_ERRORS as e:
+                        # Rechazo de este mensaje: smtplib ya hizo RSET y la sesión sigue sirviendo
+                        results.append(str(e))
+                        break
+                    except Exception as e:
+                        # Error de transporte: la sesión quedó en un estado desconocido, se descarta
+                        self._quit(host)
+                        host = None
+                        if isinstance(e, smtplib.SMTPServerDisconnected) and attempt == 1:
+                            # El servidor cerró la sesión: reconectar y reintentar una vez
+                            continue
+                        results.append(str(e))
+                        break
+        finally:
+            self._release(host)
+
+        return results
+
+    def send(self, message):
+        """Enviar un mensaje. Retorna None si se envió o el texto del error."""
+        return self.send_messages([message])[0]
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._quit(self._idle.pop()[0])
@@ -0,0 +1,147 @@
+from flask import request, Response
+from werkzeug.wsgi import wrap_file
+from auth_service import decode_token, get_bearer_token, load_user
+from storage_service import blob_relpath, HLS_DIR
+from transcode_service import HLS_FILE_RE, MEDIA_DIR, MEDIA_FILE_RE, rewrite_playlist
+from datetime import datetime
+import jwt
+import mimetypes
+import os
+import re
+from config import Config
+
+CHUNK_SIZE = 256 * 1024
+HEX_RE = re.compile(r'^[0-9a-f]+$')
+
+# Segmentos HLS (no todas las versiones de Python los conocen)
+mimetypes.add_type('video/mp2t', '.ts')
+
+def create_media_token(user_id):
+    """
+    Token para reproducir los videos del curso. Va en la URL (?token=...) porque
+    <video> no puede enviar el header Authorization; dura más que el de acceso
+    para que los pedidos de Range de una misma reproducción no expiren a mitad.
+    El vencimiento se redondea a una ventana de MEDIA_TOKEN_MINUTES / 2: dentro de
+    ella el token (y la URL del video) es el mismo y el navegador reutiliza su caché.
+    """
+    window = Config.MEDIA_TOKEN_MINUTES * 30
+    now = int(datetime.utcnow().timestamp())
+    payload = {
+        'type': 'media',
+        'user_id': user_id,
+        'exp': now - now % window + Config.MEDIA_TOKEN_MINUTES * 60
+    }
+    return jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm='HS256')
+
+def media_user():
+    """Usuario con acceso al curso según ?token= (de media) o el header Bearer, o None"""
+    token = request.args.get('token')
+    bearer = get_bearer_token()
+    claims = decode_token(token, 'media') if token else decode_token(bearer) if bearer else None
+    if not claims:
+        return None
+    # El acceso se revisa en cada pedido (usuario cacheado): revocarlo corta la reproducción
+    usuario = load_user(claims['user_id'])
+    return usuario if usuario and (usuario.has_course_access() or usuario.is_admin()) else None
+
+def _file_etag(stat):
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+def _read_range(file, length):
+    """Iterar exactamente length bytes desde la posición actual y cerrar el archivo"""
+    try:
+        while length > 0:
+            data = file.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+def send_video(directory, filename, immutable=False):
+    """
+    Entregar un video ya autorizado.
+
+    Con MEDIA_ACCEL_REDIRECT_PREFIX configurado la respuesta solo lleva el header
+    X-Accel-Redirect y nginx transfiere el archivo (Range, sendfile) desde su
+    location interna: el worker de gunicorn queda libre al instante.
+
+    Sin nginx se responde directamente con soporte de Range/206, If-Range y 304.
+    El archivo se entrega como wsgi.file_wrapper posicionado en el inicio del rango:
+    gunicorn lo envía con sendfile (sin copiar a Python) limitado por Content-Length.
+
+    Los blobs (<sha256>.<ext>, ver storage_service.py) se buscan en cas/ y, como su
+    contenido no cambia nunca, se pueden cachear para siempre (igual que los
+    archivos con immutable=True, como los segmentos HLS).
+    """
+    relpath = blob_relpath(filename)
+    immutable = immutable or relpath is not None
+    path = os.path.join(directory, relpath or filename)
+    if not os.path.isfile(path):
+        return Response('Video no encontrado', 404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    prefix = Config.MEDIA_ACCEL_REDIRECT_PREFIX
+    if prefix:
+        return Response(headers={'X-Accel-Redirect': prefix.rstrip('/') + '/' + (relpath or filename),
+                                 'Content-Type': mimetype})
+
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = filename.split('.', 1)[0] if relpath else _file_etag(stat)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'private, max-age=31536000, immutable' if immutable else 'private, max-age=3600',
+        'Content-Type': mimetype,
+    }
+
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+
+    start, length, status = 0, size, 200
+    # If-Range: si el archivo cambió desde que el cliente guardó la parte, se envía completo
+    if request.range and ('If-Range' not in request.headers or request.if_range.etag == etag):
+        bounds = request.range.range_for_length(size)
+        if bounds is None:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        length, status = stop - start, 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    headers['Content-Length'] = str(length)
+
+    file = open(path, 'rb')
+    file.seek(start)
+    server = request.environ.get('SERVER_SOFTWARE', '')
+    if length == size or server.startswith('gunicorn'):
+        # Archivo completo, o gunicorn (respeta Content-Length también con sendfile)
+        body = wrap_file(request.environ, file, CHUNK_SIZE)
+    else:
+        body = _read_range(file, length)
+
+    return Response(body, status=status, headers=headers, direct_passthrough=True)
+
+def send_hls(directory, sha256, profile, name):
+    """
+    Entregar un archivo de una transcodificación HLS (o una miniatura, con profile
+    'media') ya autorizada. Los playlists se reescriben con el token del pedido (son
+    chicos y dependen del usuario); segmentos y miniaturas no cambian nunca y se
+    entregan como los videos (nginx o sendfile).
+    """
+    if profile == MEDIA_DIR:
+        valid = MEDIA_FILE_RE.match(name)
+    else:
+        valid = HEX_RE.match(profile) and HLS_FILE_RE.match(name)
+    if not (HEX_RE.match(sha256) and valid):
+        return Response('Archivo no encontrado', 404)
+    relpath = os.path.join(HLS_DIR, sha256, profile, name)
+    if not name.endswith('.m3u8'):
+        return send_video(directory, relpath, immutable=True)
+
+    path = os.path.join(directory, relpath)
+    if not os.path.isfile(path):
+        return Response('Archivo no encontrado', 404)
+    return Response(rewrite_playlist(path, request.args.get('token')), mimetype='application/vnd.apple.mpegurl',
+                    headers={'Cache-Control': 'private, no-cache'})
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Script para crear los índices compuestos del listado paginado de usuarios
+(filtro + orden + id, usados por el cursor de /api/admin/users)
+"""
+
+import os
+import sys
+
+# Agregar el directorio del backend al path para importar módulos
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from config import Config
+import psycopg2
+
+INDEXES = {
+    'ix_usuarios_fecha_registro_id': '(fecha_registro, id)',
+    'ix_usuarios_activo_fecha_registro_id': '(activo, fecha_registro, id)',
+    'ix_usuarios_has_access_fecha_registro_id': '(has_access, fecha_registro, id)',
+    'ix_usuarios_apellido_id': '(apellido, id)',
+}
+
+def migrate_admin_user_indexes():
+    """Crear los índices sin bloquear escrituras en usuarios"""
+    try:
+        # Conectar a PostgreSQL
+        conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
+        # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        print("Conectado a PostgreSQL")
+
+        for name, columns in INDEXES.items():
+            print(f"Creando índice {name}...")
+            cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON usuarios {columns}")
+            print(f"✅ Índice {name} listo")
+
+        # Actualizar estadísticas para que el planner (y el conteo estimado) las usen
+        cur.execute("ANALYZE usuarios")
+        print("\n🎉 Índices del listado de usuarios creados exitosamente")
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error en migración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == '__main__':
+    print("🔄 Iniciando migración de índices de usuarios...")
+    success = migrate_admin_user_indexes()
+    sys.exit(0 if success else 1)
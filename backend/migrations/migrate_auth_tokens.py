@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Script para mover los tokens de confirmación y reset de contraseña
+desde la tabla usuarios a la tabla auth_tokens (indexada por hash del token)
+"""
+
+import os
+import sys
+
+# Agregar el directorio del backend al path para importar módulos
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from config import Config
+import psycopg2
+
+def migrate_auth_tokens():
+    """Crear auth_tokens, copiar los tokens vigentes y eliminar las columnas viejas"""
+    try:
+        # Conectar a PostgreSQL
+        conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
+        cur = conn.cursor()
+        
+        print("Conectado a PostgreSQL")
+        
+        print("Creando tabla auth_tokens...")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS auth_tokens (
+                token_hash VARCHAR(64) PRIMARY KEY,
+                purpose VARCHAR(30) NOT NULL,
+                user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+                expires_at TIMESTAMP NOT NULL,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_auth_tokens_user_id ON auth_tokens(user_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_auth_tokens_expires_at ON auth_tokens(expires_at)")
+        print("✅ Tabla auth_tokens lista")
+        
+        # Verificar si las columnas viejas todavía existen
+        cur.execute("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name = 'usuarios' 
+            AND column_name IN ('email_confirmation_token', 'password_reset_token', 'password_reset_expires')
+        """)
+        existing_columns = [row[0] for row in cur.fetchall()]
+        
+        if 'email_confirmation_token' in existing_columns:
+            print("Copiando tokens de confirmación de email...")
+            cur.execute("""
+                INSERT INTO auth_tokens (token_hash, purpose, user_id, expires_at)
+                SELECT encode(sha256(convert_to(email_confirmation_token, 'UTF8')), 'hex'),
+                       'email_confirmation', id, NOW() + (%s * INTERVAL '1 hour')
+                FROM usuarios
+                WHERE email_confirmation_token IS NOT NULL
+                ON CONFLICT (token_hash) DO NOTHING
+            """, (Config.EMAIL_CONFIRMATION_TOKEN_HOURS,))
+            print(f"✅ {cur.rowcount} tokens de confirmación copiados")
+        
+        if 'password_reset_token' in existing_columns:
+            print("Copiando tokens de reset de contraseña vigentes...")
+            cur.execute("""
+                INSERT INTO auth_tokens (token_hash, purpose, user_id, expires_at)
+                SELECT encode(sha256(convert_to(password_reset_token, 'UTF8')), 'hex'),
+                       'password_reset', id, password_reset_expires
+                FROM usuarios
+                WHERE password_reset_token IS NOT NULL
+                AND password_reset_expires > NOW()
+                ON CONFLICT (token_hash) DO NOTHING
+            """)
+            print(f"✅ {cur.rowcount} tokens de reset copiados")
+        
+        # Eliminar columnas e índice viejos para mantener angosta la fila de usuarios
+        cur.execute("DROP INDEX IF EXISTS idx_usuarios_password_reset_token")
+        for column in existing_columns:
+            print(f"Eliminando columna {column}...")
+            cur.execute(f"ALTER TABLE usuarios DROP COLUMN {column}")
+            print(f"✅ Columna {column} eliminada")
+        
+        # Confirmar cambios
+        conn.commit()
+        print("\n🎉 Migración de tokens completada exitosamente")
+        
+        cur.close()
+        conn.close()
+        
+    except Exception as e:
+        print(f"❌ Error en migración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    
+    return True
+
+if __name__ == '__main__':
+    print("🔄 Iniciando migración de tokens a auth_tokens...")
+    success = migrate_auth_tokens()
+    sys.exit(0 if success else 1)
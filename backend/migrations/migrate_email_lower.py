@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Script para que el email de los usuarios no distinga mayúsculas: pasa a minúsculas
+los emails existentes y crea el índice único sobre lower(email). Si hay cuentas
+que solo difieren en mayúsculas se listan y no se toca nada: hay que unificarlas a mano.
+"""
+
+import os
+import sys
+
+# Agregar el directorio del backend al path para importar módulos
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from config import Config
+import psycopg2
+
+def migrate_email_lower():
+    """Normalizar los emails y crear el índice único sobre lower(email)"""
+    try:
+        # Conectar a PostgreSQL
+        conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
+        cur = conn.cursor()
+
+        print("Conectado a PostgreSQL")
+
+        cur.execute("""
+            SELECT lower(email), array_agg(id ORDER BY id)
+            FROM usuarios GROUP BY lower(email) HAVING count(*) > 1
+        """)
+        duplicates = cur.fetchall()
+        if duplicates:
+            for email, ids in duplicates:
+                print(f"⚠️ {email}: usuarios {ids}")
+            print("❌ Hay emails repetidos sin distinguir mayúsculas; unificalos antes de migrar")
+            conn.rollback()
+            return False
+
+        cur.execute("UPDATE usuarios SET email = lower(trim(email)) WHERE email <> lower(trim(email))")
+        print(f"✅ Emails normalizados: {cur.rowcount}")
+
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_usuarios_email_lower ON usuarios (lower(email))")
+        conn.commit()
+        print("✅ Índice ix_usuarios_email_lower listo")
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error en migración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == '__main__':
+    print("🔄 Iniciando migración de emails sin mayúsculas...")
+    success = migrate_email_lower()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Script para agregar a course_content las columnas de la cola de transcodificación
+a HLS (ver transcode_service.py)
+"""
+
+import os
+import sys
+
+# Agregar el directorio del backend al path para importar módulos
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from config import Config
+import psycopg2
+
+def migrate_hls_transcoding():
+    """Agregar las columnas hls_* y el índice por estado"""
+    try:
+        # Conectar a PostgreSQL
+        conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
+        cur = conn.cursor()
+
+        print("Conectado a PostgreSQL")
+
+        for column, column_type in (('hls_status', 'VARCHAR(20)'), ('hls_url', 'VARCHAR(500)'),
+                                    ('hls_error', 'TEXT'), ('hls_attempts', 'INTEGER DEFAULT 0'),
+                                    ('hls_updated_at', 'TIMESTAMP')):
+            cur.execute(f"ALTER TABLE course_content ADD COLUMN IF NOT EXISTS {column} {column_type}")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_course_content_hls_status ON course_content (hls_status)")
+        conn.commit()
+        print("✅ Columnas de transcodificación listas")
+
+        # Los videos ya subidos como blob entran a la cola
+        cur.execute("""
+            UPDATE course_content SET hls_status = 'pending', hls_updated_at = NOW()
+            WHERE media_sha256 IS NOT NULL AND hls_status IS NULL
+        """)
+        conn.commit()
+        print(f"✅ Videos encolados para transcodificar: {cur.rowcount}")
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error en migración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == '__main__':
+    print("🔄 Iniciando migración de transcodificación a HLS...")
+    success = migrate_hls_transcoding()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Script para crear media_blobs (videos guardados por su SHA-256, ver storage_service.py)
+y agregar course_content.media_sha256. Los videos subidos antes siguen sirviéndose
+con su nombre original; pasan a cas/ la próxima vez que se suban.
+"""
+
+import os
+import sys
+
+# Agregar el directorio del backend al path para importar módulos
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from config import Config
+import psycopg2
+
+def migrate_media_blobs():
+    """Crear la tabla de blobs y la referencia desde el contenido del curso"""
+    try:
+        # Conectar a PostgreSQL
+        conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
+        cur = conn.cursor()
+
+        print("Conectado a PostgreSQL")
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS media_blobs (
+                sha256 VARCHAR(64) PRIMARY KEY,
+                extension VARCHAR(10) NOT NULL,
+                size BIGINT NOT NULL,
+                ref_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP,
+                released_at TIMESTAMP
+            )
+        """)
+        print("✅ Tabla media_blobs lista")
+
+        cur.execute("""
+            ALTER TABLE course_content ADD COLUMN IF NOT EXISTS media_sha256 VARCHAR(64)
+            REFERENCES media_blobs (sha256) ON DELETE SET NULL
+        """)
+        conn.commit()
+        print("✅ Columna course_content.media_sha256 lista")
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error en migración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == '__main__':
+    print("🔄 Iniciando migración de almacenamiento de videos por contenido...")
+    success = migrate_media_blobs()
+    sys.exit(0 if success else 1)
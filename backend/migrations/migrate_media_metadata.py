@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Script para agregar a course_content los metadatos de los videos subidos
+(duración, resolución, codecs, bitrate) y sus miniaturas (ver analyze_media en
+transcode_service.py)
+"""
+
+import os
+import sys
+
+# Agregar el directorio del backend al path para importar módulos
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from config import Config
+import psycopg2
+
+def migrate_media_metadata():
+    """Agregar las columnas de metadatos y miniaturas"""
+    try:
+        # Conectar a PostgreSQL
+        conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
+        cur = conn.cursor()
+
+        print("Conectado a PostgreSQL")
+
+        for column, column_type in (('duration_seconds', 'DOUBLE PRECISION'), ('width', 'INTEGER'),
+                                    ('height', 'INTEGER'), ('video_codec', 'VARCHAR(20)'),
+                                    ('audio_codec', 'VARCHAR(20)'), ('bit_rate', 'INTEGER'),
+                                    ('poster_url', 'VARCHAR(500)'), ('sprite_url', 'VARCHAR(500)')):
+            cur.execute(f"ALTER TABLE course_content ADD COLUMN IF NOT EXISTS {column} {column_type}")
+        conn.commit()
+        print("✅ Columnas de metadatos listas")
+
+        # Los videos ya procesados vuelven a la cola: el análisis es rápido y la
+        # transcodificación existente se reutiliza
+        cur.execute("""
+            UPDATE course_content SET hls_status = 'pending', hls_attempts = 0, hls_updated_at = NOW()
+            WHERE media_sha256 IS NOT NULL AND poster_url IS NULL AND hls_status IN ('ready', 'failed')
+        """)
+        conn.commit()
+        print(f"✅ Videos encolados para analizar: {cur.rowcount}")
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error en migración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == '__main__':
+    print("🔄 Iniciando migración de metadatos de videos...")
+    success = migrate_media_metadata()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script para quitar los tokens en claro de los emails del outbox que ya no se van a
+enviar: los enviados antes de que mark_sent borrara el payload y los muertos
+(desde ahora mark_failed los redacta al pasarlos a 'dead').
+"""
+
+import os
+import sys
+
+# Agregar el directorio del backend al path para importar módulos
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from config import Config
+import psycopg2
+
+def migrate_redact_email_outbox():
+    """Borrar payloads de enviados y tokens de muertos"""
+    try:
+        # Conectar a PostgreSQL
+        conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
+        cur = conn.cursor()
+
+        print("Conectado a PostgreSQL")
+
+        cur.execute("UPDATE email_outbox SET payload = NULL WHERE status = 'sent' AND payload IS NOT NULL")
+        print(f"✅ Payloads de enviados borrados: {cur.rowcount}")
+
+        cur.execute("""
+            UPDATE email_outbox
+            SET payload = (payload::jsonb - 'confirmation_token' - 'reset_token')::json
+            WHERE status = 'dead' AND payload IS NOT NULL
+        """)
+        conn.commit()
+        print(f"✅ Tokens de mensajes muertos borrados: {cur.rowcount}")
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error en migración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == '__main__':
+    print("🔄 Iniciando limpieza de tokens del outbox de emails...")
+    success = migrate_redact_email_outbox()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Script para crear los índices de la búsqueda de usuarios del panel de admin:
+trigramas (pg_trgm) para subcadenas y text_pattern_ops para prefijos
+"""
+
+import os
+import sys
+
+# Agregar el directorio del backend al path para importar módulos
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from config import Config
+import psycopg2
+
+# La expresión del índice de trigramas debe coincidir con la de user_search_service
+INDEXES = {
+    'ix_usuarios_search_trgm': "USING gin (lower(email || ' ' || nombre || ' ' || apellido) gin_trgm_ops)",
+    'ix_usuarios_email_lower_pattern': "(lower(email) text_pattern_ops)",
+    'ix_usuarios_nombre_lower_pattern': "(lower(nombre) text_pattern_ops)",
+    'ix_usuarios_apellido_lower_pattern': "(lower(apellido) text_pattern_ops)",
+}
+
+def migrate_user_search_indexes():
+    """Instalar pg_trgm y crear los índices sin bloquear escrituras en usuarios"""
+    try:
+        # Conectar a PostgreSQL
+        conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
+        # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        print("Conectado a PostgreSQL")
+
+        print("Instalando extensión pg_trgm...")
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        print("✅ Extensión pg_trgm lista")
+
+        for name, definition in INDEXES.items():
+            print(f"Creando índice {name}...")
+            cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON usuarios {definition}")
+            print(f"✅ Índice {name} listo")
+
+        cur.execute("ANALYZE usuarios")
+        print("\n🎉 Índices de búsqueda de usuarios creados exitosamente")
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error en migración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == '__main__':
+    print("🔄 Iniciando migración de índices de búsqueda...")
+    success = migrate_user_search_indexes()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Script para agregar la columna version a usuarios (clave de los ETags por usuario,
+ver etag_service.py)
+"""
+
+import os
+import sys
+
+# Agregar el directorio del backend al path para importar módulos
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from config import Config
+import psycopg2
+
+def migrate_usuario_version():
+    """Agregar usuarios.version con valor 1 para las filas existentes"""
+    try:
+        # Conectar a PostgreSQL
+        conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
+        cur = conn.cursor()
+
+        print("Conectado a PostgreSQL")
+
+        # Con un DEFAULT constante PostgreSQL (11+) no reescribe la tabla
+        cur.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1")
+        conn.commit()
+        print("✅ Columna usuarios.version lista")
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Error en migración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    return True
+
+if __name__ == '__main__':
+    print("🔄 Iniciando migración de versión de usuarios...")
+    success = migrate_usuario_version()
+    sys.exit(0 if success else 1)
@@ -1,6 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import validates
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from password_service import hash_password, verify_password, needs_rehash
 from enum import Enum
 
 db = SQLAlchemy()
@@ -9,6 +12,10 @@ class UserRole(Enum):
     USER = "user"
     ADMIN = "admin"
 
+def normalize_email(email):
+    """Forma canónica de un email: sin espacios y en minúsculas (None si no es texto)"""
+    return email.strip().lower() if isinstance(email, str) else None
+
 class Usuario(db.Model):
     __tablename__ = 'usuarios'
     
@@ -23,15 +30,37 @@ class Usuario(db.Model):
     rol = db.Column(db.String(10), default=UserRole.USER.value, nullable=False)
     has_access = db.Column(db.Boolean, default=False)  # Acceso al contenido del curso
     email_confirmed = db.Column(db.Boolean, default=False)  # Confirmación de email
-    email_confirmation_token = db.Column(db.String(255), nullable=True)  # Token de confirmación
-    password_reset_token = db.Column(db.String(255), nullable=True)  # Token de reset de contraseña
-    password_reset_expires = db.Column(db.DateTime, nullable=True)  # Expiración del token
+    # Se incrementa en cada cambio (ver bump_usuario_version): clave de los ETags por usuario
+    version = db.Column(db.Integer, default=1, nullable=False, server_default='1')
+    # Los tokens de confirmación y reset viven en auth_tokens (ver AuthToken)
+    
+    # Índices para el listado paginado del panel de admin (filtro + orden + id del cursor)
+    __table_args__ = (
+        db.Index('ix_usuarios_fecha_registro_id', 'fecha_registro', 'id'),
+        db.Index('ix_usuarios_activo_fecha_registro_id', 'activo', 'fecha_registro', 'id'),
+        db.Index('ix_usuarios_has_access_fecha_registro_id', 'has_access', 'fecha_registro', 'id'),
+        db.Index('ix_usuarios_apellido_id', 'apellido', 'id'),
+        # Un email por persona sin importar mayúsculas (también para filas anteriores a normalize_email)
+        db.Index('ix_usuarios_email_lower', func.lower(email), unique=True),
+    )
+
+    @validates('email')
+    def _normalize_email(self, key, value):
+        return normalize_email(value)
+
+    @classmethod
+    def by_email(cls, email):
+        """Query de usuarios con ese email, sin distinguir mayúsculas"""
+        return cls.query.filter(func.lower(cls.email) == normalize_email(email))
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
     
     def is_admin(self):
         return self.rol == UserRole.ADMIN.value
@@ -49,9 +78,16 @@ class Usuario(db.Model):
             'activo': self.activo,
             'rol': self.rol,
             'has_access': self.has_access,
-            'email_confirmed': self.email_confirmed
+            'email_confirmed': self.email_confirmed,
+            'version': self.version
         }
 
+@db.event.listens_for(Usuario, 'before_update')
+def bump_usuario_version(mapper, connection, target):
+    # before_update también corre para objetos marcados sin cambios reales
+    if db.session.is_modified(target, include_collections=False):
+        target.version = (target.version or 0) + 1
+
 class CourseContent(db.Model):
     __tablename__ = 'course_content'
     
@@ -66,18 +102,266 @@ class CourseContent(db.Model):
     drive_file_id = db.Column(db.String(100))  # ID del archivo en Google Drive
     reading_material = db.Column(db.Text)  # Material de lectura
     fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Blob del video subido (ver storage_service.py); cada contenido cuenta una referencia
+    media_sha256 = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256', ondelete='SET NULL'))
+    # Transcodificación a HLS del video subido (ver transcode_service.py); la cola son estas filas
+    hls_status = db.Column(db.String(20), index=True)  # None, 'pending', 'processing', 'ready', 'failed'
+    hls_url = db.Column(db.String(500))  # Playlist master, cuando está 'ready'
+    hls_error = db.Column(db.Text)
+    hls_attempts = db.Column(db.Integer, default=0)
+    hls_updated_at = db.Column(db.DateTime)
+    # Metadatos del video subido, leídos del archivo (ver analyze_media en transcode_service.py)
+    duration_seconds = db.Column(db.Float)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    video_codec = db.Column(db.String(20))
+    audio_codec = db.Column(db.String(20))
+    bit_rate = db.Column(db.Integer)  # bits por segundo
+    poster_url = db.Column(db.String(500))
+    sprite_url = db.Column(db.String(500))  # Grilla de 5x5 cuadros repartidos en todo el video
+    
+    # Campos de la API: columnas que necesita cada uno y cómo se obtiene su valor.
+    # to_dict(fields) solo toca las columnas de esos campos, así se puede cargar con load_only.
+    FIELDS = {
+        'id': (('video_id',), lambda c: c.video_id),
+        'title': (('title',), lambda c: c.title),
+        'description': (('description',), lambda c: c.description),
+        'duration': (('duration',), lambda c: c.duration),
+        'module': (('module',), lambda c: c.module),
+        'video_url': (('video_url',), lambda c: c.video_url),
+        'video_type': (('video_type',), lambda c: c.video_type),
+        'drive_file_id': (('drive_file_id',), lambda c: c.drive_file_id),
+        'reading_material': (('reading_material',), lambda c: c.reading_material),
+        'hls_status': (('hls_status',), lambda c: c.hls_status),
+        'hls_url': (('hls_url',), lambda c: c.hls_url),
+        'duration_seconds': (('duration_seconds',), lambda c: c.duration_seconds),
+        'width': (('width',), lambda c: c.width),
+        'height': (('height',), lambda c: c.height),
+        'video_codec': (('video_codec',), lambda c: c.video_codec),
+        'audio_codec': (('audio_codec',), lambda c: c.audio_codec),
+        'bit_rate': (('bit_rate',), lambda c: c.bit_rate),
+        'poster_url': (('poster_url',), lambda c: c.poster_url),
+        'sprite_url': (('sprite_url',), lambda c: c.sprite_url),
+        'views': (('video_id',), lambda c: 1247 - (c.video_id * 80)),  # Mock views
+        'date': (('video_id',), lambda c: "Enero 2025" if c.video_id <= 2 else "Febrero 2025"),
+    }
+    # Lo que necesita la barra lateral del curso (sin los textos largos)
+    SUMMARY_FIELDS = ('id', 'title', 'duration', 'module', 'video_type', 'poster_url')
+    
+    @classmethod
+    def columns_for(cls, fields):
+        """Columnas a cargar (para load_only) para armar los campos pedidos"""
+        names = dict.fromkeys(name for field in fields for name in cls.FIELDS[field][0])
+        return [getattr(cls, name) for name in names]
+    
+    def to_dict(self, fields=None):
+        return {
+            field: getter(self)
+            for field, (_, getter) in self.FIELDS.items()
+            if fields is None or field in fields
+        }
+
+class MediaBlob(db.Model):
+    """
+    Video guardado por contenido: uploads/videos/cas/<aa>/<bb>/<sha256>.<ext>.
+    ref_count cuenta los CourseContent que lo usan; sin referencias durante
+    MEDIA_BLOB_GRACE_HOURS el sweeper borra el archivo.
+    """
+    __tablename__ = 'media_blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    extension = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    released_at = db.Column(db.DateTime)  # Cuándo quedó sin referencias por última vez
+
+class CacheVersion(db.Model):
+    """Versión de datos cacheados en memoria por los workers (ver catalog_service.py y auth_service.py)"""
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=1, nullable=False)
+    
+    @classmethod
+    def bump(cls, name):
+        """
+        Incrementar la versión (UPSERT de una fila). Llamar antes del commit que modifica
+        los datos: la versión nueva se publica en la misma transacción.
+        """
+        dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+        db.session.execute(
+            dialect.insert(cls).values(name=name, version=1)
+            .on_conflict_do_update(index_elements=['name'], set_={'version': cls.version + 1})
+        )
+    
+    @classmethod
+    def current(cls, name):
+        return db.session.query(cls.version).filter_by(name=name).scalar() or 0
+
+class AuthToken(db.Model):
+    """Tokens de un solo uso (confirmación de email, reset de contraseña)"""
+    __tablename__ = 'auth_tokens'
+    
+    token_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 del token enviado por email
+    purpose = db.Column(db.String(30), nullable=False)  # 'email_confirmation', 'password_reset'
+    user_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def is_expired(self):
+        return self.expires_at < datetime.utcnow()
+
+class EmailOutbox(db.Model):
+    """Emails transaccionales pendientes: se escriben en la misma transacción que el cambio que los origina"""
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # 'confirmation', 'password_reset'
+    recipient = db.Column(db.String(120), nullable=False)
+    payload = db.Column(db.JSON)  # Datos para armar el email (se borran al enviarlo; sin tokens si muere)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # 'pending', 'sending', 'sent', 'dead'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
     
     def to_dict(self):
         return {
-            'id': self.video_id,
-            'title': self.title,
-            'description': self.description,
-            'duration': self.duration,
-            'module': self.module,
+            'id': self.id,
+            'kind': self.kind,
+            'recipient': self.recipient,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+class Announcement(db.Model):
+    """
+    Anuncio masivo por email. Los destinatarios se recorren por id (keyset) y
+    last_user_id es el checkpoint: tras una caída el envío sigue desde ahí.
+    """
+    __tablename__ = 'announcements'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    video_id = db.Column(db.Integer)  # Video del curso al que enlaza (opcional)
+    audience = db.Column(db.String(20), default='enrolled', nullable=False)  # 'enrolled', 'not_enrolled', 'all'
+    status = db.Column(db.String(20), default='pending', nullable=False)  # 'pending', 'sending', 'done'
+    total_recipients = db.Column(db.Integer, default=0, nullable=False)  # Estimado al crear el anuncio
+    sent_count = db.Column(db.Integer, default=0, nullable=False)
+    failed_count = db.Column(db.Integer, default=0, nullable=False)  # Derivados al outbox para reintentar
+    last_user_id = db.Column(db.Integer, default=0, nullable=False)
+    locked_until = db.Column(db.DateTime)  # Lease del worker que está enviando
+    created_by = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        processed = self.sent_count + self.failed_count
+        return {
+            'id': self.id,
+            'subject': self.subject,
+            'message': self.message,
+            'video_id': self.video_id,
+            'audience': self.audience,
+            'status': self.status,
+            'total_recipients': self.total_recipients,
+            'sent_count': self.sent_count,
+            'failed_count': self.failed_count,
+            'progress': round(100 * processed / self.total_recipients, 1) if self.total_recipients else 100.0,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class RateLimitHit(db.Model):
+    """Intentos registrados por el rate limiter cuando RATE_LIMIT_STORAGE = 'database'"""
+    __tablename__ = 'rate_limit_hits'
+    
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    hit_at = db.Column(db.Float, nullable=False)  # Timestamp epoch en segundos
+    
+    __table_args__ = (
+        db.Index('ix_rate_limit_hits_key_hit_at', 'key', 'hit_at'),
+    )
+
+class AuditLog(db.Model):
+    """
+    Registro de auditoría (solo se agregan filas): quién hizo qué sobre qué objeto.
+    Se escribe en lotes desde audit_service.AuditBuffer; actor_id no tiene FK para
+    que las entradas sobrevivan al borrado del usuario (actor_email queda como referencia).
+    """
+    __tablename__ = 'audit_log'
+    
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    actor_id = db.Column(db.Integer)
+    actor_email = db.Column(db.String(120))
+    action = db.Column(db.String(50), nullable=False)  # 'user.activate', 'course.update_content', ...
+    target_type = db.Column(db.String(50), nullable=False)  # 'usuario', 'course_content', ...
+    target_id = db.Column(db.String(64))
+    changes = db.Column(db.JSON)  # {campo: [antes, después]} u otros detalles de la acción
+    ip = db.Column(db.String(45))
+    
+    __table_args__ = (
+        db.Index('ix_audit_log_actor_id_id', 'actor_id', 'id'),
+        db.Index('ix_audit_log_action_id', 'action', 'id'),
+        db.Index('ix_audit_log_target_id', 'target_type', 'target_id', 'id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'actor_id': self.actor_id,
+            'actor_email': self.actor_email,
+            'action': self.action,
+            'target_type': self.target_type,
+            'target_id': self.target_id,
+            'changes': self.changes,
+            'ip': self.ip
+        }
+
+class VideoUpload(db.Model):
+    """
+    Subida de video por partes (estilo tus): el archivo parcial crece en disco y
+    offset es lo confirmado. Ver upload_service.py.
+    """
+    __tablename__ = 'video_uploads'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    video_id = db.Column(db.Integer, nullable=False)  # CourseContent.video_id al que se asigna al finalizar
+    filename = db.Column(db.String(255), nullable=False)  # Nombre original
+    size = db.Column(db.BigInteger, nullable=False)
+    offset = db.Column(db.BigInteger, default=0, nullable=False)
+    checksum = db.Column(db.String(64))  # SHA-256 esperado del archivo completo (opcional)
+    status = db.Column(db.String(20), default='uploading', nullable=False)  # 'uploading', 'completed'
+    video_url = db.Column(db.String(500))  # Resultado al finalizar
+    created_by = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    completed_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'video_id': self.video_id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.offset,
+            'status': self.status,
             'video_url': self.video_url,
-            'video_type': self.video_type,
-            'drive_file_id': self.drive_file_id,
-            'reading_material': self.reading_material,
-            'views': 1247 - (self.video_id * 80),  # Mock views
-            'date': "Enero 2025" if self.video_id <= 2 else "Febrero 2025"
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
         }
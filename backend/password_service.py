@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+import threading
+from config import Config
+
+class PasswordHasherBusy(Exception):
+    """Se alcanzó el límite de operaciones de hashing en curso/en cola"""
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+def _get_executor():
+    # Creación perezosa: cada worker de gunicorn arma su propio pool después del fork
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                concurrency = Config.PASSWORD_HASH_CONCURRENCY
+                _slots = threading.BoundedSemaphore(concurrency + Config.PASSWORD_HASH_QUEUE_LIMIT)
+                _executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='password-hash')
+    return _executor
+
+def _run(func, *args):
+    """
+    Ejecutar func en el pool de hashing.
+    Con PASSWORD_HASH_CONCURRENCY = 0 se ejecuta en línea (comportamiento anterior).
+    """
+    if Config.PASSWORD_HASH_CONCURRENCY <= 0:
+        return func(*args)
+
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        _slots.release()
+        raise
+    # El slot se libera cuando el hash termina de verdad, no cuando el request deja de
+    # esperarlo: si no, los que expiran por timeout seguirían ocupando el pool sin contar
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        # hashlib libera el GIL durante PBKDF2: el thread del request solo espera
+        return future.result(timeout=Config.PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        raise PasswordHasherBusy()
+
+def hash_password(password):
+    """Generar el hash de una contraseña con el costo configurado"""
+    return _run(generate_password_hash, password, Config.PASSWORD_HASH_METHOD)
+
+def verify_password(password_hash, password):
+    """Verificar una contraseña contra su hash"""
+    return _run(check_password_hash, password_hash, password)
+
+# Parámetros que werkzeug completa cuando el método no los indica ('scrypt', 'pbkdf2:sha256')
+HASH_DEFAULTS = {
+    'scrypt': ('32768', '8', '1'),
+    'pbkdf2': ('sha256', str(DEFAULT_PBKDF2_ITERATIONS)),
+}
+
+def _hash_params(method):
+    """Algoritmo y costo de un método de werkzeug, con los valores por defecto completados"""
+    name, *args = method.split(':')
+    defaults = HASH_DEFAULTS.get(name, ())
+    return (name, *args, *defaults[len(args):])
+
+def needs_rehash(password_hash):
+    """Indica si el hash fue generado con parámetros distintos a los configurados"""
+    return _hash_params(password_hash.split('$', 1)[0]) != _hash_params(Config.PASSWORD_HASH_METHOD)
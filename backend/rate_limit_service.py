@@ -0,0 +1,178 @@
+from collections import defaultdict, deque
+from functools import wraps
+from flask import request, jsonify, current_app
+from models import db, RateLimitHit, normalize_email
+import math
+import threading
+import time
+import uuid
+
+# Cada cuánto el backend en memoria descarta las claves sin intentos recientes
+MEMORY_PURGE_INTERVAL = 60  # segundos
+
+class MemoryRateLimitStorage:
+    """
+    Ventana deslizante en memoria: válida para un solo proceso (con varios workers
+    de gunicorn cada uno cuenta por separado; en producción usar 'database' o Redis).
+    """
+
+    def __init__(self):
+        self._hits = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._max_window = 0
+        self._purge_at = time.time() + MEMORY_PURGE_INTERVAL
+
+    def hit(self, key, limit, window):
+        """
+        Registrar un intento. Retorna (permitido, segundos_hasta_reintentar).
+        Los intentos rechazados no se cuentan.
+        """
+        now = time.time()
+        with self._lock:
+            # El sweeper corre en otro proceso: la memoria de este se limpia acá
+            self._max_window = max(self._max_window, window)
+            if now >= self._purge_at:
+                self._purge_locked(now, self._max_window)
+                self._purge_at = now + MEMORY_PURGE_INTERVAL
+
+            hits = self._hits[key]
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+
+            if len(hits) >= limit:
+                return False, hits[0] + window - now
+
+            hits.append(now)
+            return True, 0
+
+    def _purge_locked(self, now, max_window):
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= now - max_window]:
+            del self._hits[key]
+
+    def purge(self, max_window):
+        with self._lock:
+            self._purge_locked(time.time(), max_window)
+
+class DatabaseRateLimitStorage:
+    """Ventana deslizante en la base de datos: compartida entre workers de gunicorn"""
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        table = RateLimitHit.__table__
+
+        # Conexión propia: no se mezcla con la transacción del request
+        with db.engine.begin() as conn:
+            # Contar e insertar debe ser atómico por clave: sin esto, pedidos concurrentes
+            # ven el mismo conteo y todos pasan. En PostgreSQL un advisory lock por clave
+            # (se libera con la transacción); en SQLite el DELETE ya toma el lock de escritura.
+            if conn.dialect.name == 'postgresql':
+                conn.execute(db.text('SELECT pg_advisory_xact_lock(hashtext(:key))'), {'key': key})
+            conn.execute(table.delete().where(table.c.key == key, table.c.hit_at <= now - window))
+            oldest, count = conn.execute(
+                db.select(db.func.min(table.c.hit_at), db.func.count()).where(table.c.key == key)
+            ).one()
+
+            if count >= limit:
+                return False, oldest + window - now
+
+            conn.execute(table.insert().values(key=key, hit_at=now))
+            return True, 0
+
+    def purge(self, max_window):
+        table = RateLimitHit.__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.hit_at <= time.time() - max_window))
+
+class RedisRateLimitStorage:
+    """Ventana deslizante con sorted sets de Redis: compartida entre workers y servidores"""
+
+    # Limpiar, contar y agregar en un solo script: atómico aunque haya pedidos concurrentes.
+    # Retorna nil si se permite, o los segundos hasta reintentar (como texto: Lua trunca los números)
+    HIT_SCRIPT = """
+    local key, now, window, limit = KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        return tostring(tonumber(oldest[2]) + window - now)
+    end
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('EXPIRE', key, math.ceil(window))
+    return nil
+    """
+
+    def __init__(self, url):
+        import redis  # Dependencia opcional: solo necesaria con RATE_LIMIT_STORAGE=redis://...
+        self.client = redis.Redis.from_url(url)
+        self._hit = self.client.register_script(self.HIT_SCRIPT)
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        retry_after = self._hit(keys=[f'rate_limit:{key}'],
+                                args=[now, window, limit, f'{now}:{uuid.uuid4().hex}'])
+        if retry_after is None:
+            return True, 0
+        return False, float(retry_after)
+
+    def purge(self, max_window):
+        pass  # Las claves expiran solas
+
+def create_storage(storage):
+    if storage == 'memory':
+        return MemoryRateLimitStorage()
+    if storage == 'database':
+        return DatabaseRateLimitStorage()
+    if storage.startswith('redis://'):
+        return RedisRateLimitStorage(storage)
+    raise ValueError(f'RATE_LIMIT_STORAGE desconocido: {storage}')
+
+def init_rate_limiter(app):
+    """Inicializar el backend de rate limiting configurado"""
+    app.extensions['rate_limiter'] = create_storage(app.config.get('RATE_LIMIT_STORAGE', 'memory'))
+
+def purge_rate_limits():
+    """Descartar los intentos fuera de toda ventana configurada (lo llama el sweeper)"""
+    max_window = max(window for limits in current_app.config['RATE_LIMITS'].values()
+                     for _, window in limits.values())
+    current_app.extensions['rate_limiter'].purge(max_window)
+
+def get_client_ip():
+    """
+    IP del cliente. Los headers del cliente no se leen acá: con TRUSTED_PROXY_COUNT
+    configurado, ProxyFix ya puso en remote_addr la IP que informó nginx.
+    """
+    return request.remote_addr or 'unknown'
+
+def rate_limit(route_name):
+    """
+    Decorador: limitar intentos por IP y por email normalizado según
+    Config.RATE_LIMITS[route_name] = {'ip': (cantidad, segundos), 'email': (cantidad, segundos)}
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+                return view(*args, **kwargs)
+
+            limits = current_app.config['RATE_LIMITS'].get(route_name, {})
+            storage = current_app.extensions['rate_limiter']
+
+            keys = []
+            if 'ip' in limits:
+                keys.append((f'{route_name}:ip:{get_client_ip()}', limits['ip']))
+            if 'email' in limits:
+                data = request.get_json(silent=True) or {}
+                email = normalize_email(data.get('email'))
+                if email:
+                    keys.append((f'{route_name}:email:{email}', limits['email']))
+
+            for key, (limit, window) in keys:
+                allowed, retry_after = storage.hit(key, limit, window)
+                if not allowed:
+                    retry_after = max(1, int(math.ceil(retry_after)))
+                    response = jsonify({'error': f'Demasiados intentos. Intenta nuevamente en {retry_after} segundos'})
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response, 429
+
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
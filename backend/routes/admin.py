@@ -1,71 +1,237 @@
-from flask import Blueprint, request, jsonify, current_app
-from models import db, Usuario, UserRole
-import jwt
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from models import db, Usuario, UserRole, Announcement, CourseContent
+from auth_service import get_current_user_id, admin_required, invalidate_user, invalidate_users, bump_users_version
+from announcement_service import create_announcement, AUDIENCES
+from user_admin_service import parse_filters, list_users, count_users, user_stats, invalidate_admin_counts, bulk_update, BULK_ACTIONS, parse_export_columns, stream_export, EXPORT_FORMATS
+from user_search_service import search_users
+from user_import_service import import_users
+from etag_service import make_etag, conditional_response
+from audit_service import record, record_many, flush_audit, parse_audit_filters, query_audit_log
 from config import Config
+from datetime import datetime
+import io
 
 admin_bp = Blueprint('admin', __name__)
 
-def get_current_user():
-    """Función helper para obtener el usuario actual desde el token JWT"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
+@admin_bp.route('/users', methods=['GET'])
+@admin_required
+def listar_usuarios():
+    """
+    Lista paginada de usuarios (solo para admins)
     
-    token = auth_header.split(' ')[1]
+    Query params: limit, cursor (next_cursor de la página anterior), sort
+    (fecha_registro, email, apellido, id), order (asc, desc) y filtros activo,
+    has_access, email_confirmed, rol, registered_from, registered_to.
+    """
+    try:
+        try:
+            filters = parse_filters(request.args)
+            limit = min(int(request.args.get('limit') or Config.ADMIN_USERS_PAGE_SIZE), Config.ADMIN_USERS_MAX_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError('limit debe ser mayor a 0')
+            usuarios, next_cursor = list_users(
+                filters,
+                sort=request.args.get('sort', 'fecha_registro'),
+                order=request.args.get('order', 'desc'),
+                limit=limit,
+                cursor=request.args.get('cursor')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        total, total_estimated = count_users(filters)
+        
+        # La página cambia solo si cambia algún usuario (versión), el orden o el total
+        etag = make_etag('users', [(user.id, user.version) for user in usuarios], total, total_estimated, next_cursor)
+        return conditional_response(etag, lambda: jsonify({
+            'usuarios': [user.to_dict() for user in usuarios],
+            'total': total,
+            'total_estimated': total_estimated,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/stats', methods=['GET'])
+@admin_required
+def estadisticas():
+    """
+    Estadísticas de usuarios para el panel (solo para admins)
     
+    Query params: days (altas por día de los últimos N días, por defecto ADMIN_STATS_SIGNUP_DAYS)
+    """
     try:
-        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-        user_id = payload['user_id']
-        return Usuario.query.filter_by(id=user_id, activo=True).first()
-    except:
-        return None
+        try:
+            days = int(request.args.get('days') or Config.ADMIN_STATS_SIGNUP_DAYS)
+        except ValueError:
+            return jsonify({'error': 'days debe ser un número'}), 400
+        if not 1 <= days <= 365:
+            return jsonify({'error': 'days debe estar entre 1 y 365'}), 400
+        
+        return jsonify(user_stats(days)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-def require_admin():
-    """Verificar que el usuario actual sea admin"""
-    usuario = get_current_user()
-    if not usuario:
-        return None, {'error': 'Usuario no autenticado'}, 401
+@admin_bp.route('/users/search', methods=['GET'])
+@admin_required
+def buscar_usuarios():
+    """
+    Buscar usuarios por email, nombre o apellido (solo para admins)
     
-    if not usuario.is_admin():
-        return None, {'error': 'Acceso denegado. Se requieren permisos de administrador'}, 403
+    Query params: q (texto a buscar) y limit. Resultados ordenados por relevancia:
+    email exacto, prefijo de email, prefijo de nombre/apellido y luego subcadena.
+    """
+    try:
+        try:
+            limit = int(request.args.get('limit') or Config.USER_SEARCH_LIMIT)
+        except ValueError:
+            return jsonify({'error': 'limit debe ser un número'}), 400
+        if limit < 1:
+            return jsonify({'error': 'limit debe ser mayor a 0'}), 400
+        
+        usuarios = search_users(request.args.get('q', ''), limit)
+        
+        return jsonify({
+            'usuarios': [user.to_dict() for user in usuarios]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/users/export', methods=['GET'])
+@admin_required
+def exportar_usuarios():
+    """
+    Exportar usuarios en CSV o NDJSON, en streaming (solo para admins)
     
-    return usuario, None, None
+    Query params: format (csv, ndjson), columns (separadas por coma) y los mismos
+    filtros que GET /users.
+    """
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f'format debe ser uno de: {", ".join(EXPORT_FORMATS)}'}), 400
+        try:
+            filters = parse_filters(request.args)
+            columns = parse_export_columns(request.args.get('columns'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        filename = f"usuarios-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+        return Response(
+            stream_with_context(stream_export(filters, columns, fmt)),
+            mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'X-Accel-Buffering': 'no'  # Que nginx reenvíe cada trozo sin juntar todo el archivo
+            }
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-@admin_bp.route('/users', methods=['GET'])
-def listar_usuarios():
+@admin_bp.route('/users/import', methods=['POST'])
+@admin_required
+def importar_usuarios():
     """
-    Lista todos los usuarios (solo para admins)
+    Importar usuarios desde un CSV (solo para admins)
+    
+    Multipart: file (CSV con columnas email, nombre, apellido) y, opcionales,
+    grant_access, send_welcome (por defecto true) y dry_run. Ver también import_users.py.
+    """
+    try:
+        file = request.files.get('file')
+        if not file:
+            return jsonify({'error': 'Se requiere un archivo CSV en el campo file'}), 400
+        
+        def flag(name, default=False):
+            return request.form.get(name, str(default)).lower() in ('true', '1')
+        
+        try:
+            summary = import_users(
+                io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''),
+                grant_access=flag('grant_access'),
+                send_welcome=flag('send_welcome', True),
+                dry_run=flag('dry_run')
+            )
+        except (ValueError, UnicodeDecodeError) as e:
+            db.session.rollback()
+            return jsonify({'error': f'CSV inválido: {e}'}), 400
+        
+        invalidate_admin_counts()
+        if not summary['dry_run']:
+            record('user.import', 'usuario', changes={
+                key: summary[key] for key in ('total_rows', 'imported', 'skipped_existing', 'invalid')
+            })
+        return jsonify(summary), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/users/bulk', methods=['POST'])
+@admin_required
+def accion_masiva():
+    """
+    Activar, desactivar, otorgar o revocar acceso a muchos usuarios a la vez (solo para admins)
+    
+    Body: {"action": "activate|deactivate|grant|revoke", "user_ids": [...]} o, en lugar
+    de user_ids, {"filter": {...}} con los mismos filtros que GET /users.
     """
     try:
-        usuario, error, status = require_admin()
-        if error:
-            return jsonify(error), status
+        data = request.get_json() or {}
+        action = data.get('action')
+        user_ids = data.get('user_ids')
+        filters = None
         
-        usuarios = Usuario.query.all()
-        usuarios_data = []
+        if action not in BULK_ACTIONS:
+            return jsonify({'error': f'action debe ser uno de: {", ".join(BULK_ACTIONS)}'}), 400
         
-        for user in usuarios:
-            user_dict = user.to_dict()
-            usuarios_data.append(user_dict)
+        if user_ids is not None:
+            if not isinstance(user_ids, list) or not all(isinstance(i, int) for i in user_ids):
+                return jsonify({'error': 'user_ids debe ser una lista de ids'}), 400
+            user_ids = list(dict.fromkeys(user_ids))  # Sin repetidos, en el orden recibido
+            if len(user_ids) > Config.ADMIN_BULK_MAX_IDS:
+                return jsonify({'error': f'Como máximo {Config.ADMIN_BULK_MAX_IDS} ids por operación'}), 400
+        else:
+            try:
+                filters = parse_filters(data.get('filter') or {})
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if not filters:
+                return jsonify({'error': 'Se requiere user_ids o un filter no vacío'}), 400
+        
+        updated, results = bulk_update(action, get_current_user_id(), user_ids=user_ids, filters=filters)
+        bump_users_version()
+        db.session.commit()
+        
+        # Una sola invalidación para todo el lote (cache de usuarios, conteos y estadísticas)
+        invalidate_users(updated)
+        invalidate_admin_counts()
+        column_name, value = BULK_ACTIONS[action]
+        record_many(f'user.bulk_{action}', 'usuario',
+                    {user_id: {column_name: [not value, value]} for user_id in updated})
         
         return jsonify({
-            'usuarios': usuarios_data,
-            'total': len(usuarios_data)
+            'message': f'{len(updated)} usuarios actualizados',
+            'updated': len(updated),
+            'results': results
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/activate-user', methods=['POST'])
+@admin_required
 def activar_usuario():
     """
     Activar un usuario específico (solo para admins)
     """
     try:
-        usuario, error, status = require_admin()
-        if error:
-            return jsonify(error), status
-        
         data = request.get_json()
         user_id = data.get('user_id')
         
@@ -76,8 +242,13 @@ def activar_usuario():
         if not target_user:
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
+        previous = target_user.activo
         target_user.activo = True
+        bump_users_version()
         db.session.commit()
+        invalidate_user(target_user.id)
+        invalidate_admin_counts()
+        record('user.activate', 'usuario', target_user.id, {'activo': [previous, True]})
         
         return jsonify({
             'message': f'Usuario {target_user.email} activado exitosamente',
@@ -88,15 +259,12 @@ def activar_usuario():
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/deactivate-user', methods=['POST'])
+@admin_required
 def desactivar_usuario():
     """
     Desactivar un usuario específico (solo para admins)
     """
     try:
-        usuario, error, status = require_admin()
-        if error:
-            return jsonify(error), status
-        
         data = request.get_json()
         user_id = data.get('user_id')
         
@@ -108,11 +276,16 @@ def desactivar_usuario():
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
         # No permitir desactivar al propio usuario admin
-        if target_user.id == usuario.id:
+        if target_user.id == get_current_user_id():
             return jsonify({'error': 'No puedes desactivar tu propia cuenta'}), 400
         
+        previous = target_user.activo
         target_user.activo = False
+        bump_users_version()
         db.session.commit()
+        invalidate_user(target_user.id)
+        invalidate_admin_counts()
+        record('user.deactivate', 'usuario', target_user.id, {'activo': [previous, False]})
         
         return jsonify({
             'message': f'Usuario {target_user.email} desactivado exitosamente',
@@ -123,15 +296,12 @@ def desactivar_usuario():
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/grant-access', methods=['POST'])
+@admin_required
 def otorgar_acceso():
     """
     Otorgar acceso al curso a un usuario específico (solo para admins)
     """
     try:
-        usuario, error, status = require_admin()
-        if error:
-            return jsonify(error), status
-        
         data = request.get_json()
         user_id = data.get('user_id')
         
@@ -142,8 +312,13 @@ def otorgar_acceso():
         if not target_user:
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
+        previous = target_user.has_access
         target_user.has_access = True
+        bump_users_version()
         db.session.commit()
+        invalidate_user(target_user.id)
+        invalidate_admin_counts()
+        record('user.grant_access', 'usuario', target_user.id, {'has_access': [previous, True]})
         
         return jsonify({
             'message': f'Acceso al curso otorgado a {target_user.email}',
@@ -154,15 +329,12 @@ def otorgar_acceso():
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/revoke-access', methods=['POST'])
+@admin_required
 def revocar_acceso():
     """
     Revocar acceso al curso a un usuario específico (solo para admins)
     """
     try:
-        usuario, error, status = require_admin()
-        if error:
-            return jsonify(error), status
-        
         data = request.get_json()
         user_id = data.get('user_id')
         
@@ -177,8 +349,13 @@ def revocar_acceso():
         if target_user.is_admin():
             return jsonify({'error': 'No se puede revocar acceso a un administrador'}), 400
         
+        previous = target_user.has_access
         target_user.has_access = False
+        bump_users_version()
         db.session.commit()
+        invalidate_user(target_user.id)
+        invalidate_admin_counts()
+        record('user.revoke_access', 'usuario', target_user.id, {'has_access': [previous, False]})
         
         return jsonify({
             'message': f'Acceso al curso revocado para {target_user.email}',
@@ -187,3 +364,106 @@ def revocar_acceso():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/announcements', methods=['POST'])
+@admin_required
+def crear_anuncio():
+    """
+    Encolar un anuncio por email para una audiencia (solo para admins).
+    Lo envía el worker de emails por tramos; el progreso se consulta con GET.
+    """
+    try:
+        data = request.get_json() or {}
+        audience = data.get('audience', 'enrolled')
+        video_id = data.get('video_id')
+        subject = (data.get('subject') or '').strip()
+        message = (data.get('message') or '').strip()
+        
+        if audience not in AUDIENCES:
+            return jsonify({'error': f'audience debe ser uno de: {", ".join(AUDIENCES)}'}), 400
+        
+        if video_id is not None:
+            content = CourseContent.query.filter_by(video_id=video_id).first()
+            if not content:
+                return jsonify({'error': 'Video no encontrado'}), 404
+            # Por defecto, anunciar el video con su título y descripción
+            subject = subject or f'Nuevo video: {content.title}'
+            message = message or (content.description or content.title)
+        
+        if not subject or not message:
+            return jsonify({'error': 'subject y message son requeridos'}), 400
+        
+        announcement = create_announcement(subject, message, audience, video_id, get_current_user_id())
+        db.session.commit()
+        record('announcement.create', 'announcement', announcement.id,
+               {'audience': audience, 'video_id': video_id, 'total_recipients': announcement.total_recipients})
+        
+        return jsonify({
+            'message': f'Anuncio encolado para {announcement.total_recipients} destinatarios',
+            'announcement': announcement.to_dict()
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/announcements', methods=['GET'])
+@admin_required
+def listar_anuncios():
+    """
+    Últimos anuncios con su progreso (solo para admins)
+    """
+    try:
+        announcements = Announcement.query.order_by(Announcement.id.desc()).limit(50).all()
+        return jsonify({'announcements': [a.to_dict() for a in announcements]}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/announcements/<int:announcement_id>', methods=['GET'])
+@admin_required
+def progreso_anuncio(announcement_id):
+    """
+    Progreso de un anuncio (solo para admins)
+    """
+    try:
+        announcement = db.session.get(Announcement, announcement_id)
+        if not announcement:
+            return jsonify({'error': 'Anuncio no encontrado'}), 404
+        
+        return jsonify({'announcement': announcement.to_dict()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/audit', methods=['GET'])
+@admin_required
+def listar_auditoria():
+    """
+    Registro de auditoría, más reciente primero (solo para admins)
+    
+    Query params: limit, cursor (next_cursor de la página anterior) y filtros
+    actor_id, action, target_type, target_id, since, until.
+    """
+    try:
+        try:
+            filters = parse_audit_filters(request.args)
+            limit = min(int(request.args.get('limit') or Config.AUDIT_PAGE_SIZE), Config.ADMIN_USERS_MAX_PAGE_SIZE)
+            cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+            if limit < 1:
+                raise ValueError('limit debe ser mayor a 0')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Lo pendiente en el buffer de este proceso se escribe antes de consultar
+        flush_audit()
+        entries, next_cursor = query_audit_log(filters, cursor=cursor, limit=limit)
+        
+        return jsonify({
+            'entries': [entry.to_dict() for entry in entries],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,13 +1,23 @@
 from flask import Blueprint, request, jsonify, current_app
 from models import db, Usuario, UserRole
-from email_service import generate_confirmation_token, send_confirmation_email, generate_password_reset_token, send_password_reset_email
-import jwt
-from datetime import datetime, timedelta
+from auth_service import get_current_user, login_required, invalidate_user, bump_users_version, create_access_token, create_refresh_token, decode_token, password_stamp
+from password_service import PasswordHasherBusy
+from rate_limit_service import rate_limit
+from email_outbox import queue_email
+from etag_service import make_etag, conditional_response
+import token_service
+from datetime import datetime
 import time
-from config import Config
+import hmac
 
 auth_bp = Blueprint('auth', __name__)
 
+def hasher_busy_response():
+    """Respuesta 503 cuando el pool de hashing de contraseñas está saturado"""
+    response = jsonify({'error': 'El servidor está ocupado. Intenta nuevamente en unos segundos'})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
 @auth_bp.route('/health', methods=['GET'])
 def health():
     """Endpoint de health check"""
@@ -17,25 +27,11 @@ def health():
         'service': 'auth'
     }), 200
 
-def get_current_user():
-    """Función helper para obtener el usuario actual desde el token JWT"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    
-    try:
-        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-        user_id = payload['user_id']
-        return Usuario.query.filter_by(id=user_id, activo=True).first()
-    except:
-        return None
-
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('register')
 def registro():
     """
-    Registra un nuevo usuario y envía email de confirmación
+    Registra un nuevo usuario y encola el email de confirmación
     """
     try:
         data = request.get_json()
@@ -47,48 +43,42 @@ def registro():
                 return jsonify({'error': f'{field} es requerido'}), 400
         
         # Verificar si el email ya existe
-        usuario_existente = Usuario.query.filter_by(email=data['email']).first()
+        usuario_existente = Usuario.by_email(data['email']).first()
         if usuario_existente:
             return jsonify({'error': 'El email ya está registrado'}), 409
         
-        # Generar token de confirmación
-        confirmation_token = generate_confirmation_token()
-        
         # Crear nuevo usuario
         nuevo_usuario = Usuario(
             email=data['email'],
             nombre=data['nombre'],
-            apellido=data['apellido'],
-            email_confirmation_token=confirmation_token
+            apellido=data['apellido']
         )
         nuevo_usuario.set_password(data['password'])
         
         db.session.add(nuevo_usuario)
-        db.session.commit()
+        db.session.flush()  # Obtener el id para asociar el token
         
-        # Enviar email de confirmación
-        email_sent = send_confirmation_email(
-            user_email=nuevo_usuario.email,
-            user_name=nuevo_usuario.nombre,
-            confirmation_token=confirmation_token
-        )
-        
-        if not email_sent:
-            return jsonify({
-                'message': 'Usuario registrado pero hubo un error enviando el email de confirmación',
-                'usuario': nuevo_usuario.to_dict()
-            }), 201
+        # Generar token y encolar el email de confirmación en la misma transacción;
+        # el envío lo hace email_worker.py
+        confirmation_token = token_service.issue_token(nuevo_usuario.id, token_service.EMAIL_CONFIRMATION)
+        queue_email('confirmation', nuevo_usuario.email,
+                    user_name=nuevo_usuario.nombre, confirmation_token=confirmation_token)
+        db.session.commit()
         
         return jsonify({
             'message': 'Usuario registrado exitosamente. Revisa tu email para confirmar tu cuenta.',
             'usuario': nuevo_usuario.to_dict()
         }), 201
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return hasher_busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login')
 def login():
     """
     Autentica un usuario y retorna un token JWT
@@ -99,23 +89,59 @@ def login():
         if not data.get('email') or not data.get('password'):
             return jsonify({'error': 'Email y password son requeridos'}), 400
         
-        usuario = Usuario.query.filter_by(email=data['email'], activo=True).first()
+        usuario = Usuario.by_email(data['email']).filter_by(activo=True).first()
         
         if not usuario or not usuario.check_password(data['password']):
             return jsonify({'error': 'Credenciales inválidas'}), 401
         
-        # Generar token JWT
-        payload = {
-            'user_id': usuario.id,
-            'email': usuario.email,
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }
-        
-        token = jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm='HS256')
+        # Actualizar de forma transparente los hashes con parámetros anteriores
+        if usuario.password_needs_rehash():
+            try:
+                usuario.set_password(data['password'])
+                db.session.commit()
+            except PasswordHasherBusy:
+                pass  # Se reintentará en el próximo login
         
+        # Generar par de tokens: acceso (corto, con claims) y refresco (largo)
         return jsonify({
             'message': 'Login exitoso',
-            'token': token,
+            'token': create_access_token(usuario),
+            'refresh_token': create_refresh_token(usuario),
+            'usuario': usuario.to_dict()
+        }), 200
+        
+    except PasswordHasherBusy:
+        return hasher_busy_response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/refresh', methods=['POST'])
+def refrescar_token():
+    """
+    Emite un nuevo token de acceso a partir de un token de refresco,
+    releyendo el usuario para que los claims reflejen su estado actual
+    """
+    try:
+        data = request.get_json() or {}
+        
+        if not data.get('refresh_token'):
+            return jsonify({'error': 'refresh_token es requerido'}), 400
+        
+        payload = decode_token(data['refresh_token'], token_type='refresh')
+        if not payload:
+            return jsonify({'error': 'Token de refresco inválido o expirado'}), 401
+        
+        usuario = Usuario.query.filter_by(id=payload['user_id'], activo=True).first()
+        if not usuario:
+            return jsonify({'error': 'Usuario no autenticado'}), 401
+        
+        # Emitido antes del último cambio de contraseña (o sin huella): no se renueva
+        if not hmac.compare_digest(payload.get('pwd', ''), password_stamp(usuario)):
+            return jsonify({'error': 'Token de refresco inválido o expirado'}), 401
+        
+        return jsonify({
+            'token': create_access_token(usuario),
+            'refresh_token': create_refresh_token(usuario),
             'usuario': usuario.to_dict()
         }), 200
         
@@ -133,16 +159,19 @@ def confirmar_email():
         if not data.get('token'):
             return jsonify({'error': 'Token es requerido'}), 400
         
-        # Buscar usuario por token
-        usuario = Usuario.query.filter_by(email_confirmation_token=data['token']).first()
+        # Buscar token por su hash (clave primaria)
+        auth_token = token_service.find_token(data['token'], token_service.EMAIL_CONFIRMATION)
         
-        if not usuario:
+        if not auth_token or auth_token.is_expired():
             return jsonify({'error': 'Token inválido'}), 400
         
         # Confirmar email
+        usuario = db.session.get(Usuario, auth_token.user_id)
         usuario.email_confirmed = True
-        usuario.email_confirmation_token = None  # Limpiar token usado
+        db.session.delete(auth_token)  # Eliminar token usado
+        bump_users_version()
         db.session.commit()
+        invalidate_user(usuario.id)
         
         return jsonify({
             'message': 'Email confirmado exitosamente',
@@ -153,6 +182,7 @@ def confirmar_email():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/resend-confirmation', methods=['POST'])
+@rate_limit('resend_confirmation')
 def reenviar_confirmacion():
     """
     Reenvía el email de confirmación
@@ -164,7 +194,7 @@ def reenviar_confirmacion():
             return jsonify({'error': 'Email es requerido'}), 400
         
         # Buscar usuario
-        usuario = Usuario.query.filter_by(email=data['email'], activo=True).first()
+        usuario = Usuario.by_email(data['email']).filter_by(activo=True).first()
         
         if not usuario:
             return jsonify({'error': 'Usuario no encontrado'}), 404
@@ -172,20 +202,13 @@ def reenviar_confirmacion():
         if usuario.email_confirmed:
             return jsonify({'error': 'El email ya está confirmado'}), 400
         
-        # Generar nuevo token
-        nuevo_token = generate_confirmation_token()
-        usuario.email_confirmation_token = nuevo_token
-        db.session.commit()
-        
-        # Enviar email
-        email_sent = send_confirmation_email(
-            user_email=usuario.email,
-            user_name=usuario.nombre,
-            confirmation_token=nuevo_token
-        )
+        # Generar nuevo token (invalida el anterior)
+        nuevo_token = token_service.issue_token(usuario.id, token_service.EMAIL_CONFIRMATION)
         
-        if not email_sent:
-            return jsonify({'error': 'Error al enviar el email'}), 500
+        # Encolar email
+        queue_email('confirmation', usuario.email,
+                    user_name=usuario.nombre, confirmation_token=nuevo_token)
+        db.session.commit()
         
         return jsonify({
             'message': 'Email de confirmación reenviado exitosamente'
@@ -195,23 +218,23 @@ def reenviar_confirmacion():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/profile', methods=['GET'])
+@login_required
 def obtener_perfil():
     """
     Obtiene el perfil del usuario autenticado
     """
     try:
         usuario = get_current_user()
-        if not usuario:
-            return jsonify({'error': 'Usuario no autenticado'}), 401
         
-        return jsonify({
+        return conditional_response(make_etag('profile', usuario.id, usuario.version), lambda: jsonify({
             'usuario': usuario.to_dict()
-        }), 200
+        }))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/forgot-password', methods=['POST'])
+@rate_limit('forgot_password')
 def forgot_password():
     """
     Solicitar reset de contraseña
@@ -223,7 +246,7 @@ def forgot_password():
             return jsonify({'error': 'Email es requerido'}), 400
         
         # Buscar usuario por email
-        usuario = Usuario.query.filter_by(email=data['email'], activo=True).first()
+        usuario = Usuario.by_email(data['email']).filter_by(activo=True).first()
         
         if not usuario:
             # Por seguridad, siempre devolvemos el mismo mensaje
@@ -231,24 +254,14 @@ def forgot_password():
                 'message': 'Si el email existe en nuestro sistema, recibirás un enlace para restablecer tu contraseña'
             }), 200
         
-        # Generar token de reset
-        reset_token = generate_password_reset_token()
+        # Generar token de reset (expira en PASSWORD_RESET_TOKEN_MINUTES)
+        reset_token = token_service.issue_token(usuario.id, token_service.PASSWORD_RESET)
         
-        # Establecer token y expiración (1 hora)
-        usuario.password_reset_token = reset_token
-        usuario.password_reset_expires = datetime.utcnow() + timedelta(hours=1)
+        # Encolar email
+        queue_email('password_reset', usuario.email,
+                    user_name=usuario.nombre, reset_token=reset_token)
         db.session.commit()
         
-        # Enviar email
-        email_sent = send_password_reset_email(
-            usuario.email, 
-            usuario.nombre, 
-            reset_token
-        )
-        
-        if not email_sent:
-            return jsonify({'error': 'Error al enviar el email. Intenta nuevamente más tarde'}), 500
-        
         return jsonify({
             'message': 'Si el email existe en nuestro sistema, recibirás un enlace para restablecer tu contraseña'
         }), 200
@@ -267,14 +280,14 @@ def reset_password():
         if not data.get('token') or not data.get('password'):
             return jsonify({'error': 'Token y nueva contraseña son requeridos'}), 400
         
-        # Buscar usuario por token válido
-        usuario = Usuario.query.filter_by(password_reset_token=data['token']).first()
+        # Buscar token por su hash (clave primaria)
+        auth_token = token_service.find_token(data['token'], token_service.PASSWORD_RESET)
         
-        if not usuario:
+        if not auth_token:
             return jsonify({'error': 'Token inválido'}), 400
         
         # Verificar si el token ha expirado
-        if not usuario.password_reset_expires or usuario.password_reset_expires < datetime.utcnow():
+        if auth_token.is_expired():
             return jsonify({'error': 'Token expirado. Solicita un nuevo enlace de restablecimiento'}), 400
         
         # Validar nueva contraseña
@@ -282,14 +295,17 @@ def reset_password():
             return jsonify({'error': 'La contraseña debe tener al menos 6 caracteres'}), 400
         
         # Actualizar contraseña
+        usuario = db.session.get(Usuario, auth_token.user_id)
         usuario.set_password(data['password'])
-        usuario.password_reset_token = None  # Limpiar token usado
-        usuario.password_reset_expires = None  # Limpiar expiración
+        db.session.delete(auth_token)  # Eliminar token usado
         db.session.commit()
         
         return jsonify({
             'message': 'Contraseña restablecida exitosamente'
         }), 200
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return hasher_busy_response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
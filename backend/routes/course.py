@@ -1,7 +1,16 @@
-from flask import Blueprint, request, jsonify, current_app
-from models import db, Usuario, CourseContent
+from flask import Blueprint, request, jsonify, current_app, Response
+from models import db, Usuario, CourseContent, VideoUpload
 from werkzeug.utils import secure_filename
-import jwt
+from auth_service import get_current_user, get_current_user_id, get_token_claims, get_bearer_token, login_required, admin_required, course_access_required
+from audit_service import record, snapshot, changes_between
+from etag_service import make_etag, conditional_response
+from media_service import create_media_token
+from upload_service import allowed_video_file, create_upload, append_chunk, finalize_upload, abort_upload, UploadConflict, ChecksumMismatch
+from storage_service import save_stream, store_file, assign_blob, release_blob, blob_name
+from transcode_service import enqueue_transcode, clear_transcode
+from catalog_service import get_catalog, get_catalog_version, bump_catalog_version, invalidate_catalog, parse_content_fields, content_query
+import base64
+import binascii
 import os
 import uuid
 import re
@@ -10,12 +19,10 @@ from config import Config
 
 course_bp = Blueprint('course', __name__)
 
-# Configuración para uploads
-ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'wmv', 'flv', 'webm', 'mkv'}
 
-def allowed_video_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_VIDEO_EXTENSIONS
+# Campos editables del contenido que se registran en la auditoría
+AUDITED_CONTENT_FIELDS = ('title', 'description', 'duration', 'module', 'video_url', 'video_type',
+                          'drive_file_id', 'reading_material')
 
 def extract_google_drive_id(url):
     """
@@ -70,82 +77,100 @@ def detect_video_type(url):
     else:
         return 'youtube'  # Por defecto, asumir YouTube para URLs externas
 
-def get_current_user():
-    """Función helper para obtener el usuario actual desde el token JWT"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    
-    try:
-        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-        user_id = payload['user_id']
-        return Usuario.query.filter_by(id=user_id, activo=True).first()
-    except:
-        return None
-
-def require_admin():
-    """Verificar que el usuario actual sea admin"""
-    usuario = get_current_user()
-    if not usuario:
-        return None, {'error': 'Usuario no autenticado'}, 401
-    
-    if not usuario.is_admin():
-        return None, {'error': 'Acceso denegado. Se requieren permisos de administrador'}, 403
-    
-    return usuario, None, None
-
 @course_bp.route('/check-access', methods=['GET'])
+@login_required
 def verificar_acceso_curso():
     """
     Verificar si el usuario actual tiene acceso al curso
     """
     try:
         usuario = get_current_user()
-        if not usuario:
-            return jsonify({'error': 'Usuario no autenticado'}), 401
         
-        return jsonify({
+        return conditional_response(make_etag('check-access', usuario.id, usuario.version), lambda: jsonify({
             'has_access': usuario.has_course_access(),
             'usuario': usuario.to_dict()
+        }))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/media-token', methods=['GET'])
+@course_access_required
+def obtener_token_media():
+    """
+    Token para reproducir los videos subidos (/uploads/videos/<archivo>?token=...)
+    """
+    try:
+        return jsonify({
+            'token': create_media_token(get_current_user_id()),
+            'expires_in': Config.MEDIA_TOKEN_MINUTES * 60
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @course_bp.route('/content', methods=['GET'])
+@course_access_required
 def obtener_contenido_curso():
     """
     Obtener el contenido del curso (videos y material)
+    
+    Query params: view=summary (solo lo que usa la barra lateral, sin description ni
+    reading_material) o fields=a,b,c. Sin ellos se devuelven todos los campos;
+    el detalle de un video está en GET /content/<video_id>. usuario trae los datos
+    del token (id, email, rol); el perfil completo está en GET /auth/profile.
     """
     try:
-        from models import CourseContent
+        # Claims ya verificados por @course_access_required: sin consultar la base
+        claims = get_token_claims()
+        usuario = {'id': claims['user_id'], 'email': claims.get('email'), 'rol': claims.get('rol'),
+                   'has_access': True}
         
-        usuario = get_current_user()
-        if not usuario:
-            return jsonify({'error': 'Usuario no autenticado'}), 401
+        try:
+            fields = parse_content_fields(request.args.get('fields'), request.args.get('view'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Verificar acceso al curso
-        if not usuario.has_course_access():
-            return jsonify({'error': 'No tienes acceso al curso'}), 403
+        # Lista de videos ya serializada: por request solo se arma el JSON del usuario
+        version, videos = get_catalog(fields)
+        etag = make_etag('content', version, fields, usuario['id'], usuario['email'], usuario['rol'])
         
-        # Obtener contenido del curso
-        content_list = CourseContent.query.order_by(CourseContent.video_id).all()
+        def build():
+            user_json = current_app.json.dumps(usuario).encode()
+            return Response(b'{"usuario":' + user_json + b',"videos":' + videos + b'}', mimetype='application/json')
         
-        videos = []
-        for content in content_list:
-            videos.append(content.to_dict())
+        return conditional_response(etag, build)
         
-        return jsonify({
-            'videos': videos,
-            'usuario': usuario.to_dict()
-        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/content/<int:video_id>', methods=['GET'])
+@course_access_required
+def obtener_video_curso(video_id):
+    """
+    Detalle de un video del curso, con los campos pesados (description, reading_material)
+    
+    Query params: fields=a,b,c (por defecto todos)
+    """
+    try:
+        try:
+            fields = parse_content_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        def build():
+            content = content_query(fields).filter_by(video_id=video_id).first()
+            if not content:
+                return jsonify({'error': 'Video no encontrado'}), 404
+            return jsonify({'video': content.to_dict(fields)})
+        
+        return conditional_response(make_etag('video', get_catalog_version(), video_id, fields), build)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @course_bp.route('/content/<int:video_id>', methods=['PUT'])
+@admin_required
 def actualizar_contenido_curso(video_id):
     """
     Actualizar contenido del curso (solo para admins)
@@ -153,10 +178,6 @@ def actualizar_contenido_curso(video_id):
     try:
         from models import CourseContent
         
-        usuario, error, status = require_admin()
-        if error:
-            return jsonify(error), status
-        
         data = request.get_json()
         
         # Buscar o crear contenido
@@ -165,6 +186,7 @@ def actualizar_contenido_curso(video_id):
         if not content:
             content = CourseContent(video_id=video_id)
             db.session.add(content)
+        before = snapshot(content, AUDITED_CONTENT_FIELDS)
         
         # Actualizar campos permitidos
         if 'title' in data:
@@ -176,6 +198,10 @@ def actualizar_contenido_curso(video_id):
         if 'module' in data:
             content.module = data['module']
         if 'video_url' in data:
+            if data['video_url'] != content.video_url:
+                # Deja de usar el video subido: el blob pierde esta referencia
+                release_blob(content)
+                clear_transcode(content)
             content.video_url = data['video_url']
             # Detectar tipo de video y extraer ID de Google Drive si es necesario
             video_type = detect_video_type(data['video_url'])
@@ -190,7 +216,11 @@ def actualizar_contenido_curso(video_id):
         if 'reading_material' in data:
             content.reading_material = data['reading_material']
         
+        bump_catalog_version()
         db.session.commit()
+        invalidate_catalog()
+        record('course.update_content', 'course_content', video_id,
+               changes_between(before, snapshot(content, AUDITED_CONTENT_FIELDS)))
         
         return jsonify({
             'message': 'Contenido actualizado exitosamente',
@@ -201,6 +231,7 @@ def actualizar_contenido_curso(video_id):
         return jsonify({'error': str(e)}), 500
 
 @course_bp.route('/upload-video/<int:video_id>', methods=['POST'])
+@admin_required
 def upload_video_curso(video_id):
     """
     Subir video para un módulo específico del curso (solo para admins)
@@ -208,10 +239,6 @@ def upload_video_curso(video_id):
     try:
         from models import CourseContent
         
-        usuario, error, status = require_admin()
-        if error:
-            return jsonify(error), status
-        
         if 'video' not in request.files:
             return jsonify({'error': 'No se encontró el archivo de video'}), 400
         
@@ -221,30 +248,31 @@ def upload_video_curso(video_id):
             return jsonify({'error': 'No se seleccionó ningún archivo'}), 400
         
         if file and allowed_video_file(file.filename):
-            # Crear nombre seguro para el archivo
-            timestamp = int(datetime.now().timestamp())
-            filename = f"video_{video_id}_{timestamp}.{file.filename.rsplit('.', 1)[1].lower()}"
-            
-            # Crear directorio si no existe
-            upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos')
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            # Guardar archivo
-            file_path = os.path.join(upload_dir, filename)
-            file.save(file_path)
-            
-            # Actualizar o crear registro en la base de datos
-            content = CourseContent.query.filter_by(video_id=video_id).first()
-            if not content:
-                content = CourseContent(video_id=video_id)
-                db.session.add(content)
-            
-            content.video_url = f"/uploads/videos/{filename}"
-            db.session.commit()
+            # Guardar por contenido: el hash se calcula mientras se copia el archivo
+            temp_path, sha256, size = save_stream(file.stream)
+            try:
+                blob = store_file(temp_path, sha256, size, file.filename.rsplit('.', 1)[1])
+                
+                # Actualizar o crear registro en la base de datos
+                content = CourseContent.query.filter_by(video_id=video_id).first()
+                if not content:
+                    content = CourseContent(video_id=video_id, title=f'Video {video_id}')
+                    db.session.add(content)
+                
+                previous_url = content.video_url
+                assign_blob(content, blob)
+                enqueue_transcode(content)
+                bump_catalog_version()
+                db.session.commit()
+            finally:
+                os.remove(temp_path)
+            invalidate_catalog()
+            record('course.upload_video', 'course_content', video_id,
+                   {'video_url': [previous_url, content.video_url], 'size': size})
             
             return jsonify({
                 'message': 'Video subido exitosamente',
-                'filename': filename,
+                'filename': blob_name(blob.sha256, blob.extension),
                 'video_url': content.video_url,
                 'content': content.to_dict()
             }), 200
@@ -254,16 +282,186 @@ def upload_video_curso(video_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _upload_response(upload, status=200):
+    response = jsonify({'upload': upload.to_dict()})
+    response.status_code = status
+    # Headers de tus: el cliente retoma desde Upload-Offset
+    response.headers['Upload-Offset'] = str(upload.offset)
+    response.headers['Upload-Length'] = str(upload.size)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@course_bp.route('/uploads', methods=['POST'])
+@admin_required
+def crear_subida():
+    """
+    Iniciar una subida de video por partes, reanudable (solo para admins)
+    
+    Body: {"video_id": 1, "filename": "clase.mp4", "size": bytes, "checksum": sha256 hex opcional}.
+    Después: PATCH /uploads/<id> con cada parte, GET /uploads/<id> para saber desde
+    dónde retomar y POST /uploads/<id>/finalize para asignarlo al video.
+    """
+    try:
+        data = request.get_json() or {}
+        if not isinstance(data.get('video_id'), int):
+            return jsonify({'error': 'video_id es requerido'}), 400
+        
+        try:
+            upload = create_upload(data['video_id'], data.get('filename'), data.get('size'),
+                                   data.get('checksum'), get_current_user().id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        db.session.commit()
+        
+        response = _upload_response(upload, 201)
+        response.headers['Location'] = f'{request.path}/{upload.id}'
+        return response
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+@admin_required
+def estado_subida(upload_id):
+    """
+    Estado de una subida: offset confirmado desde el que se debe retomar (solo para admins)
+    """
+    try:
+        upload = db.session.get(VideoUpload, upload_id)
+        if not upload:
+            return jsonify({'error': 'Subida no encontrada'}), 404
+        return _upload_response(upload)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@admin_required
+def subir_parte(upload_id):
+    """
+    Agregar una parte a la subida (solo para admins)
+    
+    Headers: Upload-Offset (debe coincidir con el estado), Content-Type
+    application/offset+octet-stream y, opcional, Upload-Checksum: sha256 <base64>.
+    El body son los bytes de la parte (como máximo UPLOAD_CHUNK_MAX_SIZE).
+    """
+    try:
+        if request.mimetype != 'application/offset+octet-stream':
+            return jsonify({'error': 'Content-Type debe ser application/offset+octet-stream'}), 415
+        
+        chunk_checksum = None
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            if request.headers.get('Upload-Checksum'):
+                algorithm, _, value = request.headers['Upload-Checksum'].partition(' ')
+                if algorithm != 'sha256':
+                    raise ValueError('Upload-Checksum solo admite sha256')
+                chunk_checksum = base64.b64decode(value, validate=True)
+        except (ValueError, binascii.Error) as e:
+            return jsonify({'error': f'Headers de la parte inválidos: {e}'}), 400
+        
+        try:
+            upload = append_chunk(upload_id, offset, request.stream, request.content_length, chunk_checksum)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        except UploadConflict as e:
+            db.session.rollback()
+            return jsonify({'error': str(e), 'offset': e.offset}), 409
+        except ChecksumMismatch as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 460  # Código de tus para checksum incorrecto
+        
+        if not upload:
+            return jsonify({'error': 'Subida no encontrada'}), 404
+        return _upload_response(upload)
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@admin_required
+def finalizar_subida(upload_id):
+    """
+    Verificar la subida completa y asignarla al video del curso (solo para admins)
+    """
+    try:
+        try:
+            result = finalize_upload(upload_id)
+        except UploadConflict as e:
+            db.session.rollback()
+            return jsonify({'error': str(e), 'offset': e.offset}), 409
+        except ChecksumMismatch as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 460
+        
+        if not result:
+            return jsonify({'error': 'Subida no encontrada'}), 404
+        upload, content = result
+        record('course.upload_video', 'course_content', upload.video_id,
+               {'video_url': upload.video_url, 'size': upload.size, 'upload_id': upload.id})
+        
+        return jsonify({
+            'message': 'Video subido exitosamente',
+            'upload': upload.to_dict(),
+            'video_url': upload.video_url,
+            'content': content.to_dict() if content else None
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@admin_required
+def cancelar_subida(upload_id):
+    """
+    Cancelar una subida y borrar lo recibido (solo para admins)
+    """
+    try:
+        if not abort_upload(upload_id):
+            return jsonify({'error': 'Subida no encontrada'}), 404
+        return jsonify({'message': 'Subida cancelada'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/content/<int:video_id>/transcode', methods=['POST'])
+@admin_required
+def transcodificar_video(video_id):
+    """
+    Volver a encolar la transcodificación a HLS de un video subido, por ejemplo
+    tras un fallo (solo para admins)
+    """
+    try:
+        content = CourseContent.query.filter_by(video_id=video_id).first()
+        if not content:
+            return jsonify({'error': 'Video no encontrado'}), 404
+        if not content.media_sha256:
+            return jsonify({'error': 'El video no es un archivo subido'}), 400
+        
+        enqueue_transcode(content)
+        bump_catalog_version()
+        db.session.commit()
+        invalidate_catalog()
+        record('course.transcode', 'course_content', video_id, {'hls_status': content.hls_status})
+        
+        return jsonify({'content': content.to_dict()}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @course_bp.route('/upload-video', methods=['POST'])
+@admin_required
 def upload_video_general():
     """
     Subir video general (funcionalidad legacy, solo para admins)
     """
     try:
-        usuario, error, status = require_admin()
-        if error:
-            return jsonify(error), status
-        
         if 'video' not in request.files:
             return jsonify({'error': 'No video file'}), 400
         
@@ -304,16 +502,15 @@ def debug_auth():
     """Endpoint temporal para debug de autenticación"""
     try:
         auth_header = request.headers.get('Authorization')
-        token = None
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
+        token = get_bearer_token()
+        usuario = get_current_user()
         
         return jsonify({
             'auth_header': auth_header,
             'token_present': bool(token),
             'token_preview': token[:20] + '...' if token else None,
             'headers': dict(request.headers),
-            'user': get_current_user().to_dict() if get_current_user() else None
+            'user': usuario.to_dict() if usuario else None
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
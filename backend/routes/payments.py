@@ -1,26 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from models import db, Usuario
-import jwt
+from auth_service import get_current_user, login_required, invalidate_user, bump_users_version
 from datetime import datetime
-from config import Config
 
 payments_bp = Blueprint('payments', __name__)
 
-def get_current_user():
-    """Función helper para obtener el usuario actual desde el token JWT"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    
-    try:
-        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-        user_id = payload['user_id']
-        return Usuario.query.filter_by(id=user_id, activo=True).first()
-    except:
-        return None
-
 @payments_bp.route('/mp-debug', methods=['GET'])
 def debug_mercadopago():
     """
@@ -35,6 +19,7 @@ def debug_mercadopago():
         return jsonify({'error': f'Error en debug: {str(e)}'}), 500
 
 @payments_bp.route('/create-preference', methods=['POST'])
+@login_required
 def crear_preferencia_pago():
     """
     Crear preferencia de pago en MercadoPago
@@ -43,9 +28,6 @@ def crear_preferencia_pago():
     
     try:
         user = get_current_user()
-        if not user:
-            return jsonify({'error': 'Usuario no autenticado'}), 401
-        
         data = request.get_json()
         
         # Datos del producto
@@ -109,7 +91,9 @@ def webhook_mercadopago():
                             
                             if user:
                                 user.has_access = True
+                                bump_users_version()
                                 db.session.commit()
+                                invalidate_user(user.id)
                                 
                                 # Log del pago exitoso
                                 current_app.logger.info(f"Payment approved for user {user_id}: {result['payment_id']}")
@@ -124,14 +108,11 @@ def webhook_mercadopago():
         return jsonify({'error': str(e)}), 500
 
 @payments_bp.route('/status/<payment_id>', methods=['GET'])
+@login_required
 def obtener_estado_pago(payment_id):
     """Obtener estado de un pago específico"""
     from mercadopago_service import mp_service
     
-    user = get_current_user()
-    if not user:
-        return jsonify({'error': 'Usuario no autenticado'}), 401
-    
     try:
         result = mp_service.get_payment_info(payment_id)
         
@@ -0,0 +1,162 @@
+from models import db, MediaBlob
+from flask import current_app
+from sqlalchemy import update
+from datetime import datetime, timedelta
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from config import Config
+
+READ_SIZE = 1024 * 1024
+BLOB_NAME_RE = re.compile(r'^([0-9a-f]{64})\.([a-z0-9]{1,10})$')
+# Derivados de cada blob (transcodificaciones) en uploads/videos/hls/<sha256>/
+HLS_DIR = 'hls'
+CAS_DIR = 'cas'
+
+def _videos_dir():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos')
+
+def blob_name(sha256, extension):
+    return f'{sha256}.{extension}'
+
+def blob_relpath(name):
+    """
+    Ruta relativa a uploads/videos de un blob por su nombre (<sha256>.<ext>), o None
+    si el nombre no es de un blob. Dos niveles de directorios por prefijo del hash
+    mantienen cada directorio chico aunque haya muchos videos.
+    """
+    match = BLOB_NAME_RE.match(name)
+    if not match:
+        return None
+    sha256 = match.group(1)
+    return os.path.join(CAS_DIR, sha256[:2], sha256[2:4], name)
+
+def blob_url(blob):
+    # El contenido de la URL nunca cambia: se puede cachear para siempre
+    return f'/uploads/videos/{blob_name(blob.sha256, blob.extension)}'
+
+def _blob_path(sha256, extension):
+    return os.path.join(_videos_dir(), blob_relpath(blob_name(sha256, extension)))
+
+def blob_path(blob):
+    return _blob_path(blob.sha256, blob.extension)
+
+def save_stream(stream):
+    """
+    Copiar un stream a un archivo temporal calculando el SHA-256 en la misma pasada.
+    Retorna (ruta temporal, sha256 hex, tamaño).
+    """
+    temp_dir = os.path.join(_videos_dir(), '.partial')
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, f'{uuid.uuid4().hex}.tmp')
+    hasher, size = hashlib.sha256(), 0
+    with open(temp_path, 'wb') as f:
+        while True:
+            data = stream.read(READ_SIZE)
+            if not data:
+                break
+            f.write(data)
+            hasher.update(data)
+            size += len(data)
+    return temp_path, hasher.hexdigest(), size
+
+def _link_into_place(source, path):
+    """
+    Publicar source en path sin moverlo: enlace duro (mismo volumen, sin copiar) a un
+    nombre temporal y os.replace atómico. Si el filesystem no admite enlaces, copia.
+    """
+    if os.path.exists(path) and os.path.samefile(source, path):
+        # Reintento tras un commit fallido: ya está enlazado (y rename no haría nada)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, path)
+
+def store_file(source_path, sha256, size, extension):
+    """
+    Guardar un archivo ya hasheado como blob. Si ya existe un blob con ese contenido
+    no se escribe nada (una nueva subida idéntica no ocupa disco); si no, se enlaza
+    en cas/. El archivo de origen no se toca: el llamador lo borra recién después del
+    commit, así un commit fallido se puede reintentar desde el mismo archivo.
+    Retorna el MediaBlob con su fila bloqueada hasta el commit, para que la limpieza
+    no lo borre en el medio.
+    """
+    blob = MediaBlob.query.filter_by(sha256=sha256).with_for_update().first()
+    # Mismo contenido con otra extensión: se reutiliza el blob existente
+    path = _blob_path(sha256, blob.extension if blob else extension.lower())
+
+    if not (blob and os.path.exists(path)):
+        _link_into_place(source_path, path)
+    if not blob:
+        # released_at desde ya: si nunca se asigna, la limpieza lo borra pasado el margen
+        blob = MediaBlob(sha256=sha256, extension=extension.lower(), size=size, ref_count=0,
+                         released_at=datetime.utcnow())
+        db.session.add(blob)
+        db.session.flush()
+    return blob
+
+def _adjust_ref_count(sha256, delta):
+    values = {'ref_count': MediaBlob.ref_count + delta}
+    if delta < 0:
+        values['released_at'] = datetime.utcnow()
+    db.session.execute(update(MediaBlob).where(MediaBlob.sha256 == sha256).values(values))
+
+def assign_blob(content, blob):
+    """Apuntar el contenido al blob, moviendo la referencia desde el blob anterior"""
+    if content.media_sha256 != blob.sha256:
+        release_blob(content)
+        _adjust_ref_count(blob.sha256, 1)
+        content.media_sha256 = blob.sha256
+    content.video_url = blob_url(blob)
+    content.video_type = 'local'
+    content.drive_file_id = None
+
+def release_blob(content):
+    """Quitar la referencia del contenido a su blob (al cambiar a otro video o URL)"""
+    if content.media_sha256:
+        _adjust_ref_count(content.media_sha256, -1)
+        content.media_sha256 = None
+
+def purge_unreferenced_blobs():
+    """
+    Borrar los blobs sin referencias desde hace MEDIA_BLOB_GRACE_HOURS horas, junto
+    con sus transcodificaciones.
+    El archivo se borra con la fila bloqueada y antes del commit: una subida idéntica
+    concurrente espera ese lock y, al no encontrar la fila, vuelve a guardar el archivo.
+    Retorna la cantidad borrada.
+    """
+    cas_dir = os.path.join(_videos_dir(), CAS_DIR)
+    if not os.path.isdir(cas_dir):
+        # Sin el volumen de uploads se borrarían las filas dejando los archivos en disco
+        current_app.logger.warning(f"{cas_dir} no existe: no se limpian los videos sin referencias")
+        return 0
+    cutoff = datetime.utcnow() - timedelta(hours=Config.MEDIA_BLOB_GRACE_HOURS)
+    candidates = [row.sha256 for row in db.session.query(MediaBlob.sha256).filter(
+        MediaBlob.ref_count <= 0, MediaBlob.released_at < cutoff
+    ).all()]
+
+    deleted = 0
+    for sha256 in candidates:
+        blob = MediaBlob.query.filter_by(sha256=sha256).with_for_update().first()
+        if not blob or blob.ref_count > 0:
+            db.session.rollback()
+            continue
+        path = _blob_path(blob.sha256, blob.extension)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            current_app.logger.warning(f"Video {blob.sha256} sin archivo en disco: {path}")
+        try:
+            shutil.rmtree(os.path.join(_videos_dir(), HLS_DIR, blob.sha256))
+        except FileNotFoundError:
+            pass  # Nunca se transcodificó
+        db.session.delete(blob)
+        db.session.commit()
+        deleted += 1
+    return deleted
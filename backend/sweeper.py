@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tareas periódicas de limpieza: borra en lotes los tokens de un solo uso expirados,
+las entradas de auditoría más viejas que AUDIT_RETENTION_DAYS, las subidas de
+video abandonadas, los videos que ningún contenido del curso usa y los intentos
+viejos del rate limiter.
+
+Uso:
+    python sweeper.py            # una pasada
+    python sweeper.py --loop     # cada TOKEN_SWEEP_INTERVAL segundos
+"""
+import argparse
+import time
+from app import create_app
+from config import Config
+from models import db
+from token_service import purge_expired_tokens
+from audit_service import purge_audit_log
+from upload_service import purge_stale_uploads
+from storage_service import purge_unreferenced_blobs
+from rate_limit_service import purge_rate_limits
+
+def sweep():
+    deleted = purge_expired_tokens()
+    print(f"🧹 Tokens expirados eliminados: {deleted}")
+    deleted = purge_audit_log()
+    print(f"🧹 Entradas de auditoría vencidas eliminadas: {deleted}")
+    deleted = purge_stale_uploads()
+    print(f"🧹 Subidas de video abandonadas eliminadas: {deleted}")
+    deleted = purge_unreferenced_blobs()
+    print(f"🧹 Videos sin referencias eliminados: {deleted}")
+    purge_rate_limits()
+    print("🧹 Intentos vencidos del rate limiter eliminados")
+
+def main():
+    parser = argparse.ArgumentParser(description='Limpieza periódica de la base de datos')
+    parser.add_argument('--loop', action='store_true', help='Repetir cada TOKEN_SWEEP_INTERVAL segundos')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        while True:
+            try:
+                sweep()
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error en limpieza: {e}")
+
+            if not args.loop:
+                break
+            time.sleep(Config.TOKEN_SWEEP_INTERVAL)
+
+if __name__ == '__main__':
+    main()
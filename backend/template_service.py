@@ -0,0 +1,59 @@
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+import os
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'email_templates')
+
+class EmailTemplates:
+    """
+    Plantillas de email precompiladas.
+
+    Estructura: email_templates/<locale>/<tipo>.html y <tipo>.txt. La variante de
+    texto define el asunto con {% set subject = "..." %}. Los archivos que empiezan
+    con "_" son layouts compartidos.
+
+    Todas las plantillas se compilan una sola vez al crear la instancia (al iniciar
+    la app) y no se vuelven a leer del disco: renderizar es solo ejecutar el código
+    ya compilado.
+    """
+
+    def __init__(self, path=TEMPLATES_DIR, default_locale='es'):
+        self.env = Environment(
+            loader=FileSystemLoader(path),
+            autoescape=select_autoescape(['html']),
+            auto_reload=False,  # No revisar la fecha de los archivos en cada render
+            cache_size=-1,
+            trim_blocks=True,
+            lstrip_blocks=True
+        )
+        self.default_locale = default_locale
+        self._compiled = {}  # (tipo, locale, variante) -> Template
+
+        for name in self.env.list_templates():
+            locale, _, filename = name.partition('/')
+            if not filename or filename.startswith('_'):
+                continue
+            kind, _, variant = filename.rpartition('.')
+            self._compiled[(kind, locale, variant)] = self.env.get_template(name)
+
+        self.locales = sorted({locale for _, locale, _ in self._compiled})
+        self.kinds = sorted({kind for kind, _, _ in self._compiled})
+
+    def get(self, kind, locale, variant):
+        """Plantilla compilada, con fallback al locale por defecto"""
+        template = self._compiled.get((kind, locale, variant))
+        if template is None:
+            template = self._compiled.get((kind, self.default_locale, variant))
+        if template is None:
+            raise ValueError(f'No existe la plantilla de email {kind}.{variant}')
+        return template
+
+    def best_locale(self, accept_languages):
+        """Elegir el locale disponible que mejor coincide con el header Accept-Language"""
+        return accept_languages.best_match(self.locales) or self.default_locale
+
+    def render(self, kind, locale=None, **context):
+        """Renderizar un email. Retorna (asunto, html, texto)."""
+        locale = locale or self.default_locale
+        text_module = self.get(kind, locale, 'txt').make_module(context)
+        html = self.get(kind, locale, 'html').render(context)
+        return text_module.subject, html, str(text_module)
@@ -0,0 +1,60 @@
+from models import db, AuthToken
+from datetime import datetime, timedelta
+import hashlib
+import secrets
+from config import Config
+
+# Propósitos de los tokens de un solo uso
+EMAIL_CONFIRMATION = 'email_confirmation'
+PASSWORD_RESET = 'password_reset'
+
+TOKEN_TTLS = {
+    EMAIL_CONFIRMATION: timedelta(hours=Config.EMAIL_CONFIRMATION_TOKEN_HOURS),
+    PASSWORD_RESET: timedelta(minutes=Config.PASSWORD_RESET_TOKEN_MINUTES),
+}
+
+def hash_token(token):
+    """En la base solo se guarda el SHA-256 del token, nunca el token en claro"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def issue_token(user_id, purpose, ttl=None):
+    """
+    Crear un token de un solo uso para el usuario e invalidar los anteriores del mismo propósito.
+    Agrega la fila a la sesión (no hace commit) y retorna el token en claro para enviarlo por email.
+    """
+    AuthToken.query.filter_by(user_id=user_id, purpose=purpose).delete()
+
+    token = secrets.token_urlsafe(32)
+    db.session.add(AuthToken(
+        token_hash=hash_token(token),
+        purpose=purpose,
+        user_id=user_id,
+        expires_at=datetime.utcnow() + (ttl or TOKEN_TTLS[purpose])
+    ))
+    return token
+
+def find_token(token, purpose):
+    """Buscar un token por su hash (clave primaria). Puede estar expirado: ver AuthToken.is_expired()"""
+    if not token:
+        return None
+    auth_token = db.session.get(AuthToken, hash_token(token))
+    if not auth_token or auth_token.purpose != purpose:
+        return None
+    return auth_token
+
+def purge_expired_tokens(batch_size=1000):
+    """Borrar tokens expirados en lotes, con un commit por lote. Retorna la cantidad borrada."""
+    total = 0
+    while True:
+        batch = db.session.query(AuthToken.token_hash).filter(
+            AuthToken.expires_at < datetime.utcnow()
+        ).limit(batch_size).subquery()
+
+        deleted = AuthToken.query.filter(
+            AuthToken.token_hash.in_(db.select(batch.c.token_hash))
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+        total += deleted
+        if deleted < batch_size:
+            return total
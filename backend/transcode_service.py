@@ -0,0 +1,356 @@
+from models import db, CourseContent, MediaBlob
+from sqlalchemy import update
+from flask import current_app
+from catalog_service import bump_catalog_version, invalidate_catalog
+from storage_service import HLS_DIR, blob_path
+from collections import namedtuple
+from datetime import datetime, timedelta
+from hashlib import blake2b
+import json
+import os
+import re
+import shutil
+import subprocess
+import uuid
+from config import Config
+
+MASTER_PLAYLIST = 'master.m3u8'
+# Lo único que se sirve de una salida HLS: el master, los playlists de cada calidad y sus segmentos.
+# Todo en un mismo directorio: ffmpeg escribe el master junto al playlist de la primera calidad.
+HLS_FILE_RE = re.compile(r'^(master\.m3u8|v\d+\.m3u8|v\d+_\d+\.ts)$')
+
+# Metadatos y miniaturas de cada video, en hls/<sha256>/media/ (no dependen de la escalera)
+MEDIA_DIR = 'media'
+MEDIA_FILE_RE = re.compile(r'^(poster|sprite)\.jpg$')
+METADATA_FILE = 'metadata.json'
+POSTER_WIDTH = 640
+SPRITE_COLUMNS = 5
+SPRITE_ROWS = 5
+SPRITE_TILE_WIDTH = 160
+
+TranscodeJob = namedtuple('TranscodeJob', 'content_id sha256 source output_dir media_dir')
+
+def parse_ladder(ladder):
+    """'1080:5000,720:2800' -> [(1080, 5000), (720, 2800)] (alto en px, kbps), de mayor a menor"""
+    rungs = []
+    for rung in ladder.split(','):
+        height, kbps = rung.strip().split(':')
+        rungs.append((int(height), int(kbps)))
+    return sorted(rungs, reverse=True)
+
+def hls_profile():
+    """
+    Clave corta de la configuración de transcodificación. La salida vive en
+    hls/<sha256>/<perfil>/: el mismo video con la misma configuración no se
+    vuelve a transcodificar, y cambiar la escalera genera URLs nuevas (las
+    anteriores se cachean para siempre).
+    """
+    key = repr((parse_ladder(Config.TRANSCODE_LADDER), Config.TRANSCODE_SEGMENT_SECONDS))
+    return blake2b(key.encode(), digest_size=4).hexdigest()
+
+def hls_output_dir(sha256, profile=None):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos', HLS_DIR, sha256, profile or hls_profile())
+
+def hls_url(sha256, profile=None):
+    return f'/uploads/hls/{sha256}/{profile or hls_profile()}/{MASTER_PLAYLIST}'
+
+def media_dir(sha256):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos', HLS_DIR, sha256, MEDIA_DIR)
+
+def format_duration(seconds):
+    """Duración como la muestra el curso: '25:30' o '1:05:09'"""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
+
+def apply_media_info(content, info):
+    """Copiar los metadatos de analyze_media a las columnas del contenido"""
+    content.duration_seconds = info['duration']
+    if info['duration']:
+        content.duration = format_duration(info['duration'])
+    content.width = info['width']
+    content.height = info['height']
+    content.video_codec = info['video_codec']
+    content.audio_codec = info['audio_codec']
+    content.bit_rate = info['bit_rate']
+    base = f'/uploads/hls/{content.media_sha256}/{MEDIA_DIR}'
+    content.poster_url = f'{base}/poster.jpg'
+    content.sprite_url = f'{base}/sprite.jpg'
+
+def _clear_media_info(content):
+    # duration (texto) se conserva: pudo haberla escrito el admin
+    content.duration_seconds = content.width = content.height = None
+    content.video_codec = content.audio_codec = content.bit_rate = None
+    content.poster_url = content.sprite_url = None
+
+def enqueue_transcode(content):
+    """
+    Encolar el procesamiento del video subido del contenido (llamar después de
+    assign_blob, antes del commit). Lo que ya exista para ese archivo (subida
+    idéntica) se usa sin trabajo nuevo: metadatos y miniaturas, y la
+    transcodificación si es de la configuración actual.
+    """
+    content.hls_error = None
+    content.hls_attempts = 0
+    content.hls_updated_at = datetime.utcnow()
+    metadata_path = os.path.join(media_dir(content.media_sha256), METADATA_FILE)
+    if os.path.isfile(metadata_path):
+        with open(metadata_path) as f:
+            apply_media_info(content, json.load(f))
+    else:
+        _clear_media_info(content)
+    if os.path.isfile(os.path.join(hls_output_dir(content.media_sha256), MASTER_PLAYLIST)):
+        content.hls_status = 'ready'
+        content.hls_url = hls_url(content.media_sha256)
+    else:
+        content.hls_status = 'pending'
+        content.hls_url = None
+
+def clear_transcode(content):
+    """El contenido dejó de usar un video subido: no hay HLS ni miniaturas que ofrecer"""
+    content.hls_status = None
+    content.hls_url = None
+    content.hls_error = None
+    _clear_media_info(content)
+
+def claim_jobs(limit):
+    """
+    Tomar hasta limit trabajos pendientes, los más viejos primero. SKIP LOCKED
+    (PostgreSQL) permite varios procesos de transcodificación sin tomar el mismo.
+    """
+    contents = CourseContent.query.filter_by(hls_status='pending').order_by(
+        CourseContent.hls_updated_at
+    ).with_for_update(skip_locked=True).limit(limit).all()
+
+    jobs = []
+    for content in contents:
+        content.hls_status = 'processing'
+        content.hls_attempts = (content.hls_attempts or 0) + 1
+        content.hls_updated_at = datetime.utcnow()
+        jobs.append(TranscodeJob(content.id, content.media_sha256,
+                                 blob_path(db.session.get(MediaBlob, content.media_sha256)),
+                                 hls_output_dir(content.media_sha256), media_dir(content.media_sha256)))
+    db.session.commit()
+    return jobs
+
+def _locked_job_content(job):
+    """El contenido del trabajo bloqueado, o None si mientras tanto cambió de video o se reencoló"""
+    content = CourseContent.query.filter_by(id=job.content_id).with_for_update().first()
+    if not content or content.media_sha256 != job.sha256 or content.hls_status != 'processing':
+        return None
+    return content
+
+def save_media_info(job, info):
+    """
+    Guardar los metadatos y miniaturas de la primera etapa: la página del curso
+    los muestra sin esperar la transcodificación. Retorna False si el trabajo ya
+    no corresponde (no hay que seguir con la segunda etapa).
+    """
+    content = _locked_job_content(job)
+    if not content:
+        db.session.commit()
+        return False
+    apply_media_info(content, info)
+    content.hls_updated_at = datetime.utcnow()  # Empieza la segunda etapa: lease nuevo
+    bump_catalog_version()
+    db.session.commit()
+    invalidate_catalog()
+    return True
+
+def complete_job(job, error=None):
+    """
+    Registrar el resultado de un trabajo. Si mientras tanto el contenido cambió de
+    video (o se volvió a encolar) el resultado se descarta; la salida queda en
+    disco y sirve si ese video se vuelve a subir.
+    """
+    content = _locked_job_content(job)
+    if not content:
+        db.session.commit()
+        return False
+
+    if error:
+        content.hls_status = 'failed'
+        content.hls_error = str(error)[:1000]
+    else:
+        content.hls_status = 'ready'
+        content.hls_url = hls_url(job.sha256, os.path.basename(job.output_dir))
+    content.hls_updated_at = datetime.utcnow()
+    bump_catalog_version()
+    db.session.commit()
+    invalidate_catalog()
+    return True
+
+def renew_leases(jobs):
+    """
+    Heartbeat del worker: renovar hls_updated_at de los trabajos que sigue procesando
+    (en cualquiera de las dos etapas) para que requeue_stale_jobs no los tome.
+    """
+    if not jobs:
+        return
+    db.session.execute(update(CourseContent).where(
+        CourseContent.id.in_([job.content_id for job in jobs]), CourseContent.hls_status == 'processing'
+    ).values(hls_updated_at=datetime.utcnow()))
+    db.session.commit()
+
+def requeue_stale_jobs():
+    """
+    Devolver a la cola los trabajos 'processing' de un proceso que murió sin
+    terminarlos: el worker vivo renueva la fecha de los suyos (renew_leases), así
+    que uno sin renovar en TRANSCODE_LEASE_SECONDS no lo está procesando nadie.
+    Tras TRANSCODE_MAX_ATTEMPTS quedan en 'failed'. Retorna la cantidad.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.TRANSCODE_LEASE_SECONDS)
+    stale = CourseContent.query.filter(
+        CourseContent.hls_status == 'processing', CourseContent.hls_updated_at < cutoff
+    ).with_for_update(skip_locked=True).all()
+    for content in stale:
+        if content.hls_attempts >= Config.TRANSCODE_MAX_ATTEMPTS:
+            content.hls_status = 'failed'
+            content.hls_error = 'La transcodificación se interrumpió demasiadas veces'
+        else:
+            content.hls_status = 'pending'
+        content.hls_updated_at = datetime.utcnow()
+    db.session.commit()
+    return len(stale)
+
+def rewrite_playlist(path, token):
+    """
+    Playlist .m3u8 con ?token= agregado a cada URI relativa: el reproductor pide
+    los playlists de cada calidad y los segmentos sin los parámetros del master,
+    y <video> no puede enviar Authorization.
+    """
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    if token:
+        suffix = '?token=' + token
+        lines = [line + suffix if line and not line.startswith('#') else line for line in lines]
+    return '\n'.join(lines) + '\n'
+
+# --- Lo que sigue corre en los procesos del pool (sin app ni base de datos) ---
+
+def lower_priority(niceness):
+    """Inicializador del pool: ffmpeg hereda la prioridad baja y cede CPU a gunicorn"""
+    os.nice(niceness)
+
+def _run(command, timeout):
+    """Correr ffmpeg/ffprobe; los errores quedan como RuntimeError con el final de su stderr"""
+    try:
+        return subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              timeout=timeout, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(e.stderr.decode(errors='replace')[-500:] or f'{command[0]} terminó con código {e.returncode}')
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f'{command[0]} superó los {timeout} segundos')
+
+def _publish_dir(temp_dir, output_dir):
+    """Renombrar el directorio terminado a su lugar definitivo (atómico)"""
+    try:
+        os.rename(temp_dir, output_dir)
+    except OSError:
+        # Otro proceso terminó el mismo video antes: su salida es equivalente
+        if not os.path.isdir(output_dir):
+            raise
+
+def probe_media(source):
+    """Duración, resolución, codecs y bitrate del archivo, según ffprobe"""
+    output = _run(['ffprobe', '-v', 'error', '-show_entries',
+                   'format=duration,bit_rate:stream=codec_type,codec_name,width,height', '-of', 'json', source], 60)
+    data = json.loads(output)
+    streams = data.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    if not video or not video.get('height'):
+        raise RuntimeError('El archivo no tiene una pista de video')
+    container = data.get('format', {})
+    return {
+        'duration': float(container.get('duration') or 0),
+        'width': video.get('width'),
+        'height': video['height'],
+        'video_codec': video.get('codec_name'),
+        'audio_codec': audio.get('codec_name') if audio else None,
+        'bit_rate': int(container['bit_rate']) if container.get('bit_rate') else None,
+    }
+
+def analyze_media(source, output_dir, timeout):
+    """
+    Primera etapa (rápida): metadatos del archivo, un póster y un sprite de
+    SPRITE_COLUMNS x SPRITE_ROWS cuadros repartidos en todo el video (para las
+    vistas previas al adelantar). Es idempotente: si output_dir ya existe se
+    retornan los metadatos guardados. Retorna el dict de metadatos.
+    """
+    metadata_path = os.path.join(output_dir, METADATA_FILE)
+    if os.path.isfile(metadata_path):
+        with open(metadata_path) as f:
+            return json.load(f)
+
+    info = probe_media(source)
+    frames = SPRITE_COLUMNS * SPRITE_ROWS
+    info['sprite'] = {'columns': SPRITE_COLUMNS, 'rows': SPRITE_ROWS, 'tile_width': SPRITE_TILE_WIDTH,
+                      'interval': max(info['duration'] / frames, 1.0)}
+
+    temp_dir = f'{output_dir}.tmp-{uuid.uuid4().hex[:8]}'
+    os.makedirs(temp_dir)
+    try:
+        # -ss antes de -i: busca por keyframes sin decodificar desde el principio
+        _run(['ffmpeg', '-nostdin', '-y', '-v', 'error', '-ss', f"{info['duration'] * 0.1:.2f}", '-i', source,
+              '-frames:v', '1', '-vf', f'scale={POSTER_WIDTH}:-2', '-q:v', '4',
+              os.path.join(temp_dir, 'poster.jpg')], timeout)
+        # Solo se decodifican los keyframes: el sprite de una clase larga sale en segundos
+        _run(['ffmpeg', '-nostdin', '-y', '-v', 'error', '-skip_frame', 'nokey', '-i', source, '-an',
+              '-vf', f"fps=1/{info['sprite']['interval']:.3f},scale={SPRITE_TILE_WIDTH}:-2,"
+                     f"tile={SPRITE_COLUMNS}x{SPRITE_ROWS}",
+              '-frames:v', '1', '-q:v', '5', os.path.join(temp_dir, 'sprite.jpg')], timeout)
+        with open(os.path.join(temp_dir, METADATA_FILE), 'w') as f:
+            json.dump(info, f)
+        _publish_dir(temp_dir, output_dir)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return info
+
+def ffmpeg_command(source, output_dir, rungs, has_audio, segment_seconds, threads):
+    """
+    Un solo ffmpeg que decodifica una vez y codifica todas las calidades, con
+    keyframes alineados al inicio de cada segmento para poder cambiar de calidad.
+    """
+    split = f'[0:v]split={len(rungs)}' + ''.join(f'[s{i}]' for i in range(len(rungs)))
+    scales = [f'[s{i}]scale=-2:{height}[v{i}]' for i, (height, _) in enumerate(rungs)]
+    command = ['ffmpeg', '-nostdin', '-y', '-v', 'error', '-i', source, '-threads', str(threads),
+               '-filter_complex', ';'.join([split] + scales)]
+    for i, (_, kbps) in enumerate(rungs):
+        command += ['-map', f'[v{i}]', f'-b:v:{i}', f'{kbps}k', f'-maxrate:v:{i}', f'{kbps * 107 // 100}k',
+                    f'-bufsize:v:{i}', f'{kbps * 2}k']
+        if has_audio:
+            command += ['-map', '0:a:0']
+    command += ['-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main', '-sc_threshold', '0',
+                '-force_key_frames', f'expr:gte(t,n_forced*{segment_seconds})']
+    if has_audio:
+        command += ['-c:a', 'aac', '-b:a', '128k', '-ac', '2']
+    stream_map = ' '.join(f'v:{i},a:{i}' if has_audio else f'v:{i}' for i in range(len(rungs)))
+    command += ['-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+                '-hls_flags', 'independent_segments', '-master_pl_name', MASTER_PLAYLIST,
+                '-hls_segment_filename', os.path.join(output_dir, 'v%v_%05d.ts'),
+                '-var_stream_map', stream_map, os.path.join(output_dir, 'v%v.m3u8')]
+    return command
+
+def run_transcode(source, output_dir, ladder, segment_seconds, threads, timeout):
+    """
+    Generar la escalera HLS de source en output_dir. Se escribe en un directorio
+    temporal que se renombra al terminar: output_dir existe solo si está completo.
+    Las calidades mayores al video original se omiten.
+    """
+    if os.path.isdir(output_dir):
+        return
+    info = probe_media(source)
+    height = info['height']
+    rungs = [rung for rung in parse_ladder(ladder) if rung[0] <= height]
+    if not rungs:
+        rungs = [(height - height % 2, parse_ladder(ladder)[-1][1])]
+
+    temp_dir = f'{output_dir}.tmp-{uuid.uuid4().hex[:8]}'
+    os.makedirs(temp_dir)
+    try:
+        _run(ffmpeg_command(source, temp_dir, rungs, info['audio_codec'] is not None, segment_seconds, threads),
+             timeout)
+        _publish_dir(temp_dir, output_dir)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
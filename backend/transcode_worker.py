@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Worker que procesa los videos subidos: metadatos y miniaturas, y transcodificación
+a HLS con varias calidades.
+
+La cola son las filas de course_content con hls_status 'pending' (las encola la
+subida del video). Cada trabajo pasa por dos etapas en un pool de TRANSCODE_WORKERS
+procesos: primero analyze_media (ffprobe, póster y sprite; segundos), cuyo
+resultado se guarda enseguida, y después ffmpeg para la escalera HLS. Los procesos
+corren con prioridad baja (TRANSCODE_NICE) y TRANSCODE_THREADS hilos cada uno, en
+su propio contenedor: nunca le quitan CPU a los workers de gunicorn más allá de ese tope.
+Mientras corren, el loop renueva su lease (renew_leases) cada TRANSCODE_HEARTBEAT_INTERVAL
+segundos; los de un worker caído se reencolan pasados TRANSCODE_LEASE_SECONDS.
+
+Uso:
+    python transcode_worker.py           # procesar en loop
+    python transcode_worker.py --once    # procesar lo pendiente y salir
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from app import create_app
+from config import Config
+from models import db
+from transcode_service import (claim_jobs, save_media_info, complete_job, renew_leases, requeue_stale_jobs,
+                               analyze_media, run_transcode, lower_priority)
+
+def submit_analysis(pool, job):
+    return pool.submit(analyze_media, job.source, job.media_dir, Config.TRANSCODE_TIMEOUT)
+
+def submit_transcode(pool, job):
+    return pool.submit(run_transcode, job.source, job.output_dir, Config.TRANSCODE_LADDER,
+                       Config.TRANSCODE_SEGMENT_SECONDS, Config.TRANSCODE_THREADS, Config.TRANSCODE_TIMEOUT)
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker de transcodificación a HLS')
+    parser.add_argument('--once', action='store_true', help='Procesar lo pendiente y salir')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context(), ProcessPoolExecutor(max_workers=Config.TRANSCODE_WORKERS,
+                                                initializer=lower_priority,
+                                                initargs=(Config.TRANSCODE_NICE,)) as pool:
+        print("🎞️ Worker de transcodificación iniciado")
+        running = {}  # future -> (etapa, trabajo)
+        next_requeue_at = 0.0
+        next_heartbeat_at = time.monotonic() + Config.TRANSCODE_HEARTBEAT_INTERVAL
+        while True:
+            for future in [future for future in running if future.done()]:
+                stage, job = running.pop(future)
+                error = future.exception()
+                try:
+                    if stage == 'analyze' and not error:
+                        # Metadatos y miniaturas visibles ya; el mismo slot sigue con la transcodificación
+                        if save_media_info(job, future.result()):
+                            print(f"🖼️ Video {job.content_id}: metadatos y miniaturas listos")
+                            running[submit_transcode(pool, job)] = ('transcode', job)
+                        continue
+                    complete_job(job, error)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Error registrando el video {job.content_id}: {e}")
+                    continue
+                print(f"{'❌' if error else '✅'} Video {job.content_id}: {error or 'HLS listo'}")
+
+            claimed = []
+            try:
+                if time.monotonic() >= next_heartbeat_at:
+                    # Los trabajos en curso siguen vivos: que otro worker no los reencole
+                    renew_leases([job for _, job in running.values()])
+                    next_heartbeat_at = time.monotonic() + Config.TRANSCODE_HEARTBEAT_INTERVAL
+                if time.monotonic() >= next_requeue_at:
+                    requeued = requeue_stale_jobs()
+                    if requeued:
+                        print(f"🔁 Trabajos interrumpidos reencolados: {requeued}")
+                    next_requeue_at = time.monotonic() + 60
+                free = Config.TRANSCODE_WORKERS - len(running)
+                if free > 0:
+                    claimed = claim_jobs(free)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error tomando trabajos: {e}")
+
+            for job in claimed:
+                print(f"🎬 Procesando video {job.content_id}")
+                running[submit_analysis(pool, job)] = ('analyze', job)
+
+            if args.once and not running and not claimed:
+                break
+            if running:
+                # Despertar apenas termine un trabajo para tomar el siguiente
+                wait(running, timeout=Config.TRANSCODE_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(Config.TRANSCODE_POLL_INTERVAL)
+
+if __name__ == '__main__':
+    main()
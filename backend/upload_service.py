@@ -0,0 +1,184 @@
+from models import db, CourseContent, VideoUpload
+from flask import current_app
+from catalog_service import bump_catalog_version, invalidate_catalog
+from storage_service import store_file, assign_blob
+from transcode_service import enqueue_transcode
+from datetime import datetime, timedelta
+import hashlib
+import os
+import re
+import uuid
+from config import Config
+
+ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'wmv', 'flv', 'webm', 'mkv'}
+READ_SIZE = 1024 * 1024
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+class UploadConflict(Exception):
+    """El offset del pedido no coincide con lo ya recibido (o la subida ya terminó)"""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+class ChecksumMismatch(Exception):
+    """El checksum de la parte o del archivo completo no coincide"""
+
+def allowed_video_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_VIDEO_EXTENSIONS
+
+def _videos_dir():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos')
+
+def partial_path(upload):
+    # Dentro de uploads/videos: mismo sistema de archivos, así el os.replace final es atómico
+    return os.path.join(_videos_dir(), '.partial', f'{upload.id}.part')
+
+def create_upload(video_id, filename, size, checksum=None, user_id=None):
+    """Registrar una subida nueva y crear su archivo parcial vacío"""
+    if not filename or not allowed_video_file(filename):
+        raise ValueError('Tipo de archivo no permitido')
+    if not isinstance(size, int) or size <= 0:
+        raise ValueError('size debe ser un número de bytes mayor a 0')
+    if size > Config.UPLOAD_VIDEO_MAX_SIZE:
+        raise ValueError(f'El video supera el máximo de {Config.UPLOAD_VIDEO_MAX_SIZE} bytes')
+    if checksum is not None and not SHA256_RE.match(checksum):
+        raise ValueError('checksum debe ser el SHA-256 en hexadecimal')
+
+    upload = VideoUpload(id=uuid.uuid4().hex, video_id=video_id, filename=filename[:255], size=size,
+                         checksum=checksum, created_by=user_id)
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    db.session.add(upload)
+    return upload
+
+def _locked_upload(upload_id):
+    """La subida con su fila bloqueada (PostgreSQL): serializa partes concurrentes de la misma subida"""
+    return VideoUpload.query.filter_by(id=upload_id).with_for_update().first()
+
+def _file_digest(path):
+    """SHA-256 hex de un archivo, leyéndolo por bloques"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(READ_SIZE), b''):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+def append_chunk(upload_id, offset, stream, length, chunk_checksum=None):
+    """
+    Escribir una parte en el archivo parcial, leyendo el body por bloques (sin
+    cargarlo en memoria). offset debe coincidir con lo ya confirmado. Si la conexión
+    se corta a mitad se confirma lo recibido y el cliente retoma desde ahí, salvo
+    que la parte traiga checksum (Upload-Checksum), que entonces se descarta entera.
+    Retorna la subida con el offset nuevo o None si no existe.
+    """
+    upload = _locked_upload(upload_id)
+    if not upload:
+        return None
+    if upload.status != 'uploading':
+        raise UploadConflict('La subida ya fue finalizada', upload.offset)
+    if offset != upload.offset:
+        raise UploadConflict('Upload-Offset no coincide con lo recibido', upload.offset)
+    if length is None:
+        raise ValueError('Se requiere Content-Length')
+    if length > Config.UPLOAD_CHUNK_MAX_SIZE:
+        raise ValueError(f'Cada parte puede tener como máximo {Config.UPLOAD_CHUNK_MAX_SIZE} bytes')
+    if offset + length > upload.size:
+        raise ValueError('La parte excede el tamaño declarado del archivo')
+
+    # Cada parte se verifica sola; el archivo completo se hashea una vez, al finalizar
+    chunk_hasher = hashlib.sha256()
+    remaining = length
+    with open(partial_path(upload), 'r+b') as f:
+        # Descartar bytes escritos pero no confirmados (caída entre la escritura y el commit)
+        f.seek(offset)
+        f.truncate()
+        while remaining > 0:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            f.write(data)
+            chunk_hasher.update(data)
+            remaining -= len(data)
+
+        if chunk_checksum is not None and (remaining or chunk_hasher.digest() != chunk_checksum):
+            f.truncate(offset)
+            raise ChecksumMismatch('El checksum de la parte no coincide')
+        # Lo confirmado en la base nunca supera lo que está en disco
+        f.flush()
+        os.fsync(f.fileno())
+
+    upload.offset = offset + length - remaining
+    db.session.commit()
+    return upload
+
+def finalize_upload(upload_id):
+    """
+    Verificar el archivo completo, guardarlo como blob por su SHA-256 (una sola
+    lectura del archivo, con la fila bloqueada) y asignarlo al contenido del curso en la
+    misma transacción que publica la versión nueva del catálogo y encola su transcodificación.
+    Es idempotente.
+    Retorna (subida, contenido) o None.
+    """
+    upload = _locked_upload(upload_id)
+    if not upload:
+        return None
+    if upload.status == 'completed':
+        return upload, CourseContent.query.filter_by(video_id=upload.video_id).first()
+    if upload.offset != upload.size:
+        raise UploadConflict('La subida no está completa', upload.offset)
+    digest = _file_digest(partial_path(upload))
+    if upload.checksum and digest != upload.checksum:
+        raise ChecksumMismatch('El checksum del archivo no coincide')
+
+    extension = upload.filename.rsplit('.', 1)[1].lower()
+    blob = store_file(partial_path(upload), digest, upload.size, extension)
+
+    content = CourseContent.query.filter_by(video_id=upload.video_id).first()
+    if not content:
+        content = CourseContent(video_id=upload.video_id, title=f'Video {upload.video_id}')
+        db.session.add(content)
+    assign_blob(content, blob)
+    enqueue_transcode(content)
+
+    upload.status = 'completed'
+    upload.video_url = content.video_url
+    upload.completed_at = datetime.utcnow()
+    bump_catalog_version()
+    db.session.commit()
+    # Recién ahora: si el commit falla, el reintento vuelve a partir del archivo parcial
+    _remove_partial(upload)
+    invalidate_catalog()
+    return upload, content
+
+def _remove_partial(upload):
+    try:
+        os.remove(partial_path(upload))
+    except FileNotFoundError:
+        current_app.logger.warning(f"Archivo parcial de la subida {upload.id} no encontrado: {partial_path(upload)}")
+
+def abort_upload(upload_id):
+    """Cancelar una subida en curso y borrar su archivo parcial. Retorna False si no existe."""
+    upload = _locked_upload(upload_id)
+    if not upload:
+        return False
+    if upload.status == 'uploading':
+        _remove_partial(upload)
+    db.session.delete(upload)
+    db.session.commit()
+    return True
+
+def purge_stale_uploads():
+    """Borrar las subidas sin actividad en UPLOAD_EXPIRE_HOURS horas. Retorna la cantidad."""
+    if not os.path.isdir(_videos_dir()):
+        # Sin el volumen de uploads se borrarían las filas dejando los archivos huérfanos
+        current_app.logger.warning(f"{_videos_dir()} no existe: no se limpian las subidas")
+        return 0
+    cutoff = datetime.utcnow() - timedelta(hours=Config.UPLOAD_EXPIRE_HOURS)
+    stale = VideoUpload.query.filter(VideoUpload.status == 'uploading', VideoUpload.updated_at < cutoff).all()
+    for upload in stale:
+        _remove_partial(upload)
+        db.session.delete(upload)
+    db.session.commit()
+    return len(stale)
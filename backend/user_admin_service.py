@@ -0,0 +1,352 @@
+from models import db, Usuario, UserRole
+from cache_service import TTLCache
+from flask import current_app
+from sqlalchemy import tuple_, text, update, select, func, case
+from datetime import datetime, timedelta
+import base64
+import csv
+import io
+import json
+from config import Config
+
+# Columnas por las que se puede ordenar el listado de usuarios. El id desempata,
+# así el cursor (valor, id) es estable aunque haya valores repetidos.
+SORTS = {
+    'fecha_registro': Usuario.fecha_registro,
+    'email': Usuario.email,
+    'apellido': Usuario.apellido,
+    'id': Usuario.id,
+}
+
+BOOLEAN_FILTERS = ('activo', 'has_access', 'email_confirmed')
+
+# Columnas exportables (en el orden por defecto del export)
+EXPORT_COLUMNS = {
+    'id': Usuario.id,
+    'email': Usuario.email,
+    'nombre': Usuario.nombre,
+    'apellido': Usuario.apellido,
+    'fecha_registro': Usuario.fecha_registro,
+    'activo': Usuario.activo,
+    'rol': Usuario.rol,
+    'has_access': Usuario.has_access,
+    'email_confirmed': Usuario.email_confirmed,
+}
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+# Acción masiva -> (columna, valor nuevo)
+BULK_ACTIONS = {
+    'activate': ('activo', True),
+    'deactivate': ('activo', False),
+    'grant': ('has_access', True),
+    'revoke': ('has_access', False),
+}
+
+def init_user_admin(app):
+    """Cachés de conteos del listado de usuarios y de estadísticas del panel (por proceso)"""
+    app.extensions['admin_count_cache'] = TTLCache(max_size=1000, ttl=Config.ADMIN_COUNT_CACHE_TTL)
+    app.extensions['admin_stats_cache'] = TTLCache(max_size=10, ttl=Config.ADMIN_STATS_CACHE_TTL)
+
+def invalidate_admin_counts():
+    """Descartar conteos y estadísticas cacheados luego de modificar usuarios desde el panel"""
+    current_app.extensions['admin_count_cache'].clear()
+    current_app.extensions['admin_stats_cache'].clear()
+
+def _parse_bool(name, value):
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise ValueError(f'{name} debe ser true o false')
+
+def parse_date(name, value, end_of_day=False):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} debe ser una fecha ISO (AAAA-MM-DD)')
+    # Una fecha sin hora como límite superior incluye todo ese día
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def parse_filters(args):
+    """
+    Leer los filtros del query string. Retorna un dict normalizado (sirve como clave
+    de caché) o lanza ValueError si algún valor es inválido.
+    """
+    filters = {}
+    for name in BOOLEAN_FILTERS:
+        if args.get(name) not in (None, ''):
+            filters[name] = _parse_bool(name, args[name])
+
+    if args.get('rol'):
+        if args['rol'] not in [r.value for r in UserRole]:
+            raise ValueError(f'rol debe ser uno de: {", ".join(r.value for r in UserRole)}')
+        filters['rol'] = args['rol']
+
+    if args.get('registered_from'):
+        filters['registered_from'] = parse_date('registered_from', args['registered_from'])
+    if args.get('registered_to'):
+        filters['registered_to'] = parse_date('registered_to', args['registered_to'], end_of_day=True)
+
+    return filters
+
+def filter_conditions(filters):
+    """Condiciones SQL equivalentes a los filtros"""
+    conditions = []
+    for name in BOOLEAN_FILTERS:
+        if name in filters:
+            conditions.append(getattr(Usuario, name).is_(filters[name]))
+    if 'rol' in filters:
+        conditions.append(Usuario.rol == filters['rol'])
+    if 'registered_from' in filters:
+        conditions.append(Usuario.fecha_registro >= filters['registered_from'])
+    if 'registered_to' in filters:
+        conditions.append(Usuario.fecha_registro < filters['registered_to'])
+    return conditions
+
+def filtered_query(filters, query=None):
+    """Aplicar los filtros a una consulta sobre usuarios"""
+    query = query if query is not None else Usuario.query
+    return query.filter(*filter_conditions(filters))
+
+def encode_cursor(sort, order, usuario):
+    value = getattr(usuario, sort)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps({'s': sort, 'o': order, 'v': value, 'id': usuario.id})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, sort, order):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        value, last_id = data['v'], int(data['id'])
+    except Exception:
+        raise ValueError('cursor inválido')
+    if data.get('s') != sort or data.get('o') != order:
+        raise ValueError('El cursor corresponde a otro orden: volver a la primera página')
+    if sort == 'fecha_registro':
+        value = datetime.fromisoformat(value)
+    return value, last_id
+
+def list_users(filters, sort='fecha_registro', order='desc', limit=50, cursor=None):
+    """
+    Página de usuarios por keyset: WHERE (orden, id) > (último valor, último id).
+    A diferencia de OFFSET, el costo no crece con el número de página y las altas
+    o bajas concurrentes no hacen saltar ni repetir filas.
+    Retorna (usuarios, next_cursor).
+    """
+    if sort not in SORTS:
+        raise ValueError(f'sort debe ser uno de: {", ".join(SORTS)}')
+    if order not in ('asc', 'desc'):
+        raise ValueError('order debe ser asc o desc')
+
+    column = SORTS[sort]
+    keys = (column,) if sort == 'id' else (column, Usuario.id)
+    query = filtered_query(filters)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort, order)
+        position = (last_id,) if sort == 'id' else (value, last_id)
+        key = tuple_(*keys)
+        query = query.filter(key < tuple_(*position) if order == 'desc' else key > tuple_(*position))
+
+    query = query.order_by(*[k.desc() if order == 'desc' else k.asc() for k in keys])
+    usuarios = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(usuarios) > limit:
+        usuarios = usuarios[:limit]
+        next_cursor = encode_cursor(sort, order, usuarios[-1])
+    return usuarios, next_cursor
+
+def _estimated_total():
+    """Estimación de filas de usuarios según las estadísticas de PostgreSQL (sin recorrer la tabla)"""
+    if db.engine.dialect.name != 'postgresql':
+        return None
+    estimate = db.session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'usuarios'")
+    ).scalar()
+    return estimate if estimate and estimate >= Config.ADMIN_COUNT_ESTIMATE_THRESHOLD else None
+
+def count_users(filters):
+    """
+    Total de usuarios que cumplen los filtros. Se cachea ADMIN_COUNT_CACHE_TTL segundos;
+    sin filtros y con tablas grandes en PostgreSQL se usa la estimación del planner.
+    Retorna (total, es_estimado).
+    """
+    cache = current_app.extensions['admin_count_cache']
+    key = tuple(sorted((k, str(v)) for k, v in filters.items()))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    estimate = None if filters else _estimated_total()
+    result = (estimate, True) if estimate is not None else (filtered_query(filters).count(), False)
+    cache.set(key, result)
+    return result
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+def user_stats(days=None):
+    """
+    Estadísticas del panel: totales en una sola consulta con agregados condicionales y
+    altas por día de los últimos `days` días con GROUP BY. Se cachean ADMIN_STATS_CACHE_TTL
+    segundos, así el costo por carga del panel no depende de la cantidad de usuarios.
+    """
+    days = days or Config.ADMIN_STATS_SIGNUP_DAYS
+    cache = current_app.extensions['admin_stats_cache']
+    cached = cache.get(days)
+    if cached is not None:
+        return cached
+
+    totals = db.session.query(
+        func.count(Usuario.id),
+        _count_if(Usuario.activo.is_(True)),
+        _count_if(Usuario.email_confirmed.is_(True)),
+        _count_if(Usuario.has_access.is_(True)),
+        _count_if(Usuario.rol == UserRole.ADMIN.value)
+    ).one()
+
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    day = func.date(Usuario.fecha_registro)
+    per_day = dict(
+        (str(row_day), count) for row_day, count in
+        db.session.query(day, func.count(Usuario.id))
+        .filter(Usuario.fecha_registro >= datetime.combine(since, datetime.min.time()))
+        .group_by(day).all()
+    )
+
+    stats = {
+        'total': totals[0],
+        'activos': totals[1] or 0,
+        'email_confirmados': totals[2] or 0,
+        'con_acceso': totals[3] or 0,
+        'admins': totals[4] or 0,
+        # Todos los días del rango, con 0 donde no hubo altas
+        'registros_por_dia': [
+            {'fecha': (since + timedelta(days=i)).isoformat(),
+             'registros': per_day.get((since + timedelta(days=i)).isoformat(), 0)}
+            for i in range(days)
+        ],
+        'generado': datetime.utcnow().isoformat()
+    }
+    cache.set(days, stats)
+    return stats
+
+def _bulk_guards(action, current_user_id):
+    """Las mismas reglas que las acciones individuales, como condiciones del UPDATE"""
+    if action == 'deactivate':
+        return [Usuario.id != current_user_id]
+    if action == 'revoke':
+        return [Usuario.rol != UserRole.ADMIN.value]
+    return []
+
+def _skip_reason(action, row, current_user_id):
+    if action == 'deactivate' and row.id == current_user_id:
+        return 'No puedes desactivar tu propia cuenta'
+    if action == 'revoke' and row.rol == UserRole.ADMIN.value:
+        return 'No se puede revocar acceso a un administrador'
+    return None
+
+def bulk_update(action, current_user_id, user_ids=None, filters=None):
+    """
+    Aplicar una acción a muchos usuarios con un único UPDATE ... RETURNING.
+
+    Solo se actualizan las filas que realmente cambian y que pasan las reglas de la
+    acción. Con user_ids se informa el resultado de cada id ('updated', 'unchanged',
+    'skipped' o 'not_found'), con a lo sumo una consulta extra para los ids que el
+    UPDATE no devolvió. No hace commit: retorna (ids actualizados, resultados).
+    """
+    column_name, value = BULK_ACTIONS[action]
+    column = getattr(Usuario, column_name)
+
+    conditions = _bulk_guards(action, current_user_id)
+    conditions.append(column.is_not(value))
+    if user_ids is not None:
+        conditions.append(Usuario.id.in_(user_ids))
+    else:
+        conditions.extend(filter_conditions(filters))
+
+    statement = update(Usuario).where(*conditions).values({column_name: value, 'version': Usuario.version + 1}).returning(Usuario.id)
+    updated = [row.id for row in db.session.execute(statement, execution_options={'synchronize_session': False})]
+
+    if user_ids is None:
+        return updated, [{'id': user_id, 'status': 'updated'} for user_id in updated]
+
+    results = {user_id: {'id': user_id, 'status': 'updated'} for user_id in updated}
+    pending = [user_id for user_id in user_ids if user_id not in results]
+    if pending:
+        rows = {row.id: row for row in db.session.execute(
+            select(Usuario.id, Usuario.rol).where(Usuario.id.in_(pending))
+        )}
+        for user_id in pending:
+            row = rows.get(user_id)
+            reason = row is not None and _skip_reason(action, row, current_user_id)
+            if row is None:
+                results[user_id] = {'id': user_id, 'status': 'not_found'}
+            elif reason:
+                results[user_id] = {'id': user_id, 'status': 'skipped', 'reason': reason}
+            else:
+                results[user_id] = {'id': user_id, 'status': 'unchanged'}
+
+    return updated, [results[user_id] for user_id in user_ids]
+
+def parse_export_columns(value):
+    """Columnas pedidas (separadas por coma) o todas si no se especifican"""
+    if not value:
+        return list(EXPORT_COLUMNS)
+    columns = [c.strip() for c in value.split(',') if c.strip()]
+    unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f'Columnas desconocidas: {", ".join(unknown)}. Disponibles: {", ".join(EXPORT_COLUMNS)}')
+    return list(dict.fromkeys(columns))
+
+def _csv_safe(value):
+    """Evitar que una planilla interprete como fórmula un valor escrito por el usuario"""
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+def stream_export(filters, columns, fmt, chunk_rows=None):
+    """
+    Generador con el export de usuarios en CSV o NDJSON, en trozos de chunk_rows filas.
+
+    Lee con yield_per (en PostgreSQL, un cursor del lado del servidor), así la memoria
+    no depende del tamaño de la tabla; el encabezado sale antes de la primera consulta.
+    """
+    chunk_rows = chunk_rows or Config.ADMIN_EXPORT_CHUNK_ROWS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    if fmt == 'csv':
+        writer.writerow(columns)
+        yield flush()
+
+    query = filtered_query(filters, db.session.query(*[EXPORT_COLUMNS[c] for c in columns]))
+    rows = query.order_by(Usuario.id).yield_per(chunk_rows)
+
+    pending = 0
+    for row in rows:
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        if fmt == 'csv':
+            writer.writerow([_csv_safe(value) for value in values])
+        else:
+            buffer.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+            buffer.write('\n')
+        pending += 1
+        if pending >= chunk_rows:
+            pending = 0
+            yield flush()
+
+    if pending:
+        yield flush()
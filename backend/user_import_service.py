@@ -0,0 +1,124 @@
+from models import db, Usuario, AuthToken, EmailOutbox, normalize_email
+from token_service import hash_token, PASSWORD_RESET
+from sqlalchemy import insert, func
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime, timedelta
+import csv
+import itertools
+import re
+import secrets
+from config import Config
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+REQUIRED_COLUMNS = ('email', 'nombre', 'apellido')
+MAX_REPORTED_ERRORS = 100
+
+# Los usuarios importados no tienen contraseña: eligen una con el enlace del email
+# de bienvenida. Este valor no es un hash válido, así que ningún login lo acepta.
+UNUSABLE_PASSWORD = '!'
+
+def _insert_ignoring_duplicates():
+    """
+    INSERT ... ON CONFLICT (lower(email)) DO NOTHING en el dialecto de la base: omite
+    también a los usuarios que se registraron con otras mayúsculas
+    """
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(Usuario).on_conflict_do_nothing(index_elements=[func.lower(Usuario.email)])
+
+def validate_rows(lines, summary):
+    """
+    Recorrer el CSV fila por fila (sin cargarlo entero) y generar las filas válidas
+    normalizadas. Los errores se acumulan en summary.
+    """
+    reader = csv.DictReader(lines)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f'Faltan columnas en el CSV: {", ".join(missing)}')
+
+    seen = set()
+    for line_number, row in enumerate(reader, start=2):
+        summary['total_rows'] += 1
+        email = normalize_email(row.get('email')) or ''
+        nombre = (row.get('nombre') or '').strip()
+        apellido = (row.get('apellido') or '').strip()
+
+        error = None
+        if not EMAIL_RE.match(email) or len(email) > 120:
+            error = 'email inválido'
+        elif not nombre or not apellido:
+            error = 'nombre y apellido son requeridos'
+        elif len(nombre) > 100 or len(apellido) > 100:
+            error = 'nombre o apellido demasiado largo'
+        elif email in seen:
+            error = 'email repetido en el archivo'
+
+        if error:
+            summary['invalid'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'line': line_number, 'email': email, 'error': error})
+            continue
+
+        seen.add(email)
+        yield {'email': email, 'nombre': nombre, 'apellido': apellido}
+
+def _insert_batch(batch, grant_access, send_welcome, email_delay):
+    """
+    Insertar un lote en una transacción: usuarios (ignorando emails ya registrados) y,
+    para los insertados, el token para elegir contraseña y el email de bienvenida
+    encolado. Retorna la cantidad insertada.
+    """
+    now = datetime.utcnow()
+    statement = _insert_ignoring_duplicates().returning(Usuario.id, Usuario.email, Usuario.nombre)
+    inserted = db.session.execute(statement, [
+        dict(row, password_hash=UNUSABLE_PASSWORD, fecha_registro=now, activo=True, rol='user',
+             has_access=grant_access, email_confirmed=True)
+        for row in batch
+    ]).all()
+
+    if send_welcome and inserted:
+        tokens, emails = [], []
+        for user_id, email, nombre in inserted:
+            token = secrets.token_urlsafe(32)
+            tokens.append(dict(token_hash=hash_token(token), purpose=PASSWORD_RESET, user_id=user_id,
+                               expires_at=now + timedelta(days=Config.IMPORT_WELCOME_TOKEN_DAYS), created_at=now))
+            # Escalonar los envíos: los emails transaccionales (programados para "ya")
+            # se siguen enviando primero aunque se importen miles de usuarios
+            emails.append(dict(kind='welcome', recipient=email, status='pending', attempts=0, created_at=now,
+                               next_attempt_at=now + timedelta(seconds=next(email_delay)),
+                               payload={'user_name': nombre, 'reset_token': token,
+                                        'locale': Config.EMAIL_DEFAULT_LOCALE}))
+        db.session.execute(insert(AuthToken), tokens)
+        db.session.execute(insert(EmailOutbox), emails)
+
+    db.session.commit()
+    return len(inserted)
+
+def import_users(lines, grant_access=False, send_welcome=True, dry_run=False, batch_size=None):
+    """
+    Importar usuarios desde un CSV con columnas email, nombre y apellido.
+
+    Se valida en streaming y se inserta por lotes de IMPORT_BATCH_SIZE filas con
+    INSERT ... ON CONFLICT DO NOTHING: los emails ya registrados se omiten sin error.
+    Retorna un resumen con contadores y los primeros errores de validación.
+    """
+    batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+    summary = {'total_rows': 0, 'imported': 0, 'skipped_existing': 0, 'invalid': 0, 'errors': [],
+               'dry_run': dry_run}
+    email_delay = (i / Config.IMPORT_EMAIL_RATE_PER_SECOND for i in itertools.count())
+
+    def flush(batch):
+        if dry_run or not batch:
+            return
+        imported = _insert_batch(batch, grant_access, send_welcome, email_delay)
+        summary['imported'] += imported
+        summary['skipped_existing'] += len(batch) - imported
+
+    batch = []
+    for row in validate_rows(lines, summary):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    flush(batch)
+
+    return summary
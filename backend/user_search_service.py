@@ -0,0 +1,159 @@
+from models import db, Usuario
+from flask import current_app
+from sqlalchemy import case, func, literal_column, or_, text
+from bisect import bisect_left
+import heapq
+import threading
+import time
+from config import Config
+
+# Rango de cada resultado: menor es mejor
+EXACT_EMAIL, EMAIL_PREFIX, NAME_PREFIX, SUBSTRING = range(4)
+
+def init_user_search(app):
+    app.extensions['user_search_index'] = UserSearchIndex()
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+class UserSearchIndex:
+    """
+    Índice de búsqueda en memoria para cuando la base no es PostgreSQL (SQLite en desarrollo).
+
+    Los resultados salen por niveles, cada uno ya ordenado por email, y la búsqueda
+    corta apenas junta limit resultados:
+    - prefijo de email (el email exacto queda primero): bisect sobre los emails ordenados
+    - prefijo de nombre/apellido: bisect sobre los tokens y merge de sus listas
+    - subcadena (3+ caracteres): intersección de posting lists de trigramas sobre
+      "email nombre apellido", verificando cada candidato
+
+    Se reconstruye cuando aparece un usuario nuevo (cambia el último id) o pasados
+    USER_SEARCH_INDEX_TTL segundos, lo que llegue primero.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature = None
+        self._built_at = 0.0
+        # Se reemplaza entero al reconstruir: las búsquedas en curso siguen con la versión anterior
+        self._data = None
+
+    def _current_signature(self):
+        # max(id) sale del índice de la PK; count(*) recorrería la tabla en cada búsqueda
+        return db.session.query(func.max(Usuario.id)).scalar()
+
+    def _build(self, signature):
+        haystacks, emails, token_users, trigrams = {}, [], {}, {}
+        rows = db.session.query(Usuario.id, Usuario.email, Usuario.nombre, Usuario.apellido).yield_per(5000)
+        for user_id, email, nombre, apellido in rows:
+            email, nombre, apellido = email.lower(), (nombre or '').lower(), (apellido or '').lower()
+            haystack = f'{email} {nombre} {apellido}'
+            haystacks[user_id] = haystack
+            emails.append((email, user_id))
+
+            for token in set(nombre.split()) | set(apellido.split()):
+                token_users.setdefault(token, []).append((email, user_id))
+            for trigram in _trigrams(haystack):
+                trigrams.setdefault(trigram, set()).add(user_id)
+
+        emails.sort()
+        for users in token_users.values():
+            users.sort()
+        self._data = (haystacks, emails, sorted(token_users), token_users, trigrams)
+        self._signature, self._built_at = signature, time.monotonic()
+
+    def refresh(self):
+        signature = self._current_signature()
+        with self._lock:
+            if self._data is None or signature != self._signature \
+                    or time.monotonic() - self._built_at > Config.USER_SEARCH_INDEX_TTL:
+                self._build(signature)
+
+    def search(self, term, limit):
+        """Retorna los ids de los usuarios encontrados, ordenados por relevancia, como mucho limit"""
+        self.refresh()
+        haystacks, emails, tokens, token_users, trigrams = self._data
+        results, seen = [], set()
+
+        def take(matches):
+            for _, user_id in matches:
+                if user_id not in seen:
+                    seen.add(user_id)
+                    results.append(user_id)
+                    if len(results) >= limit:
+                        return True
+            return False
+
+        def with_prefix(items, start, text_of):
+            for index in range(bisect_left(items, start), len(items)):
+                if not text_of(items[index]).startswith(term):
+                    return
+                yield items[index]
+
+        if take(with_prefix(emails, (term,), lambda item: item[0])):
+            return results
+        if take(heapq.merge(*(token_users[t] for t in with_prefix(tokens, term, lambda token: token)))):
+            return results
+
+        if len(term) >= 3:
+            postings = sorted((trigrams.get(t, set()) for t in _trigrams(term)), key=len)
+            candidates = (i for i in set.intersection(*postings) if i not in seen and term in haystacks[i])
+            take(heapq.nsmallest(limit - len(results), ((haystacks[i].split(' ', 1)[0], i) for i in candidates)))
+        return results
+
+def _has_pg_trgm():
+    """¿Está instalada la extensión pg_trgm? Se consulta una vez por proceso."""
+    if 'pg_trgm' not in current_app.extensions:
+        current_app.extensions['pg_trgm'] = bool(db.session.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).scalar())
+    return current_app.extensions['pg_trgm']
+
+def _search_postgres(term, limit):
+    """
+    Búsqueda en PostgreSQL. El filtro LIKE '%term%' sobre la misma expresión que
+    ix_usuarios_search_trgm usa el índice GIN de trigramas; con menos de 3 caracteres
+    los trigramas no sirven y se busca solo por prefijo (índices text_pattern_ops).
+    El ranking prioriza email exacto, prefijo de email y prefijo de nombre/apellido,
+    y luego similitud.
+    """
+    space = literal_column("' '")
+    haystack = func.lower(Usuario.email + space + Usuario.nombre + space + Usuario.apellido)
+    escaped = _escape_like(term)
+    email_prefix = func.lower(Usuario.email).like(f'{escaped}%', escape='\\')
+    name_prefix = or_(func.lower(Usuario.nombre).like(f'{escaped}%', escape='\\'),
+                      func.lower(Usuario.apellido).like(f'{escaped}%', escape='\\'))
+    rank = case(
+        (func.lower(Usuario.email) == term, EXACT_EMAIL),
+        (email_prefix, EMAIL_PREFIX),
+        (name_prefix, NAME_PREFIX),
+        else_=SUBSTRING
+    )
+    order = [rank]
+    if _has_pg_trgm():
+        order.append(func.similarity(haystack, term).desc())
+    order.append(Usuario.email)
+
+    if len(term) < 3:
+        condition = or_(email_prefix, name_prefix)
+    else:
+        condition = haystack.like(f'%{escaped}%', escape='\\')
+    return Usuario.query.filter(condition).order_by(*order).limit(limit).all()
+
+def search_users(query, limit=None):
+    """Buscar usuarios por email, nombre o apellido. Retorna los usuarios ordenados por relevancia."""
+    term = ' '.join(query.lower().split())
+    if not term:
+        return []
+    # Un LIMIT negativo en SQLite (y en el índice en memoria) significaría sin límite
+    limit = max(1, min(limit or Config.USER_SEARCH_LIMIT, Config.USER_SEARCH_MAX_LIMIT))
+
+    if db.engine.dialect.name == 'postgresql':
+        return _search_postgres(term, limit)
+
+    ids = current_app.extensions['user_search_index'].search(term, limit)
+    users = {u.id: u for u in Usuario.query.filter(Usuario.id.in_(ids)).all()}
+    return [users[i] for i in ids if i in users]
@@ -1,4 +1,9 @@
-import { useState } from 'react'
+import { useState, useEffect, useRef } from 'react'
+import { courseService } from '../services/api'
+
+// Safari (macOS/iOS) reproduce HLS solo; el resto necesita hls.js sobre MediaSource
+const supportsNativeHls = () =>
+  typeof document !== 'undefined' && document.createElement('video').canPlayType('application/vnd.apple.mpegurl') !== ''
 
 function VideoPlayer({ video, onNext, onPrevious, hasNext, hasPrevious }) {
   const [isPlaying, setIsPlaying] = useState(false)
@@ -33,6 +38,65 @@ function VideoPlayer({ video, onNext, onPrevious, hasNext, hasPrevious }) {
   const youtubeId = getYouTubeVideoId(videoUrl)
   const isMP4 = isMP4File(videoUrl)
   const driveEmbedUrl = getGoogleDriveEmbedUrl(driveFileId)
+  const isUploaded = videoType === 'local' && videoUrl?.startsWith('/uploads/')
+  // Versión HLS con varias calidades, cuando la transcodificación terminó
+  const hlsUrl = isUploaded && video?.hls_status === 'ready' ? video.hls_url : null
+  const [mediaToken, setMediaToken] = useState(null)
+  // Póster generado al subir: se muestra una imagen liviana en vez de precargar el video
+  const posterUrl = isUploaded && video?.poster_url && mediaToken
+    ? `http://localhost:5000${video.poster_url}?token=${mediaToken}`
+    : null
+
+  const videoRef = useRef(null)
+  // Si hls.js no carga o falla sin recuperarse, se reproduce el MP4 original
+  const [hlsFailed, setHlsFailed] = useState(false)
+  const hlsSrc = hlsUrl && mediaToken && !hlsFailed ? `http://localhost:5000${hlsUrl}?token=${mediaToken}` : null
+  const useHlsJs = Boolean(hlsSrc) && !supportsNativeHls() && typeof window !== 'undefined' && 'MediaSource' in window
+
+  useEffect(() => {
+    setHlsFailed(false)
+  }, [hlsUrl])
+
+  // hls.js se descarga aparte (import dinámico) y solo cuando hace falta
+  useEffect(() => {
+    if (!useHlsJs || !videoRef.current) return
+    let hls = null
+    let cancelled = false
+    import('hls.js')
+      .then(({ default: Hls }) => {
+        if (cancelled) return
+        if (!Hls.isSupported()) {
+          setHlsFailed(true)
+          return
+        }
+        hls = new Hls()
+        hls.on(Hls.Events.ERROR, (_, data) => {
+          if (data.fatal) {
+            console.error('Error reproduciendo HLS:', data)
+            setHlsFailed(true)
+          }
+        })
+        hls.loadSource(hlsSrc)
+        hls.attachMedia(videoRef.current)
+      })
+      .catch(error => {
+        console.error('Error cargando hls.js:', error)
+        if (!cancelled) setHlsFailed(true)
+      })
+    return () => {
+      cancelled = true
+      if (hls) hls.destroy()
+    }
+  }, [useHlsJs, hlsSrc])
+
+  // Los videos subidos requieren un token en la URL (<video> no envía Authorization)
+  useEffect(() => {
+    if (isUploaded && !mediaToken) {
+      courseService.getMediaToken()
+        .then(data => setMediaToken(data.token))
+        .catch(error => console.error('Error obteniendo token de video:', error))
+    }
+  }, [isUploaded, mediaToken])
 
   return (
     <div className="bg-white rounded-xl shadow-lg overflow-hidden">
@@ -61,11 +125,20 @@ function VideoPlayer({ video, onNext, onPrevious, hasNext, hasPrevious }) {
         ) : videoType === 'local' && isMP4 && videoUrl ? (
           // MP4 video local
           <video
+            ref={videoRef}
+            key={`${mediaToken || 'sin-token'}-${hlsSrc ? 'hls' : 'mp4'}-${useHlsJs ? 'mse' : 'nativo'}`}
             controls
             className="w-full h-full"
-            poster="/api/placeholder/800/450"
+            poster={posterUrl || '/api/placeholder/800/450'}
+            preload={posterUrl ? 'none' : 'metadata'}
           >
-            <source src={videoUrl.startsWith('/uploads/') ? `http://localhost:5000${videoUrl}` : videoUrl} type="video/mp4" />
+            {/* Con hls.js el video se alimenta por MediaSource: sin <source> */}
+            {!useHlsJs && hlsSrc && (
+              <source src={hlsSrc} type="application/vnd.apple.mpegurl" />
+            )}
+            {!useHlsJs && (
+              <source src={isUploaded ? `http://localhost:5000${videoUrl}?token=${mediaToken || ''}` : videoUrl} type="video/mp4" />
+            )}
             Tu navegador no soporta la reproducción de video.
           </video>
         ) : (
@@ -7,6 +7,12 @@ function AdminPage() {
   const navigate = useNavigate()
   const { user, isAuthenticated, logout } = useAuth()
   const [users, setUsers] = useState([])
+  const [totalUsers, setTotalUsers] = useState(0)
+  const [stats, setStats] = useState(null)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [searchQuery, setSearchQuery] = useState('')
+  const [searchResults, setSearchResults] = useState(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState('')
   const [actionLoading, setActionLoading] = useState({})
@@ -26,11 +32,33 @@ function AdminPage() {
     loadUsers()
   }, [isAuthenticated, user, navigate])
 
+  // Búsqueda en el servidor, con debounce mientras se escribe
+  useEffect(() => {
+    const q = searchQuery.trim()
+    if (!q) {
+      setSearchResults(null)
+      return
+    }
+
+    const timeout = setTimeout(async () => {
+      try {
+        const data = await adminService.searchUsers(q)
+        setSearchResults(data.usuarios)
+      } catch (err) {
+        setError(err.message || 'Error buscando usuarios')
+      }
+    }, 250)
+    return () => clearTimeout(timeout)
+  }, [searchQuery])
+
   const loadUsers = async () => {
     try {
       setError('')
-      const data = await adminService.getUsers()
+      const [data, statsData] = await Promise.all([adminService.getUsers(), adminService.getStats()])
       setUsers(data.usuarios)
+      setTotalUsers(data.total)
+      setNextCursor(data.next_cursor)
+      setStats(statsData)
     } catch (err) {
       setError(err.message || 'Error cargando usuarios')
     } finally {
@@ -38,6 +66,20 @@ function AdminPage() {
     }
   }
 
+  // Siguiente página (cursor de la respuesta anterior)
+  const loadMoreUsers = async () => {
+    setLoadingMore(true)
+    try {
+      const data = await adminService.getUsers({ cursor: nextCursor })
+      setUsers(prev => [...prev, ...data.usuarios])
+      setNextCursor(data.next_cursor)
+    } catch (err) {
+      setError(err.message || 'Error cargando usuarios')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleUserAction = async (userId, action) => {
     setActionLoading(prev => ({ ...prev, [userId]: action }))
     
@@ -64,6 +106,10 @@ function AdminPage() {
       setUsers(prev => prev.map(u => 
         u.id === userId ? result.usuario : u
       ))
+      setSearchResults(prev => prev && prev.map(u =>
+        u.id === userId ? result.usuario : u
+      ))
+      adminService.getStats().then(setStats).catch(() => {})
       
     } catch (err) {
       setError(err.message || 'Error realizando la acción')
@@ -119,24 +165,24 @@ function AdminPage() {
         <div className="grid grid-cols-1 md:grid-cols-4 gap-6 mb-8">
           <div className="bg-white rounded-lg p-6 shadow-sm">
             <h3 className="text-sm font-medium text-gray-500">Total Usuarios</h3>
-            <p className="text-2xl font-bold text-gray-900">{users.length}</p>
+            <p className="text-2xl font-bold text-gray-900">{stats?.total ?? totalUsers}</p>
           </div>
           <div className="bg-white rounded-lg p-6 shadow-sm">
             <h3 className="text-sm font-medium text-gray-500">Usuarios Activos</h3>
             <p className="text-2xl font-bold text-emerald-600">
-              {users.filter(u => u.activo).length}
+              {stats?.activos ?? '—'}
             </p>
           </div>
           <div className="bg-white rounded-lg p-6 shadow-sm">
             <h3 className="text-sm font-medium text-gray-500">Con Acceso al Curso</h3>
             <p className="text-2xl font-bold text-blue-600">
-              {users.filter(u => u.has_access).length}
+              {stats?.con_acceso ?? '—'}
             </p>
           </div>
           <div className="bg-white rounded-lg p-6 shadow-sm">
             <h3 className="text-sm font-medium text-gray-500">Administradores</h3>
             <p className="text-2xl font-bold text-purple-600">
-              {users.filter(u => u.rol === 'admin').length}
+              {stats?.admins ?? '—'}
             </p>
           </div>
         </div>
@@ -150,8 +196,15 @@ function AdminPage() {
 
         {/* Lista de usuarios */}
         <div className="bg-white rounded-lg shadow-sm overflow-hidden">
-          <div className="px-6 py-4 border-b border-gray-200">
+          <div className="px-6 py-4 border-b border-gray-200 flex items-center justify-between">
             <h2 className="text-lg font-semibold text-gray-900">Gestión de Usuarios</h2>
+            <input
+              type="search"
+              value={searchQuery}
+              onChange={(e) => setSearchQuery(e.target.value)}
+              placeholder="Buscar por email, nombre o apellido"
+              className="w-72 px-3 py-1 border border-gray-300 rounded text-sm focus:outline-none focus:ring-2 focus:ring-emerald-500"
+            />
           </div>
           
           <div className="overflow-x-auto">
@@ -176,7 +229,7 @@ function AdminPage() {
                 </tr>
               </thead>
               <tbody className="bg-white divide-y divide-gray-200">
-                {users.map((usuario) => (
+                {(searchResults ?? users).map((usuario) => (
                   <tr key={usuario.id} className="hover:bg-gray-50">
                     <td className="px-6 py-4 whitespace-nowrap">
                       <div className="flex items-center">
@@ -265,6 +318,18 @@ function AdminPage() {
               </tbody>
             </table>
           </div>
+
+          {nextCursor && !searchResults && (
+            <div className="px-6 py-4 border-t border-gray-200 text-center">
+              <button
+                onClick={loadMoreUsers}
+                disabled={loadingMore}
+                className="px-4 py-2 rounded text-sm font-medium bg-gray-100 text-gray-800 hover:bg-gray-200 disabled:opacity-50 disabled:cursor-not-allowed"
+              >
+                {loadingMore ? '⏳' : `Cargar más (${users.length} de ${totalUsers})`}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -2,6 +2,7 @@ import { useState, useEffect } from 'react'
 import { Link, useNavigate } from 'react-router-dom'
 import { useAuth } from '../contexts/AuthContext'
 import VideoPlayer from '../components/VideoPlayer'
+import { courseService } from '../services/api'
 
 function CoursePage() {
   const navigate = useNavigate()
@@ -457,6 +458,7 @@ const VideoEditModal = ({ video, onSave, onCancel }) => {
   const [description, setDescription] = useState(video.description || '')
   const [duration, setDuration] = useState(video.duration || '')
   const [uploading, setUploading] = useState(false)
+  const [uploadProgress, setUploadProgress] = useState(0)
 
   const handleSubmit = async (e) => {
     e.preventDefault()
@@ -467,27 +469,11 @@ const VideoEditModal = ({ video, onSave, onCancel }) => {
       let videoType = 'youtube'
       let finalDriveFileId = null
 
-      // Si se seleccionó un archivo, subirlo primero
+      // Si se seleccionó un archivo, subirlo primero (por partes, reanudable)
       if (videoSource === 'file' && selectedFile) {
-        const formData = new FormData()
-        formData.append('video', selectedFile)
-
-        const token = localStorage.getItem('authToken')
-        const response = await fetch('http://localhost:5000/api/auth/upload_video', {
-          method: 'POST',
-          headers: {
-            'Authorization': `Bearer ${token}`
-          },
-          body: formData
-        })
-
-        if (!response.ok) {
-          throw new Error('Error al subir el video')
-        }
-
-        const result = await response.json()
+        const result = await courseService.uploadVideoResumable(selectedFile, video.id, setUploadProgress)
         finalVideoUrl = result.video_url
-        videoType = 'file'
+        videoType = 'local'
       } else if (videoSource === 'drive') {
         videoType = 'drive'
         finalDriveFileId = driveFileId
@@ -651,7 +637,7 @@ const VideoEditModal = ({ video, onSave, onCancel }) => {
               disabled={uploading || (videoSource === 'url' && !videoUrl) || (videoSource === 'file' && !selectedFile)}
               className="flex-1 bg-emerald-500 text-white py-2 rounded-lg hover:bg-emerald-600 transition-colors disabled:opacity-50"
             >
-              {uploading ? 'Subiendo...' : 'Guardar Cambios'}
+              {uploading ? `Subiendo... ${Math.round(uploadProgress * 100)}%` : 'Guardar Cambios'}
             </button>
           </div>
         </form>
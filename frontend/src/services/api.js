@@ -19,6 +19,47 @@ const getAuthHeaders = () => {
   };
 };
 
+// Renovar el token de acceso usando el token de refresco
+const refreshSession = async () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) return false;
+
+  const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ refresh_token: refreshToken }),
+  });
+  if (!response.ok) return false;
+
+  const data = await response.json();
+  localStorage.setItem('authToken', data.token);
+  localStorage.setItem('refreshToken', data.refresh_token);
+  localStorage.setItem('user', JSON.stringify(data.usuario));
+  return true;
+};
+
+// fetch autenticado: si el token de acceso expiró, se renueva una vez y se reintenta
+const fetchWithAuth = async (url, options = {}) => {
+  const doFetch = () => fetch(url, { ...options, headers: { ...getAuthHeaders(), ...options.headers } });
+
+  let response = await doFetch();
+  if (response.status === 401 && await refreshSession()) {
+    response = await doFetch();
+  }
+  return response;
+};
+
+// Tamaño de cada parte en las subidas reanudables (el backend acepta hasta 8 MB)
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+
+const sha256Base64 = async (buffer) => {
+  const digest = new Uint8Array(await crypto.subtle.digest('SHA-256', buffer));
+  return btoa(String.fromCharCode(...digest));
+};
+
 // Servicios de autenticación
 export const authService = {
   // Registrar nuevo usuario
@@ -44,9 +85,10 @@ export const authService = {
     });
     const data = await handleResponse(response);
     
-    // Guardar token en localStorage
+    // Guardar tokens en localStorage
     if (data.token) {
       localStorage.setItem('authToken', data.token);
+      localStorage.setItem('refreshToken', data.refresh_token);
       localStorage.setItem('user', JSON.stringify(data.usuario));
     }
     
@@ -56,27 +98,29 @@ export const authService = {
   // Cerrar sesión
   logout: () => {
     localStorage.removeItem('authToken');
+    localStorage.removeItem('refreshToken');
     localStorage.removeItem('user');
   },
 
   // Obtener perfil del usuario
   getProfile: async () => {
-    const response = await fetch(`${API_BASE_URL}/auth/profile`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/auth/profile`, {
       method: 'GET',
-      headers: getAuthHeaders(),
     });
     return handleResponse(response);
   },
 
   // Verificar acceso al curso
   checkCourseAccess: async () => {
-    const response = await fetch(`${API_BASE_URL}/course/check-access`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/course/check-access`, {
       method: 'GET',
-      headers: getAuthHeaders(),
     });
     return handleResponse(response);
   },
 
+  // Renovar token de acceso
+  refreshSession,
+
   // Obtener usuario actual desde localStorage
   getCurrentUser: () => {
     const user = localStorage.getItem('user');
@@ -142,32 +186,117 @@ export const authService = {
 export const courseService = {
   // Verificar acceso al curso
   checkAccess: async () => {
-    const response = await fetch(`${API_BASE_URL}/course/check-access`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/course/check-access`, {
+      method: 'GET',
+    });
+    return handleResponse(response);
+  },
+
+  // Obtener contenido del curso ({ view: 'summary' } o { fields: 'id,title,...' })
+  getContent: async (params = {}) => {
+    const query = new URLSearchParams(
+      Object.entries(params).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    ).toString();
+    const response = await fetchWithAuth(`${API_BASE_URL}/course/content${query ? `?${query}` : ''}`, {
+      method: 'GET',
+    });
+    return handleResponse(response);
+  },
+
+  // Detalle de un video (con descripción y material de lectura)
+  getVideo: async (videoId, fields) => {
+    const query = fields ? `?fields=${encodeURIComponent(fields)}` : '';
+    const response = await fetchWithAuth(`${API_BASE_URL}/course/content/${videoId}${query}`, {
       method: 'GET',
-      headers: getAuthHeaders(),
     });
     return handleResponse(response);
   },
 
-  // Obtener contenido del curso
-  getContent: async () => {
-    const response = await fetch(`${API_BASE_URL}/course/content`, {
+  // Token para reproducir los videos subidos (se agrega como ?token= a la URL del video)
+  getMediaToken: async () => {
+    const response = await fetchWithAuth(`${API_BASE_URL}/course/media-token`, {
       method: 'GET',
-      headers: getAuthHeaders(),
     });
     return handleResponse(response);
   },
 
   // Actualizar contenido de video
   updateVideo: async (videoId, videoData) => {
-    const response = await fetch(`${API_BASE_URL}/course/content/${videoId}`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/course/content/${videoId}`, {
       method: 'PUT',
-      headers: getAuthHeaders(),
       body: JSON.stringify(videoData),
     });
     return handleResponse(response);
   },
 
+  // Volver a encolar la transcodificación a HLS de un video subido (p. ej. si falló)
+  transcodeVideo: async (videoId) => {
+    const response = await fetchWithAuth(`${API_BASE_URL}/course/content/${videoId}/transcode`, {
+      method: 'POST',
+    });
+    return handleResponse(response);
+  },
+
+  // Subir video por partes, reanudable: si se corta (o se recarga la página) retoma
+  // desde lo ya recibido por el servidor. onProgress recibe la fracción subida (0 a 1)
+  uploadVideoResumable: async (file, videoId, onProgress) => {
+    const resumeKey = `upload:${videoId}:${file.name}:${file.size}:${file.lastModified}`;
+    let upload = null;
+
+    const savedId = localStorage.getItem(resumeKey);
+    if (savedId) {
+      const response = await fetchWithAuth(`${API_BASE_URL}/course/uploads/${savedId}`, { method: 'GET' });
+      if (response.ok) {
+        upload = (await response.json()).upload;
+      }
+    }
+    if (!upload) {
+      const response = await fetchWithAuth(`${API_BASE_URL}/course/uploads`, {
+        method: 'POST',
+        body: JSON.stringify({ video_id: videoId, filename: file.name, size: file.size }),
+      });
+      upload = (await handleResponse(response)).upload;
+      localStorage.setItem(resumeKey, upload.id);
+    }
+
+    const uploadUrl = `${API_BASE_URL}/course/uploads/${upload.id}`;
+    let offset = upload.offset;
+    let failures = 0;
+    while (upload.status === 'uploading' && offset < file.size) {
+      try {
+        const buffer = await file.slice(offset, offset + UPLOAD_CHUNK_SIZE).arrayBuffer();
+        const response = await fetchWithAuth(uploadUrl, {
+          method: 'PATCH',
+          headers: {
+            'Content-Type': 'application/offset+octet-stream',
+            'Upload-Offset': String(offset),
+            'Upload-Checksum': `sha256 ${await sha256Base64(buffer)}`,
+          },
+          body: buffer,
+        });
+        if (response.status === 409) {
+          // El servidor tiene otro offset (parte repetida o perdida): seguir desde el suyo
+          offset = (await response.json()).offset;
+          continue;
+        }
+        offset = (await handleResponse(response)).upload.offset;
+        failures = 0;
+        if (onProgress) onProgress(offset / file.size);
+      } catch (error) {
+        failures += 1;
+        if (failures > UPLOAD_MAX_RETRIES) throw error;
+        await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** failures));
+        // Releer el offset confirmado antes de reintentar
+        const status = await fetchWithAuth(uploadUrl, { method: 'GET' });
+        if (status.ok) offset = (await status.json()).upload.offset;
+      }
+    }
+
+    const result = await handleResponse(await fetchWithAuth(`${uploadUrl}/finalize`, { method: 'POST' }));
+    localStorage.removeItem(resumeKey);
+    return result;
+  },
+
   // Subir video
   uploadVideo: async (formData, videoId = null) => {
     const token = localStorage.getItem('authToken');
@@ -190,9 +319,8 @@ export const courseService = {
 export const paymentService = {
   // Crear preferencia de pago
   createPreference: async (paymentData) => {
-    const response = await fetch(`${API_BASE_URL}/payments/create-preference`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/payments/create-preference`, {
       method: 'POST',
-      headers: getAuthHeaders(),
       body: JSON.stringify(paymentData),
     });
     return handleResponse(response);
@@ -200,9 +328,8 @@ export const paymentService = {
 
   // Obtener estado del pago
   getPaymentStatus: async (paymentId) => {
-    const response = await fetch(`${API_BASE_URL}/payments/status/${paymentId}`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/payments/status/${paymentId}`, {
       method: 'GET',
-      headers: getAuthHeaders(),
     });
     return handleResponse(response);
   }
@@ -210,20 +337,86 @@ export const paymentService = {
 
 // Servicios de administración (solo para admins)
 export const adminService = {
-  // Obtener todos los usuarios
-  getUsers: async () => {
-    const response = await fetch(`${API_BASE_URL}/admin/users`, {
+  // Obtener una página de usuarios ({ limit, cursor, sort, order, activo, has_access, ... })
+  getUsers: async (params = {}) => {
+    const query = new URLSearchParams(
+      Object.entries(params).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    ).toString();
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/users${query ? `?${query}` : ''}`, {
       method: 'GET',
-      headers: getAuthHeaders(),
+    });
+    return handleResponse(response);
+  },
+
+  // Estadísticas de usuarios para el panel (totales y altas por día)
+  getStats: async (days) => {
+    const query = days ? `?days=${days}` : '';
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/stats${query}`, {
+      method: 'GET',
+    });
+    return handleResponse(response);
+  },
+
+  // Buscar usuarios por email, nombre o apellido
+  searchUsers: async (q, limit = 10) => {
+    const query = new URLSearchParams({ q, limit }).toString();
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/users/search?${query}`, {
+      method: 'GET',
+    });
+    return handleResponse(response);
+  },
+
+  // Descargar el export de usuarios (format: 'csv' | 'ndjson', columns: 'email,nombre,...')
+  exportUsers: async (params = { format: 'csv' }) => {
+    const query = new URLSearchParams(params).toString();
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/users/export?${query}`, {
+      method: 'GET',
+    });
+    if (!response.ok) {
+      return handleResponse(response);
+    }
+
+    const match = /filename="([^"]+)"/.exec(response.headers.get('Content-Disposition') || '');
+    const url = URL.createObjectURL(await response.blob());
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = match ? match[1] : `usuarios.${params.format || 'csv'}`;
+    link.click();
+    URL.revokeObjectURL(url);
+  },
+
+  // Importar usuarios desde un CSV (email, nombre, apellido)
+  importUsers: async (file, { grantAccess = false, sendWelcome = true, dryRun = false } = {}) => {
+    const token = localStorage.getItem('authToken');
+    const formData = new FormData();
+    formData.append('file', file);
+    formData.append('grant_access', grantAccess);
+    formData.append('send_welcome', sendWelcome);
+    formData.append('dry_run', dryRun);
+
+    const response = await fetch(`${API_BASE_URL}/admin/users/import`, {
+      method: 'POST',
+      headers: {
+        ...(token && { 'Authorization': `Bearer ${token}` })
+      },
+      body: formData,
+    });
+    return handleResponse(response);
+  },
+
+  // Acción masiva: action = 'activate' | 'deactivate' | 'grant' | 'revoke'
+  bulkUpdateUsers: async (action, userIds) => {
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/users/bulk`, {
+      method: 'POST',
+      body: JSON.stringify({ action, user_ids: userIds }),
     });
     return handleResponse(response);
   },
 
   // Activar usuario y darle acceso
   activateUser: async (userId) => {
-    const response = await fetch(`${API_BASE_URL}/admin/activate-user`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/activate-user`, {
       method: 'POST',
-      headers: getAuthHeaders(),
       body: JSON.stringify({ user_id: userId }),
     });
     return handleResponse(response);
@@ -231,9 +424,8 @@ export const adminService = {
 
   // Desactivar usuario y quitarle acceso
   deactivateUser: async (userId) => {
-    const response = await fetch(`${API_BASE_URL}/admin/deactivate-user`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/deactivate-user`, {
       method: 'POST',
-      headers: getAuthHeaders(),
       body: JSON.stringify({ user_id: userId }),
     });
     return handleResponse(response);
@@ -241,9 +433,8 @@ export const adminService = {
 
   // Dar acceso al curso
   grantAccess: async (userId) => {
-    const response = await fetch(`${API_BASE_URL}/admin/grant-access`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/grant-access`, {
       method: 'POST',
-      headers: getAuthHeaders(),
       body: JSON.stringify({ user_id: userId }),
     });
     return handleResponse(response);
@@ -251,12 +442,47 @@ export const adminService = {
 
   // Revocar acceso al curso
   revokeAccess: async (userId) => {
-    const response = await fetch(`${API_BASE_URL}/admin/revoke-access`, {
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/revoke-access`, {
       method: 'POST',
-      headers: getAuthHeaders(),
       body: JSON.stringify({ user_id: userId }),
     });
     return handleResponse(response);
+  },
+
+  // Encolar un anuncio por email ({ subject, message, audience, video_id })
+  createAnnouncement: async (announcement) => {
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/announcements`, {
+      method: 'POST',
+      body: JSON.stringify(announcement),
+    });
+    return handleResponse(response);
+  },
+
+  // Últimos anuncios con su progreso
+  getAnnouncements: async () => {
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/announcements`, {
+      method: 'GET',
+    });
+    return handleResponse(response);
+  },
+
+  // Progreso de un anuncio
+  getAnnouncement: async (announcementId) => {
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/announcements/${announcementId}`, {
+      method: 'GET',
+    });
+    return handleResponse(response);
+  },
+
+  // Registro de auditoría ({ limit, cursor, actor_id, action, target_type, target_id, since, until })
+  getAuditLog: async (params = {}) => {
+    const query = new URLSearchParams(
+      Object.entries(params).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    ).toString();
+    const response = await fetchWithAuth(`${API_BASE_URL}/admin/audit${query ? `?${query}` : ''}`, {
+      method: 'GET',
+    });
+    return handleResponse(response);
   }
 };
 
@@ -271,7 +497,7 @@ export const healthCheck = async () => {
 };
 
 // Exportaciones individuales para fácil acceso
-export const { register, login, logout, getProfile, checkCourseAccess, getCurrentUser, isAuthenticated, confirmEmail, resendConfirmation, forgotPassword, resetPassword } = authService;
-export const { checkAccess, getContent, updateVideo, uploadVideo } = courseService;
+export const { register, login, logout, getProfile, checkCourseAccess, refreshSession, getCurrentUser, isAuthenticated, confirmEmail, resendConfirmation, forgotPassword, resetPassword } = authService;
+export const { checkAccess, getContent, getVideo, getMediaToken, updateVideo, transcodeVideo, uploadVideoResumable, uploadVideo } = courseService;
 export const { createPreference, getPaymentStatus } = paymentService;
-export const { getUsers, activateUser, deactivateUser, grantAccess, revokeAccess } = adminService;
+export const { getUsers, getStats, searchUsers, exportUsers, importUsers, bulkUpdateUsers, activateUser, deactivateUser, grantAccess, revokeAccess, createAnnouncement, getAnnouncements, getAnnouncement, getAuditLog } = adminService;
@@ -0,0 +1,66 @@
+import pytest
+import json
+import sys
+import os
+import tempfile
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../backend'))
+# app.py crea la aplicación al importarse: que tampoco escriba en uploads/ del repo
+os.environ.setdefault('UPLOAD_FOLDER', tempfile.mkdtemp(prefix='uploads-'))
+
+from app import create_app
+from models import db, Usuario
+from config import Config
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Crear aplicación Flask para testing"""
+    # Videos subidos, blobs y transcodificaciones en un directorio propio de cada test
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'  # Base de datos en memoria para tests
+    app.config['AUDIT_FLUSH_INTERVAL'] = 0  # Auditoría sin thread: se escribe al consultarla
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Cliente de prueba para hacer requests"""
+    return app.test_client()
+
+@pytest.fixture
+def sample_user_data():
+    """Datos de usuario de ejemplo para tests"""
+    return {
+        'email': 'test@example.com',
+        'password': 'password123',
+        'nombre': 'Test',
+        'apellido': 'User'
+    }
+
+@pytest.fixture
+def login_token(client, app):
+    """login_token(user_data, **campos): crear un usuario y devolver un token válido"""
+    def login(user_data, **campos):
+        with app.app_context():
+            user = Usuario(
+                email=user_data['email'],
+                nombre=user_data['nombre'],
+                apellido=user_data['apellido'],
+                email_confirmed=True,
+                **campos
+            )
+            user.set_password(user_data['password'])
+            db.session.add(user)
+            db.session.commit()
+
+        response = client.post('/api/auth/login',
+                             data=json.dumps({'email': user_data['email'], 'password': user_data['password']}),
+                             content_type='application/json')
+        return json.loads(response.data)['token']
+    return login
@@ -0,0 +1,39 @@
+import pytest
+import json
+
+from models import db, Usuario
+from datetime import datetime, timedelta
+
+class TestAdminStats:
+    """Tests para las estadísticas del panel de admin"""
+
+    def test_stats_counts_days_and_cache(self, client, app, sample_user_data, login_token):
+        """Totales por agregados condicionales, días sin altas en 0 y cache invalidado por acciones"""
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        viejo = Usuario(email='viejo@example.com', nombre='V', apellido='J', password_hash='x', activo=False,
+                        fecha_registro=datetime.utcnow() - timedelta(days=2))
+        db.session.add(viejo)
+        db.session.commit()
+
+        response = client.get('/api/admin/stats?days=3', headers=headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert (data['total'], data['activos'], data['con_acceso'], data['admins']) == (2, 1, 1, 1)
+        assert [d['registros'] for d in data['registros_por_dia']] == [1, 0, 1]
+
+        # Cacheado: un alta directa en la base no se ve hasta invalidar
+        db.session.add(Usuario(email='nuevo@example.com', nombre='N', apellido='U', password_hash='x'))
+        db.session.commit()
+        assert json.loads(client.get('/api/admin/stats?days=3', headers=headers).data)['total'] == 2
+
+        client.post('/api/admin/users/bulk', data=json.dumps({'action': 'activate', 'user_ids': [viejo.id]}),
+                    content_type='application/json', headers=headers)
+        data = json.loads(client.get('/api/admin/stats?days=3', headers=headers).data)
+        assert (data['total'], data['activos']) == (3, 3)
+
+        assert client.get('/api/admin/stats?days=0', headers=headers).status_code == 400
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,97 @@
+import pytest
+import json
+
+from models import db, Usuario
+from datetime import datetime
+
+class TestAdminUsers:
+    """Tests para el listado paginado de usuarios"""
+
+    def test_keyset_pagination_filters_and_count(self, client, app, sample_user_data, login_token):
+        """Se recorren todas las páginas sin repetir filas, aun con fechas empatadas"""
+        from datetime import datetime
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        same_date = datetime(2025, 1, 15, 12, 0)
+        for i in range(7):
+            db.session.add(Usuario(email=f'u{i}@example.com', nombre='U', apellido=str(i), password_hash='x',
+                                   fecha_registro=same_date, has_access=i % 2 == 0))
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            response = client.get('/api/admin/users', query_string={'limit': 3, 'cursor': cursor or ''},
+                                headers=headers)
+            data = json.loads(response.data)
+            assert response.status_code == 200
+            assert data['total'] == 8 and len(data['usuarios']) <= 3
+            seen += [u['id'] for u in data['usuarios']]
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                break
+        assert len(seen) == len(set(seen)) == 8
+
+        response = client.get('/api/admin/users',
+                            query_string={'has_access': 'true', 'registered_to': '2025-01-15',
+                                          'sort': 'email', 'order': 'asc'},
+                            headers=headers)
+        data = json.loads(response.data)
+        assert [u['email'] for u in data['usuarios']] == ['u0@example.com', 'u2@example.com',
+                                                         'u4@example.com', 'u6@example.com']
+        assert data['total'] == 4
+
+        response = client.get('/api/admin/users', query_string={'cursor': 'basura'}, headers=headers)
+        assert response.status_code == 400
+        response = client.get('/api/admin/users', query_string={'activo': 'quizas'}, headers=headers)
+        assert response.status_code == 400
+
+class TestBulkActions:
+    """Tests para las acciones masivas del panel de admin"""
+
+    def test_bulk_grant_and_revoke_with_outcomes(self, client, app, sample_user_data, login_token):
+        """Un solo UPDATE, resultado por id e invalidación del cache del lote"""
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        token = login_token(sample_user_data)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        admin_id = Usuario.query.filter_by(email='admin@example.com').one().id
+        user_id = Usuario.query.filter_by(email=sample_user_data['email']).one().id
+        otro = Usuario(email='otro@example.com', nombre='O', apellido='T', password_hash='x', has_access=True)
+        db.session.add(otro)
+        db.session.commit()
+
+        # Cachear al usuario sin acceso
+        response = client.get('/api/course/check-access', headers={'Authorization': f'Bearer {token}'})
+        assert json.loads(response.data)['has_access'] == False
+
+        response = client.post('/api/admin/users/bulk',
+                             data=json.dumps({'action': 'grant', 'user_ids': [user_id, otro.id, 9999, user_id]}),
+                             content_type='application/json', headers=headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['updated'] == 1
+        assert [r['status'] for r in data['results']] == ['updated', 'unchanged', 'not_found']
+
+        response = client.get('/api/course/check-access', headers={'Authorization': f'Bearer {token}'})
+        assert json.loads(response.data)['has_access'] == True
+
+        response = client.post('/api/admin/users/bulk',
+                             data=json.dumps({'action': 'revoke', 'user_ids': [admin_id, user_id]}),
+                             content_type='application/json', headers=headers)
+        data = json.loads(response.data)
+        assert [r['status'] for r in data['results']] == ['skipped', 'updated']
+
+        response = client.post('/api/admin/users/bulk',
+                             data=json.dumps({'action': 'deactivate', 'filter': {'has_access': True}}),
+                             content_type='application/json', headers=headers)
+        data = json.loads(response.data)
+        assert [r['id'] for r in data['results']] == [otro.id]  # El admin no se desactiva a sí mismo
+
+        response = client.post('/api/admin/users/bulk',
+                             data=json.dumps({'action': 'deactivate', 'filter': {}}),
+                             content_type='application/json', headers=headers)
+        assert response.status_code == 400
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,58 @@
+import pytest
+import json
+
+from models import db, Usuario, AuditLog
+from config import Config
+from datetime import datetime, timedelta
+
+class TestAuditLog:
+    """Tests para el registro de auditoría de acciones de admin"""
+
+    def test_admin_actions_are_buffered_and_queryable(self, client, app, sample_user_data, login_token):
+        """Las acciones quedan en el buffer (sin escribir) y el endpoint las lista filtradas y paginadas"""
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        login_token(sample_user_data)
+        user_id = Usuario.query.filter_by(email=sample_user_data['email']).one().id
+
+        client.post('/api/admin/grant-access', data=json.dumps({'user_id': user_id}),
+                    content_type='application/json', headers=headers)
+        client.put('/api/course/content/1', data=json.dumps({'title': 'Intro', 'duration': '10:00'}),
+                   content_type='application/json', headers=headers)
+        client.post('/api/admin/users/bulk', data=json.dumps({'action': 'deactivate', 'user_ids': [user_id]}),
+                    content_type='application/json', headers=headers)
+
+        # Nada se escribió durante los requests
+        assert AuditLog.query.count() == 0
+        assert app.extensions['audit_buffer'].pending() == 3
+
+        response = client.get('/api/admin/audit?limit=2', headers=headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [e['action'] for e in data['entries']] == ['user.bulk_deactivate', 'course.update_content']
+        assert data['entries'][0]['actor_email'] == 'admin@example.com'
+        assert data['entries'][1]['changes']['title'] == [None, 'Intro']
+
+        data = json.loads(client.get(f'/api/admin/audit?limit=2&cursor={data["next_cursor"]}', headers=headers).data)
+        assert [e['changes'] for e in data['entries']] == [{'has_access': [False, True]}]
+        assert data['has_more'] == False
+
+        data = json.loads(client.get(f'/api/admin/audit?target_type=usuario&target_id={user_id}',
+                                     headers=headers).data)
+        assert len(data['entries']) == 2
+        assert client.get('/api/admin/audit?actor_id=x', headers=headers).status_code == 400
+
+    def test_retention_purge(self, client, app, sample_user_data):
+        """El sweeper borra las entradas más viejas que AUDIT_RETENTION_DAYS"""
+        from audit_service import purge_audit_log
+        old = datetime.utcnow() - timedelta(days=Config.AUDIT_RETENTION_DAYS + 1)
+        db.session.add_all([AuditLog(action='user.activate', target_type='usuario', created_at=old),
+                            AuditLog(action='user.activate', target_type='usuario')])
+        db.session.commit()
+
+        assert purge_audit_log(batch_size=1) == 1
+        assert AuditLog.query.count() == 1
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -1,42 +1,11 @@
 import pytest
 import json
-import sys
-import os
 
-# Agregar el directorio backend al path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../backend'))
-
-from app import create_app
-from models import db, Usuario
-from email_service import generate_confirmation_token
+from models import db, Usuario, AuthToken, EmailOutbox
+import token_service
 from config import Config
-
-@pytest.fixture
-def app():
-    """Crear aplicación Flask para testing"""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'  # Base de datos en memoria para tests
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
-
-@pytest.fixture
-def client(app):
-    """Cliente de prueba para hacer requests"""
-    return app.test_client()
-
-@pytest.fixture
-def sample_user_data():
-    """Datos de usuario de ejemplo para tests"""
-    return {
-        'email': 'test@example.com',
-        'password': 'password123',
-        'nombre': 'Test',
-        'apellido': 'User'
-    }
+from werkzeug.security import generate_password_hash
+from datetime import timedelta
 
 class TestUserRegistration:
     """Tests para el registro de usuarios"""
@@ -94,15 +63,15 @@ class TestEmailConfirmation:
         """Test de confirmación de email exitosa"""
         with app.app_context():
             # Crear usuario con token de confirmación
-            token = generate_confirmation_token()
             user = Usuario(
                 email=sample_user_data['email'],
                 nombre=sample_user_data['nombre'],
-                apellido=sample_user_data['apellido'],
-                email_confirmation_token=token
+                apellido=sample_user_data['apellido']
             )
             user.set_password(sample_user_data['password'])
             db.session.add(user)
+            db.session.flush()
+            token = token_service.issue_token(user.id, token_service.EMAIL_CONFIRMATION)
             db.session.commit()
             
             # Confirmar email
@@ -116,8 +85,7 @@ class TestEmailConfirmation:
             assert data['usuario']['email_confirmed'] == True
             
             # Verificar que el token se haya eliminado
-            updated_user = Usuario.query.filter_by(email=sample_user_data['email']).first()
-            assert updated_user.email_confirmation_token is None
+            assert AuthToken.query.filter_by(user_id=user.id).count() == 0
     
     def test_confirm_email_invalid_token(self, client):
         """Test de confirmación con token inválido"""
@@ -154,8 +122,7 @@ class TestEmailConfirmation:
             assert 'message' in data
             
             # Verificar que se haya generado un nuevo token
-            updated_user = Usuario.query.filter_by(email=sample_user_data['email']).first()
-            assert updated_user.email_confirmation_token is not None
+            assert AuthToken.query.filter_by(user_id=user.id, purpose=token_service.EMAIL_CONFIRMATION).count() == 1
     
     def test_resend_confirmation_already_confirmed(self, client, app, sample_user_data):
         """Test de reenvío cuando email ya está confirmado"""
@@ -192,6 +159,54 @@ class TestEmailConfirmation:
         assert 'error' in data
         assert 'no encontrado' in data['error']
 
+    def test_confirm_email_expired_token(self, client, app, sample_user_data):
+        """Un token expirado no confirma el email y el sweeper lo elimina"""
+        with app.app_context():
+            user = Usuario(
+                email=sample_user_data['email'],
+                nombre=sample_user_data['nombre'],
+                apellido=sample_user_data['apellido']
+            )
+            user.set_password(sample_user_data['password'])
+            db.session.add(user)
+            db.session.flush()
+            token = token_service.issue_token(user.id, token_service.EMAIL_CONFIRMATION, ttl=timedelta(seconds=-1))
+            db.session.commit()
+
+            response = client.post('/api/auth/confirm-email',
+                                 data=json.dumps({'token': token}),
+                                 content_type='application/json')
+            assert response.status_code == 400
+
+            assert token_service.purge_expired_tokens(batch_size=1) == 1
+            assert AuthToken.query.count() == 0
+
+class TestPasswordReset:
+    """Tests para reset de contraseña"""
+
+    def test_reset_password_flow(self, client, app, sample_user_data):
+        """El token de reset cambia la contraseña una sola vez"""
+        with app.app_context():
+            user = Usuario(
+                email=sample_user_data['email'],
+                nombre=sample_user_data['nombre'],
+                apellido=sample_user_data['apellido']
+            )
+            user.set_password(sample_user_data['password'])
+            db.session.add(user)
+            db.session.flush()
+            token = token_service.issue_token(user.id, token_service.PASSWORD_RESET)
+            db.session.commit()
+
+            reset_data = json.dumps({'token': token, 'password': 'nueva123'})
+            response = client.post('/api/auth/reset-password', data=reset_data, content_type='application/json')
+            assert response.status_code == 200
+
+            response = client.post('/api/auth/reset-password', data=reset_data, content_type='application/json')
+            assert response.status_code == 400
+
+            assert db.session.get(Usuario, user.id).check_password('nueva123')
+
 class TestUserLogin:
     """Tests para login de usuarios"""
     
@@ -253,5 +268,505 @@ class TestUserLogin:
             assert 'error' in data
             assert 'inválidas' in data['error']
 
+    def test_login_rehashes_outdated_hash(self, client, app, sample_user_data):
+        """Un hash con parámetros anteriores se actualiza al hacer login"""
+        with app.app_context():
+            user = Usuario(
+                email=sample_user_data['email'],
+                nombre=sample_user_data['nombre'],
+                apellido=sample_user_data['apellido'],
+                password_hash=generate_password_hash(sample_user_data['password'], 'pbkdf2:sha256:1000')
+            )
+            db.session.add(user)
+            db.session.commit()
+
+        response = client.post('/api/auth/login',
+                             data=json.dumps({'email': sample_user_data['email'],
+                                              'password': sample_user_data['password']}),
+                             content_type='application/json')
+
+        assert response.status_code == 200
+        with app.app_context():
+            user = Usuario.query.filter_by(email=sample_user_data['email']).first()
+            assert user.password_hash.startswith(Config.PASSWORD_HASH_METHOD + '$')
+            assert user.check_password(sample_user_data['password'])
+
+    def test_bare_hash_method_does_not_rehash(self, monkeypatch):
+        """Con el método sin parámetros ('scrypt', 'pbkdf2:sha256') el hash recién hecho no se rehace"""
+        from password_service import needs_rehash
+        for method in ('scrypt', 'pbkdf2', 'pbkdf2:sha256'):
+            monkeypatch.setattr(Config, 'PASSWORD_HASH_METHOD', method)
+            assert not needs_rehash(generate_password_hash('x', method))
+        assert needs_rehash(generate_password_hash('x', 'pbkdf2:sha256:1000'))
+        assert needs_rehash(generate_password_hash('x', 'scrypt'))
+
+class TestAuthLayer:
+    """Tests para la capa de autenticación compartida"""
+
+    def test_profile_requires_token(self, client):
+        """Sin token se responde 401 sin resolver usuario"""
+        response = client.get('/api/auth/profile')
+
+        assert response.status_code == 401
+        assert response.headers['X-Auth-Lookups'] == '0'
+
+    def test_single_lookup_per_request(self, client, app, sample_user_data, login_token):
+        """debug-auth usa el usuario dos veces pero lo resuelve una sola vez"""
+        token = login_token(sample_user_data)
+
+        response = client.get('/api/course/debug-auth',
+                            headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['user']['email'] == sample_user_data['email']
+        assert response.headers['X-Auth-Lookups'] == '1'
+
+    def test_course_routes_use_token_claims(self, client, app, sample_user_data, login_token):
+        """El contenido y el token de media se resuelven con los claims, sin buscar al usuario"""
+        token = login_token(sample_user_data, has_access=True)
+        headers = {'Authorization': f'Bearer {token}'}
+        app.extensions['auth_user_cache'].clear()
+
+        response = client.get('/api/course/content', headers=headers)
+        assert response.status_code == 200
+        assert response.headers['X-Auth-DB-Queries'] == '0'
+        assert json.loads(response.data)['usuario']['email'] == sample_user_data['email']
+
+        response = client.get('/api/course/media-token', headers=headers)
+        assert response.status_code == 200
+        assert response.headers['X-Auth-DB-Queries'] == '0'
+
+    def test_admin_required(self, client, app, sample_user_data, login_token):
+        """Un usuario común no puede acceder a rutas de admin"""
+        token = login_token(sample_user_data)
+
+        response = client.get('/api/admin/users',
+                            headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == 403
+
+    def test_user_cache_and_invalidation(self, client, app, sample_user_data, login_token):
+        """El segundo request no consulta la tabla; los cambios de admin invalidan el cache"""
+        token = login_token(sample_user_data)
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {token}'}
+
+        response = client.get('/api/course/check-access', headers=headers)
+        assert response.headers['X-Auth-DB-Queries'] == '1'
+        assert json.loads(response.data)['has_access'] == False
+
+        response = client.get('/api/course/check-access', headers=headers)
+        assert response.headers['X-Auth-DB-Queries'] == '0'
+
+        user_id = json.loads(response.data)['usuario']['id']
+        client.post('/api/admin/grant-access',
+                   data=json.dumps({'user_id': user_id}),
+                   content_type='application/json',
+                   headers={'Authorization': f'Bearer {admin_token}'})
+
+        response = client.get('/api/course/check-access', headers=headers)
+        assert json.loads(response.data)['has_access'] == True
+
+    def test_user_cache_invalidated_by_other_worker(self, client, app, sample_user_data, login_token, monkeypatch):
+        """Un cambio publicado en cache_versions por otro worker descarta las copias de este"""
+        from auth_service import bump_users_version
+        monkeypatch.setattr(Config, 'AUTH_CACHE_VERSION_CHECK_INTERVAL', 0)
+        token = login_token(sample_user_data)
+        headers = {'Authorization': f'Bearer {token}'}
+
+        response = client.get('/api/course/check-access', headers=headers)
+        assert json.loads(response.data)['has_access'] == False
+
+        # Otro worker modifica al usuario: sin publicar la versión, este sigue con su copia
+        with app.app_context():
+            Usuario.query.filter_by(email=sample_user_data['email']).update({'has_access': True})
+            db.session.commit()
+        response = client.get('/api/course/check-access', headers=headers)
+        assert response.headers['X-Auth-DB-Queries'] == '0'
+        assert json.loads(response.data)['has_access'] == False
+
+        with app.app_context():
+            bump_users_version()
+            db.session.commit()
+        response = client.get('/api/course/check-access', headers=headers)
+        assert response.headers['X-Auth-DB-Queries'] == '1'
+        assert json.loads(response.data)['has_access'] == True
+
+    def test_password_hash_timeout_is_busy(self, monkeypatch):
+        """Un hash que excede el timeout responde como pool saturado y ocupa su slot hasta terminar"""
+        import threading
+        import password_service
+        monkeypatch.setattr(Config, 'PASSWORD_HASH_CONCURRENCY', 1)
+        monkeypatch.setattr(Config, 'PASSWORD_HASH_QUEUE_LIMIT', 0)
+        monkeypatch.setattr(Config, 'PASSWORD_HASH_TIMEOUT', 0.05)
+        monkeypatch.setattr(password_service, '_executor', None)
+        release = threading.Event()
+
+        with pytest.raises(password_service.PasswordHasherBusy):
+            password_service._run(release.wait)
+        with pytest.raises(password_service.PasswordHasherBusy):
+            password_service._run(lambda: 'ok')
+
+        release.set()
+        password_service._executor.shutdown(wait=True)
+        monkeypatch.setattr(password_service, '_executor', None)
+        assert password_service._run(lambda: 'ok') == 'ok'
+
+class TestTokens:
+    """Tests para tokens de acceso y refresco"""
+
+    def test_admin_authorized_by_claims(self, client, app, sample_user_data, login_token):
+        """Las rutas de admin se autorizan con los claims del token, sin consultar usuarios"""
+        token = login_token(sample_user_data, rol='admin', has_access=True)
+
+        response = client.get('/api/admin/users',
+                            headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == 200
+        assert response.headers['X-Auth-DB-Queries'] == '0'
+
+    def test_refresh_token(self, client, app, sample_user_data, login_token):
+        """El token de refresco emite un nuevo par de tokens con claims actualizados"""
+        login_token(sample_user_data)
+        response = client.post('/api/auth/login',
+                             data=json.dumps({'email': sample_user_data['email'],
+                                              'password': sample_user_data['password']}),
+                             content_type='application/json')
+        tokens = json.loads(response.data)
+
+        # El token de refresco no sirve como token de acceso
+        response = client.get('/api/auth/profile',
+                            headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+        assert response.status_code == 401
+
+        with app.app_context():
+            Usuario.query.filter_by(email=sample_user_data['email']).update({'has_access': True})
+            db.session.commit()
+
+        response = client.post('/api/auth/refresh',
+                             data=json.dumps({'refresh_token': tokens['refresh_token']}),
+                             content_type='application/json')
+        assert response.status_code == 200
+        token = json.loads(response.data)['token']
+
+        response = client.get('/api/course/content',
+                            headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+
+    def test_password_reset_revokes_refresh_tokens(self, client, app, sample_user_data, login_token):
+        """Restablecer la contraseña invalida los tokens de refresco emitidos antes"""
+        login_token(sample_user_data)
+        response = client.post('/api/auth/login',
+                             data=json.dumps({'email': sample_user_data['email'],
+                                              'password': sample_user_data['password']}),
+                             content_type='application/json')
+        refresh_token = json.loads(response.data)['refresh_token']
+
+        with app.app_context():
+            user = Usuario.query.filter_by(email=sample_user_data['email']).first()
+            token = token_service.issue_token(user.id, token_service.PASSWORD_RESET)
+            db.session.commit()
+
+        response = client.post('/api/auth/reset-password',
+                             data=json.dumps({'token': token, 'password': 'nueva123'}),
+                             content_type='application/json')
+        assert response.status_code == 200
+
+        response = client.post('/api/auth/refresh',
+                             data=json.dumps({'refresh_token': refresh_token}),
+                             content_type='application/json')
+        assert response.status_code == 401
+
+        # Un login con la contraseña nueva emite un token de refresco válido
+        response = client.post('/api/auth/login',
+                             data=json.dumps({'email': sample_user_data['email'], 'password': 'nueva123'}),
+                             content_type='application/json')
+        response = client.post('/api/auth/refresh',
+                             data=json.dumps({'refresh_token': json.loads(response.data)['refresh_token']}),
+                             content_type='application/json')
+        assert response.status_code == 200
+
+    def test_refresh_invalid_token(self, client):
+        """Un token de refresco inválido devuelve 401"""
+        response = client.post('/api/auth/refresh',
+                             data=json.dumps({'refresh_token': 'invalido'}),
+                             content_type='application/json')
+
+        assert response.status_code == 401
+
+class TestRateLimit:
+    """Tests para el rate limiting de rutas de autenticación"""
+
+    def test_login_limited_by_email(self, client, app, sample_user_data):
+        """Superado el límite por email se responde 429 con Retry-After"""
+        limit, window = Config.RATE_LIMITS['login']['email']
+        login_data = json.dumps({'email': ' TEST@example.com', 'password': 'wrong_password'})
+
+        for _ in range(limit):
+            response = client.post('/api/auth/login', data=login_data, content_type='application/json')
+            assert response.status_code == 401
+
+        response = client.post('/api/auth/login', data=login_data, content_type='application/json')
+        assert response.status_code == 429
+        assert 0 < int(response.headers['Retry-After']) <= window
+
+    def test_database_storage_sliding_window(self, app):
+        """El backend en base de datos aplica la misma ventana deslizante"""
+        from rate_limit_service import DatabaseRateLimitStorage
+
+        storage = DatabaseRateLimitStorage()
+        assert storage.hit('test:ip:1.2.3.4', 2, 60) == (True, 0)
+        assert storage.hit('test:ip:1.2.3.4', 2, 60) == (True, 0)
+        allowed, retry_after = storage.hit('test:ip:1.2.3.4', 2, 60)
+        assert not allowed and 0 < retry_after <= 60
+        assert storage.hit('test:ip:5.6.7.8', 2, 60) == (True, 0)
+
+    def test_client_ip_ignores_spoofed_headers(self, app):
+        """Sin proxy de confianza, X-Real-IP / X-Forwarded-For del cliente no cambian la IP"""
+        from rate_limit_service import get_client_ip
+
+        with app.test_request_context(headers={'X-Real-IP': '9.9.9.9', 'X-Forwarded-For': '8.8.8.8'},
+                                      environ_base={'REMOTE_ADDR': '1.2.3.4'}):
+            assert get_client_ip() == '1.2.3.4'
+
+    def test_trusted_proxy_gives_each_client_its_bucket(self, monkeypatch):
+        """Detrás de nginx (TRUSTED_PROXY_COUNT=1) el límite por IP es por cliente, no por proxy"""
+        from app import create_app
+        monkeypatch.setattr(Config, 'TRUSTED_PROXY_COUNT', 1)
+        proxied = create_app()
+        proxied.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        proxied.config['RATE_LIMITS'] = {'register': {'ip': (1, 3600)}}
+        client = proxied.test_client()
+
+        def register(forwarded_for):
+            # nginx agrega la IP real al final de lo que haya mandado el cliente
+            return client.post('/api/auth/register', data='{}', content_type='application/json',
+                               headers={'X-Forwarded-For': forwarded_for},
+                               environ_base={'REMOTE_ADDR': '172.18.0.5'}).status_code
+
+        with proxied.app_context():
+            db.create_all()
+            assert register('10.0.0.1') == 400
+            assert register('10.0.0.1') == 429
+            assert register('10.0.0.2') == 400
+            # Un X-Forwarded-For inventado por el cliente no le da un bucket nuevo
+            assert register('1.1.1.1, 10.0.0.2') == 429
+            db.drop_all()
+
+    def test_purge_removes_expired_keys(self, app):
+        """purge descarta las claves sin intentos dentro de la ventana (lo llama el sweeper)"""
+        from rate_limit_service import MemoryRateLimitStorage, DatabaseRateLimitStorage, purge_rate_limits
+        from models import RateLimitHit
+
+        memory = MemoryRateLimitStorage()
+        memory.hit('test:ip:1.2.3.4', 2, 60)
+        memory.purge(0)
+        assert not memory._hits
+
+        DatabaseRateLimitStorage().hit('test:ip:1.2.3.4', 2, 60)
+        db.session.add(RateLimitHit(key='test:ip:9.9.9.9', hit_at=0))
+        db.session.commit()
+        app.extensions['rate_limiter'] = DatabaseRateLimitStorage()
+        purge_rate_limits()
+        assert [hit.key for hit in RateLimitHit.query.all()] == ['test:ip:1.2.3.4']
+
+class TestEmailOutbox:
+    """Tests para el outbox de emails"""
+
+    def test_register_queues_email(self, client, app, sample_user_data):
+        """El registro encola el email y el worker lo envía"""
+        from email_outbox import process_outbox
+
+        response = client.post('/api/auth/register',
+                             data=json.dumps(sample_user_data),
+                             content_type='application/json')
+        assert response.status_code == 201
+
+        message = EmailOutbox.query.one()
+        assert message.kind == 'confirmation'
+        assert message.status == 'pending'
+
+        assert process_outbox() == 1
+        assert message.status == 'sent'
+        assert message.payload is None
+
+    def test_email_locale_from_accept_language(self, client, app, sample_user_data):
+        """El email se arma con la plantilla del idioma del request, con fallback al default"""
+        from email_outbox import BUILDERS
+
+        response = client.post('/api/auth/register',
+                             data=json.dumps(sample_user_data),
+                             content_type='application/json',
+                             headers={'Accept-Language': 'en-US,en;q=0.9'})
+        assert response.status_code == 201
+
+        message = EmailOutbox.query.one()
+        assert message.payload['locale'] == 'en'
+        msg = BUILDERS[message.kind](message.recipient, **message.payload)
+        assert msg.subject.startswith('Confirm your email')
+        assert 'confirm-email?token=' in msg.body and 'confirm-email?token=' in msg.html
+
+        msg = BUILDERS['password_reset']('x@example.com', '<b>X</b>', 'tok', locale='fr')
+        assert msg.subject.startswith('Restablece')
+        assert '&lt;b&gt;X&lt;/b&gt;' in msg.html
+
+    def test_failed_email_backoff_and_dead_letter(self, app, monkeypatch):
+        """Los fallos se reintentan con backoff y terminan en 'dead'"""
+        import email_outbox
+
+        monkeypatch.setattr(email_outbox, 'send_messages', lambda messages: ['SMTP caído'] * len(messages))
+        message = email_outbox.queue_email('confirmation', 'x@example.com', user_name='X', confirmation_token='t')
+        db.session.commit()
+
+        assert email_outbox.process_outbox() == 1
+        assert message.status == 'pending'
+        assert message.attempts == 1
+        assert message.last_error
+
+        # Procesar hasta agotar los intentos, sin esperar el backoff
+        for _ in range(Config.EMAIL_MAX_ATTEMPTS - 1):
+            message.next_attempt_at = message.created_at
+            db.session.commit()
+            email_outbox.process_outbox()
+
+        assert message.status == 'dead'
+        assert message.attempts == Config.EMAIL_MAX_ATTEMPTS
+        assert message.payload == {'user_name': 'X', 'locale': message.payload['locale']}
+
+    def test_smtp_pool_reuses_session(self, app):
+        """Varios envíos comparten una sesión SMTP y se reconecta si el servidor la cierra"""
+        import socket
+        from aiosmtpd.controller import Controller
+        from flask_mail import Message
+        from mail_transport import SMTPConnectionPool
+
+        class Handler:
+            received = []
+
+            async def handle_DATA(self, server, session, envelope):
+                self.received.append(envelope.rcpt_tos)
+                return '250 OK'
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        controller = Controller(Handler(), hostname='127.0.0.1', port=port)
+        controller.start()
+        try:
+            pool = SMTPConnectionPool('127.0.0.1', port, password='x', pool_size=1)
+            connects = []
+            original_connect = pool._connect
+            pool._connect = lambda: connects.append(1) or original_connect()
+
+            messages = [Message('Hola', sender='curso@example.com', recipients=[f'u{i}@example.com'], body='.')
+                        for i in range(3)]
+            assert pool.send_messages(messages) == [None, None, None]
+            assert pool.send(messages[0]) is None
+            assert len(connects) == 1
+
+            # Sesión cortada del lado del servidor: se reconecta y reintenta
+            pool._idle[0][0].close()
+            assert pool.send(messages[1]) is None
+            assert len(connects) == 2
+            assert len(Handler.received) == 5
+            pool.close()
+        finally:
+            controller.stop()
+
+    def test_smtp_pool_discards_broken_sessions(self, app):
+        """Un error de transporte descarta la sesión; si no se puede conectar falla el lote una vez"""
+        import smtplib
+        from flask_mail import Message
+        from mail_transport import SMTPConnectionPool
+
+        class FakeHost:
+            def __init__(self, error):
+                self.error, self.closed = error, False
+
+            def sendmail(self, *args):
+                raise self.error
+
+            def quit(self):
+                self.closed = True
+
+        messages = [Message('Hola', sender='curso@example.com', recipients=[f'u{i}@example.com'], body='.')
+                    for i in range(3)]
+        pool = SMTPConnectionPool('127.0.0.1', 25, password='x', pool_size=1)
+        connects = []
+
+        def refuse():
+            connects.append(1)
+            raise ConnectionRefusedError('Conexión rechazada')
+        pool._connect = refuse
+        assert pool.send_messages(messages) == ['Conexión rechazada'] * 3
+        assert len(connects) == 1
+
+        # Un destinatario rechazado no afecta la sesión; un timeout sí
+        refused = FakeHost(smtplib.SMTPRecipientsRefused({'u0@example.com': (550, b'no')}))
+        pool._connect = lambda: refused
+        assert pool.send(messages[0]) is not None
+        assert pool._idle[0][0] is refused and not refused.closed
+
+        pool._idle.clear()
+        broken = FakeHost(TimeoutError('timed out'))
+        pool._connect = lambda: broken
+        assert pool.send(messages[0]) == 'timed out'
+        assert broken.closed and pool._idle == []
+
+class TestAnnouncements:
+    """Tests para anuncios masivos por email"""
+
+    def test_announcement_batches_and_checkpoint(self, client, app, sample_user_data, monkeypatch, login_token):
+        """Se envía por tramos, con checkpoint, y los fallos pasan al outbox"""
+        import announcement_service
+        from email_outbox import BUILDERS
+        from models import Announcement
+
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        for i in range(5):
+            db.session.add(Usuario(email=f'alumno{i}@example.com', nombre=f'Alumno{i}', apellido='X',
+                                   password_hash='x', email_confirmed=True, has_access=True))
+        db.session.add(Usuario(email='sinacceso@example.com', nombre='Sin', apellido='Acceso',
+                               password_hash='x', email_confirmed=True, has_access=False))
+        db.session.commit()
+
+        response = client.post('/api/admin/announcements',
+                             data=json.dumps({'subject': 'Nuevo video', 'message': 'Ya está disponible'}),
+                             content_type='application/json',
+                             headers={'Authorization': f'Bearer {admin_token}'})
+        assert response.status_code == 201
+        announcement_id = json.loads(response.data)['announcement']['id']
+        assert json.loads(response.data)['announcement']['total_recipients'] == 6  # admin + 5 alumnos
+
+        sent_batches = []
+        def fake_send(messages):
+            sent_batches.append([m.recipients[0] for m in messages])
+            return ['550 rechazado' if m.recipients[0] == 'alumno2@example.com' else None for m in messages]
+        monkeypatch.setattr(announcement_service, 'send_messages', fake_send)
+
+        assert announcement_service.process_announcement_batch(batch_size=4) == 4
+        announcement = db.session.get(Announcement, announcement_id)
+        assert announcement.status == 'sending'
+        assert announcement.locked_until is None
+        assert announcement.last_user_id == Usuario.query.filter_by(email='alumno2@example.com').one().id
+
+        # Otro worker (o el mismo tras reiniciar) sigue desde el checkpoint
+        assert announcement_service.process_announcement_batch(batch_size=4) == 2
+        assert announcement.status == 'done'
+        assert sorted(sum(sent_batches, [])) == sorted(['admin@example.com'] + [f'alumno{i}@example.com' for i in range(5)])
+
+        retry = EmailOutbox.query.filter_by(kind='announcement').one()
+        assert retry.recipient == 'alumno2@example.com'
+
+        response = client.get(f'/api/admin/announcements/{announcement_id}',
+                            headers={'Authorization': f'Bearer {admin_token}'})
+        data = json.loads(response.data)['announcement']
+        assert (data['sent_count'], data['failed_count'], data['progress']) == (5, 1, 100.0)
+
+        msg = BUILDERS['announcement'](retry.recipient, **retry.payload)
+        assert msg.subject == 'Nuevo video' and 'Ya está disponible' in msg.body
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
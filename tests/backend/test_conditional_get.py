@@ -0,0 +1,60 @@
+import pytest
+import json
+
+from models import Usuario
+
+class TestConditionalGet:
+    """Tests para ETag / If-None-Match en los endpoints de lectura"""
+
+    def test_profile_and_content_not_modified_until_version_changes(self, client, app, sample_user_data, login_token):
+        """304 sin cuerpo mientras no cambie la versión del usuario o del contenido"""
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        token = login_token(sample_user_data, has_access=True)
+        headers = {'Authorization': f'Bearer {token}'}
+        admin_headers = {'Authorization': f'Bearer {admin_token}'}
+        user_id = Usuario.query.filter_by(email=sample_user_data['email']).one().id
+
+        response = client.get('/api/auth/profile', headers=headers)
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        response = client.get('/api/auth/profile', headers=dict(headers, **{'If-None-Match': etag}))
+        assert response.status_code == 304
+        assert response.data == b''
+
+        # Un cambio del admin incrementa la versión del usuario
+        client.post('/api/admin/deactivate-user', data=json.dumps({'user_id': user_id}),
+                    content_type='application/json', headers=admin_headers)
+        client.post('/api/admin/activate-user', data=json.dumps({'user_id': user_id}),
+                    content_type='application/json', headers=admin_headers)
+        response = client.get('/api/auth/profile', headers=dict(headers, **{'If-None-Match': etag}))
+        assert response.status_code == 200
+        assert json.loads(response.data)['usuario']['version'] == 3
+
+        response = client.get('/api/course/content', headers=headers)
+        etag = response.headers['ETag']
+        assert client.get('/api/course/content',
+                          headers=dict(headers, **{'If-None-Match': etag})).status_code == 304
+        client.put('/api/course/content/1', data=json.dumps({'title': 'Intro'}),
+                   content_type='application/json', headers=admin_headers)
+        response = client.get('/api/course/content', headers=dict(headers, **{'If-None-Match': etag}))
+        assert response.status_code == 200
+        assert json.loads(response.data)['videos'][0]['title'] == 'Intro'
+
+    def test_admin_users_page_etag_changes_with_bulk_update(self, client, app, sample_user_data, login_token):
+        """La página del listado cambia de ETag cuando una acción masiva modifica a sus usuarios"""
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        login_token(sample_user_data)
+        user_id = Usuario.query.filter_by(email=sample_user_data['email']).one().id
+
+        etag = client.get('/api/admin/users', headers=headers).headers['ETag']
+        assert client.get('/api/admin/users', headers=dict(headers, **{'If-None-Match': etag})).status_code == 304
+
+        client.post('/api/admin/users/bulk', data=json.dumps({'action': 'grant', 'user_ids': [user_id]}),
+                    content_type='application/json', headers=headers)
+        assert client.get('/api/admin/users', headers=dict(headers, **{'If-None-Match': etag})).status_code == 200
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,58 @@
+import pytest
+import json
+
+from models import db
+from config import Config
+
+class TestCourseCatalog:
+    """Tests para el catálogo del curso cacheado por worker"""
+
+    def test_catalog_cached_until_version_changes(self, client, app, sample_user_data, monkeypatch, login_token):
+        """Se sirve la copia serializada hasta que cambia la versión (propia o de otro worker)"""
+        from models import CourseContent
+        from catalog_service import bump_catalog_version
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        client.put('/api/course/content/1', data=json.dumps({'title': 'Intro'}),
+                   content_type='application/json', headers=headers)
+
+        data = json.loads(client.get('/api/course/content', headers=headers).data)
+        assert [v['title'] for v in data['videos']] == ['Intro']
+        assert data['usuario']['email'] == 'admin@example.com'
+
+        # Un cambio sin publicar versión no se ve: el catálogo sale de memoria
+        monkeypatch.setattr(Config, 'CATALOG_VERSION_CHECK_INTERVAL', 0)
+        CourseContent.query.filter_by(video_id=1).one().title = 'Editado por otro worker'
+        db.session.commit()
+        data = json.loads(client.get('/api/course/content', headers=headers).data)
+        assert data['videos'][0]['title'] == 'Intro'
+
+        # Otro worker publica la versión nueva: se recarga en la próxima verificación
+        bump_catalog_version()
+        db.session.commit()
+        data = json.loads(client.get('/api/course/content', headers=headers).data)
+        assert data['videos'][0]['title'] == 'Editado por otro worker'
+
+    def test_summary_fields_and_detail(self, client, app, sample_user_data, login_token):
+        """view=summary y fields= no traen los textos largos; el detalle sí"""
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        client.put('/api/course/content/1', data=json.dumps({'title': 'Intro', 'reading_material': 'x' * 5000}),
+                   content_type='application/json', headers=headers)
+
+        data = json.loads(client.get('/api/course/content?view=summary', headers=headers).data)
+        assert sorted(data['videos'][0]) == ['duration', 'id', 'module', 'poster_url', 'title', 'video_type']
+        data = json.loads(client.get('/api/course/content?fields=title', headers=headers).data)
+        assert data['videos'] == [{'id': 1, 'title': 'Intro'}]
+        assert client.get('/api/course/content?fields=password', headers=headers).status_code == 400
+
+        response = client.get('/api/course/content/1', headers=headers)
+        assert json.loads(response.data)['video']['reading_material'] == 'x' * 5000
+        assert client.get('/api/course/content/1',
+                          headers=dict(headers, **{'If-None-Match': response.headers['ETag']})).status_code == 304
+        assert client.get('/api/course/content/9', headers=headers).status_code == 404
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
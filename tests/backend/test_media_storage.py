@@ -0,0 +1,63 @@
+import pytest
+import json
+import os
+
+from models import db
+from datetime import datetime, timedelta
+
+class TestContentAddressedStorage:
+    """Tests para los videos guardados por su SHA-256"""
+
+    def test_identical_uploads_share_one_blob(self, client, app, sample_user_data, login_token):
+        """Dos subidas iguales ocupan un solo archivo; se borra cuando nadie lo usa"""
+        import hashlib
+        import io
+        from models import MediaBlob
+        from storage_service import blob_relpath, purge_unreferenced_blobs
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        video = os.urandom(2048)
+        sha256 = hashlib.sha256(video).hexdigest()
+
+        urls = []
+        for video_id in (1, 2):
+            response = client.post(f'/api/course/upload-video/{video_id}', headers=headers,
+                                   data={'video': (io.BytesIO(video), f'clase{video_id}.mp4')},
+                                   content_type='multipart/form-data')
+            assert response.status_code == 200
+            urls.append(json.loads(response.data)['video_url'])
+        assert urls == [f'/uploads/videos/{sha256}.mp4'] * 2
+
+        path = os.path.join(app.config['UPLOAD_FOLDER'], 'videos', blob_relpath(f'{sha256}.mp4'))
+        try:
+            assert os.path.isfile(path)
+            with app.app_context():
+                assert db.session.get(MediaBlob, sha256).ref_count == 2
+
+            # URL inmutable: se puede cachear para siempre
+            response = client.get(urls[0], headers=headers)
+            assert response.status_code == 200
+            assert response.data == video
+            assert 'immutable' in response.headers['Cache-Control']
+            response.close()
+
+            # Cambiar a otro video suelta la referencia; el archivo sigue mientras el otro lo use
+            for video_id in (1, 2):
+                client.put(f'/api/course/content/{video_id}', headers=headers, content_type='application/json',
+                           data=json.dumps({'video_url': 'https://example.com/otro.mp4'}))
+            with app.app_context():
+                blob = db.session.get(MediaBlob, sha256)
+                assert blob.ref_count == 0
+                # Dentro del margen no se borra
+                assert purge_unreferenced_blobs() == 0
+                blob.released_at = datetime.utcnow() - timedelta(hours=app.config['MEDIA_BLOB_GRACE_HOURS'] + 1)
+                db.session.commit()
+                assert purge_unreferenced_blobs() == 1
+            assert not os.path.exists(path)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,92 @@
+import pytest
+import json
+import os
+
+from models import db
+
+class TestResumableUpload:
+    """Tests para la subida de videos por partes (estilo tus)"""
+
+    def test_chunked_upload_resume_and_finalize(self, client, app, sample_user_data, login_token):
+        """Partes con offset y checksum, reanudación en otro worker y asignación atómica al finalizar"""
+        import base64
+        import hashlib
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        video = os.urandom(3000)
+
+        def patch(offset, chunk, checksum=None):
+            chunk_headers = dict(headers, **{'Upload-Offset': str(offset),
+                                             'Content-Type': 'application/offset+octet-stream'})
+            digest = hashlib.sha256(checksum if checksum is not None else chunk).digest()
+            chunk_headers['Upload-Checksum'] = 'sha256 ' + base64.b64encode(digest).decode()
+            return client.patch(f'/api/course/uploads/{upload_id}', data=chunk, headers=chunk_headers)
+
+        response = client.post('/api/course/uploads', headers=headers, content_type='application/json',
+                               data=json.dumps({'video_id': 1, 'filename': 'clase.mp4', 'size': len(video),
+                                                'checksum': hashlib.sha256(video).hexdigest()}))
+        assert response.status_code == 201
+        upload_id = json.loads(response.data)['upload']['id']
+
+        assert patch(0, video[:1000]).headers['Upload-Offset'] == '1000'
+        # Offset repetido: 409 con el offset real para retomar
+        response = patch(0, video[:1000])
+        assert response.status_code == 409
+        assert json.loads(response.data)['offset'] == 1000
+        # Checksum incorrecto: se descarta la parte entera
+        assert patch(1000, video[1000:2000], checksum=b'otra cosa').status_code == 460
+        response = client.get(f'/api/course/uploads/{upload_id}', headers=headers)
+        assert json.loads(response.data)['upload']['offset'] == 1000
+
+        assert client.post(f'/api/course/uploads/{upload_id}/finalize', headers=headers).status_code == 409
+        assert patch(1000, video[1000:]).headers['Upload-Offset'] == str(len(video))
+
+        response = client.post(f'/api/course/uploads/{upload_id}/finalize', headers=headers)
+        assert response.status_code == 200
+        video_url = json.loads(response.data)['video_url']
+        from storage_service import blob_relpath
+        assert os.path.basename(video_url) == hashlib.sha256(video).hexdigest() + '.mp4'
+        path = os.path.join(app.config['UPLOAD_FOLDER'], 'videos', blob_relpath(os.path.basename(video_url)))
+        try:
+            with open(path, 'rb') as f:
+                assert f.read() == video
+            content = json.loads(client.get('/api/course/content?fields=video_url', headers=headers).data)
+            assert content['videos'][0]['video_url'] == video_url
+        finally:
+            os.remove(path)
+
+    def test_finalize_retry_after_failed_commit(self, client, app, sample_user_data, monkeypatch, login_token):
+        """Si el commit falla el archivo parcial sigue ahí y el reintento termina la subida"""
+        import upload_service
+        from storage_service import blob_relpath
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        video = os.urandom(500)
+        response = client.post('/api/course/uploads', headers=headers, content_type='application/json',
+                               data=json.dumps({'video_id': 2, 'filename': 'clase.mp4', 'size': len(video)}))
+        upload_id = json.loads(response.data)['upload']['id']
+        client.patch(f'/api/course/uploads/{upload_id}', data=video,
+                     headers=dict(headers, **{'Upload-Offset': '0',
+                                              'Content-Type': 'application/offset+octet-stream'}))
+        partial = upload_service.partial_path(db.session.get(upload_service.VideoUpload, upload_id))
+
+        def failing_bump():
+            raise RuntimeError('base caída')
+        monkeypatch.setattr(upload_service, 'bump_catalog_version', failing_bump)
+        assert client.post(f'/api/course/uploads/{upload_id}/finalize', headers=headers).status_code == 500
+        assert os.path.exists(partial)
+
+        monkeypatch.undo()
+        response = client.post(f'/api/course/uploads/{upload_id}/finalize', headers=headers)
+        assert response.status_code == 200
+        assert not os.path.exists(partial)
+        path = os.path.join(app.config['UPLOAD_FOLDER'], 'videos',
+                            blob_relpath(os.path.basename(json.loads(response.data)['video_url'])))
+        with open(path, 'rb') as f:
+            assert f.read() == video
+        os.remove(path)
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,168 @@
+import pytest
+import json
+import os
+
+from models import db
+from config import Config
+from datetime import datetime, timedelta
+
+class TestHlsTranscoding:
+    """Tests para la cola de transcodificación a HLS"""
+
+    def test_queue_and_hls_delivery(self, client, app, sample_user_data, login_token):
+        """La subida encola el trabajo; al terminar el contenido apunta al master y se sirve con token"""
+        import hashlib
+        import io
+        import shutil
+        from storage_service import blob_relpath
+        from transcode_service import claim_jobs, complete_job
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        video = os.urandom(1024)
+        sha256 = hashlib.sha256(video).hexdigest()
+        videos_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'videos')
+
+        def upload(video_id):
+            response = client.post(f'/api/course/upload-video/{video_id}', headers=headers,
+                                   data={'video': (io.BytesIO(video), 'clase.mp4')},
+                                   content_type='multipart/form-data')
+            return json.loads(response.data)['content']
+
+        try:
+            assert upload(1)['hls_status'] == 'pending'
+            with app.app_context():
+                jobs = claim_jobs(5)
+                assert len(jobs) == 1
+                assert claim_jobs(5) == []
+                job = jobs[0]
+
+                # Salida de ffmpeg (acá no se ejecuta)
+                os.makedirs(job.output_dir)
+                with open(os.path.join(job.output_dir, 'master.m3u8'), 'w') as f:
+                    f.write('#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=880000,RESOLUTION=640x360\nv0.m3u8\n')
+                with open(os.path.join(job.output_dir, 'v0.m3u8'), 'w') as f:
+                    f.write('#EXTM3U\n#EXTINF:6.0,\nv0_00000.ts\n#EXT-X-ENDLIST\n')
+                with open(os.path.join(job.output_dir, 'v0_00000.ts'), 'wb') as f:
+                    f.write(b'segmento')
+                assert complete_job(job)
+
+            detail = json.loads(client.get('/api/course/content/1', headers=headers).data)['video']
+            assert detail['hls_status'] == 'ready'
+            hls_url = detail['hls_url']
+            assert hls_url.startswith(f'/uploads/hls/{sha256}/') and hls_url.endswith('/master.m3u8')
+
+            # Sin token no se sirve; con token, los playlists lo propagan a cada URI
+            assert client.get(hls_url).status_code == 403
+            media_token = json.loads(client.get('/api/course/media-token', headers=headers).data)['token']
+            response = client.get(f'{hls_url}?token={media_token}')
+            assert response.status_code == 200
+            assert f'v0.m3u8?token={media_token}' in response.get_data(as_text=True)
+            base = hls_url.rsplit('/', 1)[0]
+            response = client.get(f'{base}/v0_00000.ts?token={media_token}')
+            assert response.data == b'segmento'
+            assert 'immutable' in response.headers['Cache-Control']
+            response.close()
+            assert client.get(f'{base}/otro.txt?token={media_token}').status_code == 404
+
+            # Subida idéntica en otro video: la transcodificación ya existe
+            assert upload(2)['hls_status'] == 'ready'
+        finally:
+            shutil.rmtree(os.path.join(videos_dir, 'hls', sha256), ignore_errors=True)
+            blob = os.path.join(videos_dir, blob_relpath(f'{sha256}.mp4'))
+            if os.path.exists(blob):
+                os.remove(blob)
+
+    def test_lease_keeps_running_jobs(self, client, app, sample_user_data, login_token):
+        """Un trabajo con heartbeat no se reencola; uno sin renovar pasado el lease sí"""
+        import io
+        from models import CourseContent
+        from transcode_service import claim_jobs, renew_leases, requeue_stale_jobs
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        client.post('/api/course/upload-video/1', headers={'Authorization': f'Bearer {admin_token}'},
+                    data={'video': (io.BytesIO(os.urandom(256)), 'clase.mp4')},
+                    content_type='multipart/form-data')
+        job = claim_jobs(1)[0]
+        content = db.session.get(CourseContent, job.content_id)
+        try:
+            def expire_lease():
+                content.hls_updated_at = datetime.utcnow() - timedelta(seconds=Config.TRANSCODE_LEASE_SECONDS + 1)
+                db.session.commit()
+
+            expire_lease()
+            renew_leases([job])
+            assert requeue_stale_jobs() == 0
+            assert content.hls_status == 'processing'
+
+            expire_lease()
+            assert requeue_stale_jobs() == 1
+            assert content.hls_status == 'pending'
+        finally:
+            os.remove(job.source)
+
+class TestMediaMetadata:
+    """Tests para los metadatos y miniaturas de los videos subidos"""
+
+    def test_metadata_and_thumbnails_stage(self, client, app, sample_user_data, login_token):
+        """La primera etapa guarda columnas tipadas y miniaturas; es idempotente y se reutiliza"""
+        import hashlib
+        import io
+        import shutil
+        from storage_service import blob_relpath
+        from transcode_service import claim_jobs, save_media_info, analyze_media
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        video = os.urandom(1024)
+        sha256 = hashlib.sha256(video).hexdigest()
+        videos_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'videos')
+        info = {'duration': 3909.4, 'width': 1280, 'height': 720, 'video_codec': 'h264',
+                'audio_codec': 'aac', 'bit_rate': 2500000}
+
+        def upload(video_id):
+            response = client.post(f'/api/course/upload-video/{video_id}', headers=headers,
+                                   data={'video': (io.BytesIO(video), 'clase.mp4')},
+                                   content_type='multipart/form-data')
+            return json.loads(response.data)['content']
+
+        try:
+            assert upload(1)['poster_url'] is None
+            with app.app_context():
+                job = claim_jobs(1)[0]
+                # Salida de analyze_media (acá no hay ffmpeg): con el directorio ya armado no se repite
+                os.makedirs(job.media_dir)
+                with open(os.path.join(job.media_dir, 'metadata.json'), 'w') as f:
+                    json.dump(info, f)
+                with open(os.path.join(job.media_dir, 'poster.jpg'), 'wb') as f:
+                    f.write(b'jpeg')
+                assert analyze_media(job.source, job.media_dir, 60) == info
+                assert save_media_info(job, info)
+
+            detail = json.loads(client.get('/api/course/content/1', headers=headers).data)['video']
+            assert detail['duration'] == '1:05:09'
+            assert detail['duration_seconds'] == 3909.4
+            assert (detail['width'], detail['height'], detail['video_codec']) == (1280, 720, 'h264')
+            assert detail['hls_status'] == 'processing'
+            summary = json.loads(client.get('/api/course/content?view=summary', headers=headers).data)
+            assert summary['videos'][0]['poster_url'] == detail['poster_url']
+
+            media_token = json.loads(client.get('/api/course/media-token', headers=headers).data)['token']
+            response = client.get(f"{detail['poster_url']}?token={media_token}")
+            assert response.data == b'jpeg'
+            assert 'immutable' in response.headers['Cache-Control']
+            response.close()
+
+            # Subida idéntica: metadatos y miniaturas al instante, la transcodificación sigue en cola
+            content = upload(2)
+            assert content['poster_url'] == detail['poster_url']
+            assert content['duration'] == '1:05:09'
+            assert content['hls_status'] == 'pending'
+        finally:
+            shutil.rmtree(os.path.join(videos_dir, 'hls', sha256), ignore_errors=True)
+            blob = os.path.join(videos_dir, blob_relpath(f'{sha256}.mp4'))
+            if os.path.exists(blob):
+                os.remove(blob)
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,45 @@
+import pytest
+import json
+
+from models import db, Usuario
+
+class TestUserExport:
+    """Tests para el export de usuarios en streaming"""
+
+    def test_export_csv_and_ndjson(self, client, app, sample_user_data, login_token):
+        """Columnas elegidas, filtros y respuesta en streaming"""
+        import csv
+        import io
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        for i in range(3):
+            db.session.add(Usuario(email=f'u{i}@example.com', nombre='=HYPERLINK()' if i == 0 else 'U',
+                                   apellido=str(i), password_hash='x', has_access=i > 0))
+        db.session.commit()
+
+        response = client.get('/api/admin/users/export',
+                            query_string={'columns': 'email,nombre,has_access', 'has_access': 'true'},
+                            headers=headers)
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert 'attachment' in response.headers['Content-Disposition']
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        assert rows == [['email', 'nombre', 'has_access'], ['admin@example.com', 'Test', 'True'],
+                        ['u1@example.com', 'U', 'True'], ['u2@example.com', 'U', 'True']]
+
+        response = client.get('/api/admin/users/export', query_string={'format': 'ndjson', 'columns': 'email,nombre'},
+                            headers=headers)
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert len(lines) == 4
+        assert lines[1] == {'email': 'u0@example.com', 'nombre': '=HYPERLINK()'}
+
+        # En CSV se neutralizan los valores que una planilla tomaría como fórmula
+        response = client.get('/api/admin/users/export', query_string={'columns': 'nombre'}, headers=headers)
+        assert "'=HYPERLINK()" in response.get_data(as_text=True)
+
+        response = client.get('/api/admin/users/export', query_string={'columns': 'password_hash'}, headers=headers)
+        assert response.status_code == 400
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
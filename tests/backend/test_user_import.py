@@ -0,0 +1,86 @@
+import pytest
+import json
+
+from models import db, Usuario, EmailOutbox
+from werkzeug.security import generate_password_hash
+
+class TestUserImport:
+    """Tests para la importación masiva de usuarios"""
+
+    def test_import_csv(self, client, app, sample_user_data, login_token):
+        """Valida en streaming, omite existentes y encola la bienvenida con enlace para elegir contraseña"""
+        import io
+        from email_outbox import BUILDERS
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        csv_data = ('email,nombre,apellido\n'
+                    'Nueva@Example.com,Nueva,Alumna\n'
+                    'admin@example.com,Ya,Existe\n'
+                    'sin-arroba,X,Y\n'
+                    'nueva@example.com,Repetida,Z\n'
+                    'otra@example.com,Otra,Alumna\n')
+
+        response = client.post('/api/admin/users/import',
+                             data={'file': (io.BytesIO(csv_data.encode('utf-8')), 'usuarios.csv'),
+                                   'grant_access': 'true'},
+                             content_type='multipart/form-data',
+                             headers={'Authorization': f'Bearer {admin_token}'})
+        assert response.status_code == 200
+        summary = json.loads(response.data)
+        assert (summary['total_rows'], summary['imported'], summary['skipped_existing'], summary['invalid']) == (5, 2, 1, 2)
+        assert [e['line'] for e in summary['errors']] == [4, 5]
+
+        usuario = Usuario.query.filter_by(email='nueva@example.com').one()
+        assert usuario.has_access and not usuario.check_password('')
+
+        welcome = EmailOutbox.query.filter_by(kind='welcome', recipient='nueva@example.com').one()
+        msg = BUILDERS['welcome'](welcome.recipient, **welcome.payload)
+        assert 'reset-password?token=' in msg.body
+
+        # El enlace de bienvenida sirve para elegir la contraseña
+        response = client.post('/api/auth/reset-password',
+                             data=json.dumps({'token': welcome.payload['reset_token'], 'password': 'nueva123'}),
+                             content_type='application/json')
+        assert response.status_code == 200
+
+        response = client.post('/api/admin/users/import',
+                             data={'file': (io.BytesIO(b'correo,nombre\n'), 'malo.csv')},
+                             content_type='multipart/form-data',
+                             headers={'Authorization': f'Bearer {admin_token}'})
+        assert response.status_code == 400
+
+    def test_email_case_insensitive(self, client, app, sample_user_data, login_token):
+        """Un email registrado con mayúsculas (fila previa a la normalización) no se duplica"""
+        import io
+        from sqlalchemy import insert
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        db.session.execute(insert(Usuario).values(
+            email='Legacy@Example.com', nombre='Legacy', apellido='User', email_confirmed=True,
+            password_hash=generate_password_hash(sample_user_data['password'])))
+        db.session.commit()
+
+        response = client.post('/api/admin/users/import',
+                             data={'file': (io.BytesIO(b'email,nombre,apellido\nlegacy@example.com,Otro,Nombre\n'),
+                                            'usuarios.csv')},
+                             content_type='multipart/form-data',
+                             headers={'Authorization': f'Bearer {admin_token}'})
+        assert json.loads(response.data)['skipped_existing'] == 1
+        assert Usuario.by_email('LEGACY@example.com').count() == 1
+
+        response = client.post('/api/auth/register',
+                             data=json.dumps(dict(sample_user_data, email='legacy@EXAMPLE.com')),
+                             content_type='application/json')
+        assert response.status_code == 409
+
+        response = client.post('/api/auth/login',
+                             data=json.dumps({'email': ' legacy@example.COM', 'password': sample_user_data['password']}),
+                             content_type='application/json')
+        assert response.status_code == 200
+
+        # Los emails nuevos se guardan normalizados
+        usuario = Usuario(email=' Nuevo@Example.com', nombre='N', apellido='U')
+        assert usuario.email == 'nuevo@example.com'
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
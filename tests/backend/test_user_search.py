@@ -0,0 +1,42 @@
+import pytest
+import json
+
+from models import db, Usuario
+
+class TestUserSearch:
+    """Tests para la búsqueda de usuarios del panel de admin"""
+
+    def test_search_ranking_and_index_refresh(self, client, app, sample_user_data, login_token):
+        """Email exacto, luego prefijos y subcadenas; los usuarios nuevos aparecen sin reiniciar"""
+        admin_token = login_token(dict(sample_user_data, email='admin@example.com'),
+                                  rol='admin', has_access=True)
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        for email, nombre, apellido in [('ana@example.com', 'Ana', 'Gómez'),
+                                        ('mariana@example.com', 'Mariana', 'Paz'),
+                                        ('juan@example.com', 'Juan', 'Anaya')]:
+            db.session.add(Usuario(email=email, nombre=nombre, apellido=apellido, password_hash='x'))
+        db.session.commit()
+
+        response = client.get('/api/admin/users/search', query_string={'q': 'ana'}, headers=headers)
+        assert response.status_code == 200
+        emails = [u['email'] for u in json.loads(response.data)['usuarios']]
+        assert emails == ['ana@example.com', 'juan@example.com', 'mariana@example.com']
+
+        response = client.get('/api/admin/users/search', query_string={'q': 'ana@example.com'}, headers=headers)
+        assert json.loads(response.data)['usuarios'][0]['email'] == 'ana@example.com'
+
+        db.session.add(Usuario(email='nuevo@example.com', nombre='Anabel', apellido='Ruiz', password_hash='x'))
+        db.session.commit()
+        response = client.get('/api/admin/users/search', query_string={'q': 'anab', 'limit': 5}, headers=headers)
+        assert [u['email'] for u in json.loads(response.data)['usuarios']] == ['nuevo@example.com']
+
+        response = client.get('/api/admin/users/search', query_string={'q': '  '}, headers=headers)
+        assert json.loads(response.data)['usuarios'] == []
+
+        response = client.get('/api/admin/users/search', query_string={'q': 'anab', 'limit': -1}, headers=headers)
+        assert response.status_code == 400
+        from user_search_service import search_users
+        assert len(search_users('example', -1)) == 1
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
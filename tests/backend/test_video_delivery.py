@@ -0,0 +1,54 @@
+import pytest
+import json
+import os
+
+from config import Config
+
+class TestVideoDelivery:
+    """Tests para la entrega de videos subidos (autorización, Range y X-Accel-Redirect)"""
+
+    @pytest.fixture
+    def video_file(self, app):
+        path = os.path.join(app.config['UPLOAD_FOLDER'], 'videos', 'test_video.mp4')
+        with open(path, 'wb') as f:
+            f.write(bytes(range(256)) * 4)
+        yield path
+        os.remove(path)
+
+    def test_range_requests_with_media_token(self, client, app, sample_user_data, video_file, login_token):
+        """Sin token 403; con token de media, 200 completo, 206 por rango y 416 fuera de rango"""
+        token = login_token(sample_user_data, has_access=True)
+        assert client.get('/uploads/videos/test_video.mp4').status_code == 403
+
+        media = json.loads(client.get('/api/course/media-token',
+                                      headers={'Authorization': f'Bearer {token}'}).data)['token']
+        url = f'/uploads/videos/test_video.mp4?token={media}'
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        assert len(response.data) == 1024
+
+        response = client.get(url, headers={'Range': 'bytes=10-19'})
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == 'bytes 10-19/1024'
+        assert response.data == bytes(range(10, 20))
+
+        # If-Range con un ETag viejo: el archivo cambió, se envía completo
+        response = client.get(url, headers={'Range': 'bytes=10-19', 'If-Range': '"viejo"'})
+        assert response.status_code == 200
+        assert client.get(url, headers={'Range': 'bytes=5000-'}).status_code == 416
+
+        # Un token de acceso no sirve como token de media en la URL
+        assert client.get(f'/uploads/videos/test_video.mp4?token={token}').status_code == 403
+
+    def test_accel_redirect(self, client, app, sample_user_data, video_file, monkeypatch, login_token):
+        """Con nginx delante solo se autoriza: el archivo lo envía la location interna"""
+        monkeypatch.setattr(Config, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-videos/')
+        token = login_token(sample_user_data, has_access=True)
+        response = client.get('/uploads/videos/test_video.mp4', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        assert response.headers['X-Accel-Redirect'] == '/protected-videos/test_video.mp4'
+        assert response.data == b''
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])